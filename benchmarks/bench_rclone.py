@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""bench_rclone
+
+Benchmark pyrclone against a stand-in rclone binary (see fake_rclone.py),
+which is placed on the PATH so commands are ran exactly as they would be
+against a real rclone, including starting a process for each command.
+
+Each benchmark is ran for each listing size, and its times and the peak
+memory allocated by Python (as measured by tracemalloc) are written out as
+JSON, so results can be compared between releases, ie:
+    python benchmarks/bench_rclone.py --entries 1000 100000 --output new.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import stat
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# pylint: disable=wrong-import-position
+from pyrclone import Rclone, RcloneBytesOutput, RcloneConfig, RcloneOutput  # noqa: E402
+from pyrclone.rclone_stream import parse_lsjson_line  # noqa: E402
+
+BenchmarkResult = Dict[str, Union[str, int, float, List[float]]]
+
+REMOTE: str = "local:benchmark"
+
+
+def install_fake_rclone(directory: str) -> None:
+    """install_fake_rclone
+
+    Write an "rclone" executable into a directory, which runs the stand-in
+    with the current Python, and put the directory first on the PATH.
+    """
+
+    fake_rclone: str = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "fake_rclone.py"
+    )
+    shim_path: str = os.path.join(directory, "rclone")
+
+    with open(shim_path, "w") as shim:
+        shim.write(f'#!/bin/sh\nexec "{sys.executable}" "{fake_rclone}" "$@"\n')
+
+    os.chmod(shim_path, os.stat(shim_path).st_mode | stat.S_IXUSR)
+    os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+
+
+def measure(
+    name: str,
+    function: Callable[[], object],
+    repeat: int,
+    parameters: Dict[str, int],
+    operations: int = 1,
+) -> BenchmarkResult:
+    """measure
+
+    Time a function repeat times, then run it once more under tracemalloc to
+    find the peak memory it allocates. If the function does several
+    operations, the times reported are per operation.
+    """
+
+    times: List[float] = []
+
+    for _ in range(repeat):
+        start_time: float = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start_time) / operations)
+
+    tracemalloc.start()
+    function()
+    peak_memory: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result: BenchmarkResult = {
+        "name": name,
+        "times": times,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "peak_memory": peak_memory,
+    }
+    result.update(parameters)
+
+    print(
+        f"{name:<16} {parameters.get('entries', 0):>10} entries: "
+        f"min {min(times):.4f}s, peak {peak_memory / 1048576:.1f} MiB",
+        file=sys.stderr,
+    )
+
+    return result
+
+
+def decode_lines(command_output: RcloneOutput) -> int:
+    """decode_lines
+
+    Decode the output of lsjson line by line, as iter_lsjson does.
+    """
+    return sum(
+        1
+        for output_line in command_output.output
+        if parse_lsjson_line(output_line) is not None
+    )
+
+
+def lsjson_bytes(rclone: Rclone) -> object:
+    """lsjson_bytes
+
+    Run lsjson in bytes output mode, and decode the raw output as JSON.
+    """
+
+    rclone.bytes_output_mode = True
+
+    try:
+        command_output: RcloneOutput = rclone.lsjson(REMOTE, ["-R"])
+    finally:
+        rclone.bytes_output_mode = False
+
+    if isinstance(command_output, RcloneBytesOutput):
+        return json.loads(command_output.raw_output)
+
+    return json.loads("".join(command_output.output))
+
+
+def run_benchmarks(
+    rclone: Rclone, entries: int, stderr_lines: int, repeat: int
+) -> List[BenchmarkResult]:
+    """run_benchmarks
+
+    Run every benchmark against a listing of a given size.
+    """
+
+    os.environ["FAKE_RCLONE_ENTRIES"] = str(entries)
+    os.environ["FAKE_RCLONE_STDERR_LINES"] = str(stderr_lines)
+
+    parameters: Dict[str, int] = {"entries": entries, "stderr_lines": stderr_lines}
+    listing: RcloneOutput = rclone.lsjson(REMOTE, ["-R"])
+
+    benchmarks: Dict[str, Callable[[], object]] = {
+        "execute": lambda: rclone._execute(  # pylint: disable=protected-access
+            ["rclone", "lsjson", REMOTE, "-R", "--fast-list"]
+        ),
+        "lsjson": lambda: rclone.lsjson(REMOTE, ["-R"]),
+        "ls": lambda: rclone.ls(REMOTE),
+        "lsd": lambda: rclone.lsd(REMOTE),
+        "lsl": lambda: rclone.lsl(REMOTE),
+        "json_loads": lambda: json.loads("".join(listing.output)),
+        "json_lines": lambda: decode_lines(listing),
+        "iter_lsjson": lambda: sum(1 for _ in rclone.iter_lsjson(REMOTE, ["-R"])),
+        "lsjson_bytes": lambda: lsjson_bytes(rclone),
+    }
+
+    return [
+        measure(name, function, repeat, parameters)
+        for name, function in benchmarks.items()
+    ]
+
+
+def run_spawn_benchmark(rclone: Rclone, commands: int) -> BenchmarkResult:
+    """run_spawn_benchmark
+
+    Measure the overhead of starting rclone, by running a command with no
+    output many times.
+    """
+
+    os.environ["FAKE_RCLONE_ENTRIES"] = "0"
+    os.environ["FAKE_RCLONE_STDERR_LINES"] = "0"
+
+    def run_commands() -> None:
+        for _ in range(commands):
+            rclone.command("version", [])
+
+    return measure("spawn", run_commands, 1, {"commands": commands}, commands)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """main
+
+    Parse the command line, run the benchmarks and write out the results.
+    """
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--entries",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="listing sizes to benchmark, up to 10000000",
+    )
+    parser.add_argument(
+        "--stderr-lines", type=int, default=0, help="lines of log rclone writes"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds rclone waits to respond"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="times to run each benchmark"
+    )
+    parser.add_argument(
+        "--spawn-commands",
+        type=int,
+        default=50,
+        help="commands to run when measuring spawn overhead",
+    )
+    parser.add_argument("--label", default="", help="a label, ie the release")
+    parser.add_argument(
+        "--output", default="-", help="file to write the JSON results to"
+    )
+    options: argparse.Namespace = parser.parse_args(arguments)
+
+    rclone: Rclone = Rclone(RcloneConfig("[local]\ntype = local\n"))
+    rclone.logger.addHandler(logging.NullHandler())
+    results: List[BenchmarkResult] = []
+
+    with tempfile.TemporaryDirectory() as shim_directory:
+        install_fake_rclone(shim_directory)
+        os.environ["FAKE_RCLONE_LATENCY"] = str(options.latency)
+
+        results.append(run_spawn_benchmark(rclone, options.spawn_commands))
+
+        for entries in options.entries:
+            results += run_benchmarks(
+                rclone, entries, options.stderr_lines, options.repeat
+            )
+
+    report: Dict[str, object] = {
+        "label": options.label,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": options.latency,
+        "repeat": options.repeat,
+        "results": results,
+    }
+
+    if options.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(options.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
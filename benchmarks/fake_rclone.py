@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""fake_rclone
+
+A stand-in for the rclone binary, for benchmarking pyrclone without a real
+remote. It is ran by an "rclone" shim placed on the PATH by the benchmarks.
+
+The listings it produces are generated rather than read, and are configured
+through environment variables:
+    FAKE_RCLONE_ENTRIES       - Number of entries to list (default 1000).
+    FAKE_RCLONE_DIR_EVERY     - Every nth entry is a directory (default 10).
+    FAKE_RCLONE_STDERR_LINES  - Lines of log written to stderr (default 0).
+    FAKE_RCLONE_LATENCY       - Seconds to wait before responding (default 0).
+    FAKE_RCLONE_RETURN_CODE   - The exit code to return (default 0).
+"""
+
+import os
+import sys
+import time
+from typing import IO, Iterator, List, Optional
+
+# The number of lines written to the output at once.
+WRITE_BATCH: int = 10000
+
+LISTING_COMMANDS: List[str] = ["lsjson", "ls", "lsl", "lsf", "lsd"]
+
+
+def _environment_number(name: str, default: float) -> float:
+    """_environment_number
+
+    Read a number from the environment, falling back to a default.
+    """
+    return float(os.environ.get(name, default))
+
+
+def listing_lines(
+    command: str, entries: int, dir_every: int, arguments: List[str]
+) -> Iterator[str]:
+    """listing_lines
+
+    Generate the lines of the output of a listing command, in the same format
+    as rclone would write them. The "--files-only" and "--dirs-only" flags
+    are respected.
+    """
+
+    previous_entry: Optional[str] = None
+
+    if command == "lsjson":
+        yield "["
+
+    for index in range(entries):
+        is_dir: bool = dir_every > 0 and index % dir_every == 0
+
+        if ("--files-only" in arguments and is_dir) or (
+            "--dirs-only" in arguments and not is_dir
+        ):
+            continue
+
+        name: str = f"folder{index:08d}" if is_dir else f"file{index:08d}.txt"
+        path: str = f"folder{index // 1000:05d}/{name}"
+        size: int = -1 if is_dir else index * 37 % 1048576
+
+        if command == "lsjson":
+            # Every entry but the last is followed by a comma, so each is only
+            # written once the next is known.
+            if previous_entry is not None:
+                yield previous_entry + ","
+
+            previous_entry = (
+                f'{{"Path":"{path}","Name":"{name}","Size":{size},'
+                f'"MimeType":"{"inode/directory" if is_dir else "text/plain"}",'
+                f'"ModTime":"2019-01-13T17:41:{index % 60:02d}.123456789Z",'
+                f'"IsDir":{"true" if is_dir else "false"}}}'
+            )
+        elif command == "lsf":
+            yield f"{path}/" if is_dir else path
+        elif command == "lsd":
+            if is_dir:
+                yield f"          -1 2019-01-13 17:41:00        -1 {path}"
+        elif command == "lsl":
+            if not is_dir:
+                yield f"{size:>9} 2019-01-13 17:41:00.123456789 {path}"
+        elif not is_dir:
+            yield f"{size:>9} {path}"
+
+    if command == "lsjson":
+        if previous_entry is not None:
+            yield previous_entry
+
+        yield "]"
+
+
+def write_lines(stream: IO[bytes], lines: Iterator[str]) -> None:
+    """write_lines
+
+    Write the given lines to a stream, in batches to keep the overhead of the
+    stand-in itself low.
+    """
+
+    batch: List[str] = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) >= WRITE_BATCH:
+            stream.write(("\n".join(batch) + "\n").encode("utf-8"))
+            batch = []
+
+    if batch:
+        stream.write(("\n".join(batch) + "\n").encode("utf-8"))
+
+    stream.flush()
+
+
+def main(arguments: List[str]) -> int:
+    """main
+
+    Respond to an rclone command line.
+    """
+
+    command: str = arguments[0] if arguments else ""
+
+    time.sleep(_environment_number("FAKE_RCLONE_LATENCY", 0))
+
+    stderr_lines: int = int(_environment_number("FAKE_RCLONE_STDERR_LINES", 0))
+    write_lines(
+        sys.stderr.buffer,
+        (
+            f"2019/01/13 17:41:00 DEBUG : file{index:08d}.txt: "
+            "Modification times differ by 1s"
+            for index in range(stderr_lines)
+        ),
+    )
+
+    if command == "version":
+        write_lines(sys.stdout.buffer, iter(["rclone v1.53.0-fake"]))
+    elif command in LISTING_COMMANDS:
+        write_lines(
+            sys.stdout.buffer,
+            listing_lines(
+                command,
+                int(_environment_number("FAKE_RCLONE_ENTRIES", 1000)),
+                int(_environment_number("FAKE_RCLONE_DIR_EVERY", 10)),
+                arguments,
+            ),
+        )
+
+    return int(_environment_number("FAKE_RCLONE_RETURN_CODE", 0))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
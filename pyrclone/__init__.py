@@ -1,2 +1,39 @@
 # pylint: disable=all
 from .rclone import Rclone, RcloneConfig, RcloneError, RcloneOutput
+from .rclone_output import RcloneBytesOutput, RcloneStats
+from .rclone_async import AsyncRclone
+from .rclone_backends import RcloneBackendFeatures, RcloneFeatureCache
+from .rclone_batch import RcloneBatchResult, RcloneCommandSpec, RcloneExecutor
+from .rclone_bulk import RcloneBulkResult
+from .rclone_cache import RcloneListingCache
+from .rclone_cancel import RcloneCancelHandle, RcloneDeadline, RcloneLimits
+from .rclone_dedupe import RcloneDuplicateGroup, RcloneHashIndex
+from .rclone_diff import RcloneDiff, diff_listings
+from .rclone_filter import RcloneListingFilter
+from .rclone_index import RcloneListingIndex, RcloneSnapshot
+from .rclone_metrics import RcloneCommandMetrics, RcloneMetricsAggregator
+from .rclone_pipe import RcloneReadStream, RcloneWriteStream
+from .rclone_planner import (
+    RcloneFanOutResult,
+    RcloneTransferPlan,
+    RcloneTransferResult,
+    plan_transfer,
+)
+from .rclone_rcd import RcloneRcdBackend
+from .rclone_retention import (
+    RcloneRetentionPlan,
+    RcloneRetentionPolicy,
+    plan_retention,
+)
+from .rclone_retry import RcloneRateLimiter, RcloneRetryPolicy, RcloneTokenBucket
+from .rclone_shard import RcloneShardedListing
+from .rclone_sizes import RcloneDirectorySize, RcloneSizeTree
+from .rclone_stream import RcloneJsonStream, RcloneLineStream
+from .rclone_verify import (
+    RcloneCheckEntry,
+    RcloneCheckStatus,
+    RcloneHashEntry,
+    RcloneVerificationStore,
+    RcloneVerifiedRecord,
+    RcloneVerifyResult,
+)
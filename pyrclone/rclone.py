@@ -4,45 +4,69 @@
 A typed interface for interactions with an RClone executable.
 """
 
+import json
 import logging
+import os
 import subprocess
-from dataclasses import dataclass
-from enum import Enum
-from typing import Iterable, List, Optional, Tuple
-
-from .rclone_config import RcloneConfig
-
-
-class RcloneError(Enum):
-    """RcloneError
-
-    An enum wrapping the errors that Rclone can raise, and some
-    interface specific ones.
-    """
-
-    RCLONE_MISSING = -1
-    PYTHON_EXCEPTION = -2
-    SUCCESS = 0
-    SYNTAX_OR_USAGE_ERROR = 1
-    UNCATEGORISED = 2
-    FOLDER_NOT_FOUND = 3
-    FILE_NOT_FOUND = 4
-    RETRY_ERROR = 5
-    NO_RETRY_ERROR = 6
-    FATAL_ERROR = 7
-    TRANSFER_EXCEEDED = 8
-
-
-@dataclass
-class RcloneOutput:
-    """RcloneOutput
-
-    A wrapper for the Rclone command outputs, to ease access.
-    """
-
-    return_code: RcloneError
-    output: List[str]
-    error: List[str]
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .rclone_backends import (
+    BACKEND_FEATURES,
+    JOINING_BACKENDS,
+    PATH_PRESERVING_WRAPPERS,
+    UNKNOWN_FEATURES,
+    WRAPPING_BACKENDS,
+    RcloneBackendFeatures,
+    RcloneFeatureCache,
+    common_hash_type,
+    features_from_probe,
+    tuning_flags,
+    wrapped_features,
+)
+from .rclone_batch import RcloneBatchResult, RcloneCommandSpec, RcloneExecutor
+from .rclone_bulk import RcloneBulkResult, chunks, escape_glob
+from .rclone_cache import MUTATING_COMMANDS, RcloneListingCache
+from .rclone_cancel import (
+    RcloneCancelHandle,
+    RcloneDeadline,
+    RcloneLimits,
+    RcloneProcessWatch,
+)
+from .rclone_config import RcloneConfig, RCloneRemote
+from .rclone_dedupe import RcloneHashIndex, check_locations
+from .rclone_filter import RcloneListingFilter, listing_flags, only_dirs, only_files
+from .rclone_listing import files_from
+from .rclone_local import LOCAL_TYPE, NEUTRAL_OPTIONS, local_lsjson, local_size
+from .rclone_metrics import MetricsSink, RcloneCommandMetrics, RcloneCpuTimer
+from .rclone_output import RcloneBytesOutput, RcloneError, RcloneOutput
+from .rclone_pipe import RcloneReadStream, RcloneWriteStream
+from .rclone_planner import (
+    RcloneFanOutResult,
+    RcloneTransferPlan,
+    RcloneTransferResult,
+    plan_listing,
+)
+from .rclone_rcd import RcloneRcdBackend
+from .rclone_retention import (
+    RcloneRetentionPlan,
+    RcloneRetentionPolicy,
+    plan_retention,
+)
+from .rclone_retry import RcloneRateLimiter, RcloneRetryPolicy
+from .rclone_shard import RcloneShardedListing
+from .rclone_sizes import RcloneSizeTree
+from .rclone_stats import STATS_COMMANDS, StatsCallback, run_with_stats, stats_flags
+from .rclone_stream import LsjsonEntry, RcloneJsonStream, RcloneLineStream
+from .rclone_verify import (
+    RcloneCheckEntry,
+    RcloneHashEntry,
+    parse_check_line,
+    parse_hashsum_line,
+)
 
 
 class Rclone:
@@ -72,6 +96,68 @@ class Rclone:
         # When in verbose mode, all commands are ran with "-vvv".
         self.verbose_mode: bool = False
 
+        # When a remote control backend is set, commands are sent to a long
+        # running "rclone rcd" instead of starting a new rclone process. Any
+        # command the backend can't run is still ran as a normal process.
+        self.rcd_backend: Optional[RcloneRcdBackend] = None
+
+        # When a listing cache is set, lsjson (and so the other ls commands)
+        # return the cached output for a path where possible. Any changes
+        # made through the wrappers invalidate the listings they affect.
+        self.listing_cache: Optional[RcloneListingCache] = None
+
+        # When in live stats mode, transfers are ran with a JSON log, which is
+        # read as it is written. Each stats_interval, the transfer statistics
+        # are passed to every stats callback, and log messages are logged as
+        # they happen, rather than once the command finishes.
+        self.live_stats_mode: bool = False
+        self.stats_interval: str = "1s"
+        self.stats_callbacks: List[StatsCallback] = []
+
+        # Every command ran records its wall time, CPU time, output volume and
+        # return code, which are passed to each of the metrics sinks.
+        self.metrics_sinks: List[MetricsSink] = []
+
+        # When in bytes output mode, outputs keep the raw bytes rclone wrote,
+        # and only decode them into lines when output or error are accessed.
+        # See RcloneBytesOutput.
+        self.bytes_output_mode: bool = False
+
+        # When a retry policy is set, commands failing with a retryable return
+        # code are ran again after a backoff. When a rate limiter is set, the
+        # rate commands are started against each remote is limited. Both can
+        # be shared between instances and threads.
+        self.retry_policy: Optional[RcloneRetryPolicy] = None
+        self.rate_limiter: Optional[RcloneRateLimiter] = None
+
+        # Commands running for longer than timeout seconds are stopped, and
+        # return TIMEOUT with whatever output they wrote. Stopped commands are
+        # sent SIGTERM, then SIGKILL if still running kill_grace seconds
+        # later. Per call timeouts, deadlines and cancel handles can be added
+        # for a block of calls with limits.
+        self.timeout: Optional[float] = None
+        self.kill_grace: float = 5.0
+        self._thread_limits: Dict[int, List[RcloneLimits]] = {}
+        self._limits_lock: threading.Lock = threading.Lock()
+
+        # In backend flags mode, commands are given the flags that suit the
+        # backends of the remotes they use, ie "--fast-list" only where it is
+        # supported, and "--checkers" and "--transfers" tuned for them. It is
+        # off by default, as it changes the command lines that are ran. When a
+        # feature cache is set, features found by probe_features are saved to
+        # it, and used in place of the built in table.
+        self.backend_flags_mode: bool = False
+        self.feature_cache: Optional[RcloneFeatureCache] = None
+
+        # In native local mode, lsjson (and so the other ls commands) and
+        # "size --json" of local paths and local type remotes are done in
+        # process with os.scandir, rather than by starting rclone, giving the
+        # same output. Listings with flags that can't be done in process are
+        # still ran by rclone. With native_local_workers above 1, each level
+        # of directories is read in parallel.
+        self.native_local_mode: bool = False
+        self.native_local_workers: int = 1
+
     def listremotes(self) -> List[str]:
         """listremotes
 
@@ -82,6 +168,329 @@ class Rclone:
 
         return [f"{remote.name}:" for remote in self.config.remotes]
 
+    def remote_of(self, path: str) -> Optional[str]:
+        """remote_of
+
+        Return the name of the configured remote a given path is on, ie
+        "dropbox" for "dropbox:Photos". None is returned for local paths and
+        remotes that are not in the config.
+        """
+
+        if ":" not in path:
+            return None
+
+        remote_name: str = path.split(":", 1)[0]
+
+        for remote in self.config.remotes:
+            if remote.name == remote_name:
+                return remote_name
+
+        return None
+
+    def _config_remote(self, remote_name: str) -> Optional[RCloneRemote]:
+        """_config_remote
+
+        The remote with a given name in the config, if there is one.
+        """
+
+        for remote in self.config.remotes:
+            if remote.name == remote_name:
+                return remote
+
+        return None
+
+    def backend_features(self, path: str) -> RcloneBackendFeatures:
+        """backend_features
+
+        The features of the backend a path is on, ie the local backend for
+        local paths. Wrapping backends, such as crypt, take the features of
+        the remote they wrap. Remotes that aren't in the config get
+        UNKNOWN_FEATURES.
+        """
+        return self._backend_features(path, 0)
+
+    def _backend_features(self, path: str, depth: int) -> RcloneBackendFeatures:
+        """_backend_features
+
+        See backend_features. depth guards against wrapping loops.
+        """
+
+        if ":" not in path:
+            return replace(BACKEND_FEATURES["local"])
+
+        remote: Optional[RCloneRemote] = self._config_remote(path.split(":", 1)[0])
+
+        if remote is None:
+            return replace(UNKNOWN_FEATURES)
+
+        remote_type: str = remote.options.remote_type
+        wrapped_remote: Optional[str] = remote.options.wrapped_remote
+
+        if self.feature_cache is not None:
+            cached_features: Optional[RcloneBackendFeatures] = self.feature_cache.get(
+                remote.name, remote_type
+            )
+
+            if cached_features is not None:
+                return cached_features
+
+        if remote_type in WRAPPING_BACKENDS and wrapped_remote and depth < 10:
+            return wrapped_features(
+                remote_type, self._backend_features(wrapped_remote, depth + 1)
+            )
+
+        return replace(BACKEND_FEATURES.get(remote_type, UNKNOWN_FEATURES))
+
+    def wraps_remote(self, path: str) -> bool:
+        """wraps_remote
+
+        Check if the remote a path is on is stored on other remotes, ie an
+        alias, crypt, union or other wrapping backend.
+        """
+
+        remote: Optional[RCloneRemote] = (
+            self._config_remote(path.split(":", 1)[0]) if ":" in path else None
+        )
+
+        return remote is not None and (
+            remote.options.remote_type in WRAPPING_BACKENDS + JOINING_BACKENDS
+        )
+
+    def underlying_path(self, path: str) -> Optional[str]:
+        """underlying_path
+
+        The path on the backend which actually stores a path, following any
+        wrapping remotes, ie "drive:Photos/2019" for "photos:2019", where
+        photos is an alias of "drive:Photos". Wrappers which rename what they
+        wrap, such as crypt, give the whole path they wrap. Local paths are
+        made absolute.
+
+        None is returned for remotes which join several others, such as union
+        and combine, as their paths could be on any of them.
+        """
+
+        for _ in range(10):
+            remote: Optional[RCloneRemote] = (
+                self._config_remote(path.split(":", 1)[0]) if ":" in path else None
+            )
+
+            if remote is None:
+                break
+
+            remote_type: str = remote.options.remote_type
+            wrapped_remote: Optional[str] = remote.options.wrapped_remote
+
+            if remote_type in JOINING_BACKENDS:
+                return None
+
+            if remote_type == LOCAL_TYPE:
+                path = path.split(":", 1)[1]
+                break
+
+            if remote_type not in WRAPPING_BACKENDS or not wrapped_remote:
+                break
+
+            remote_path: str = path.split(":", 1)[1].strip("/")
+            path = wrapped_remote
+
+            if remote_type in PATH_PRESERVING_WRAPPERS and remote_path:
+                path = f"{wrapped_remote.rstrip('/')}/{remote_path}"
+        else:
+            return None
+
+        return path if ":" in path else os.path.abspath(path)
+
+    def probe_features(self, remote: str) -> Optional[RcloneBackendFeatures]:
+        """probe_features
+
+        Ask rclone for the features of the backend of a configured remote,
+        with "rclone backend features", rather than relying on the built in
+        table. None is returned if it can't be probed.
+
+        The result is saved to the feature cache, if one is set, so later
+        commands use it, and the remote doesn't have to be probed again.
+        """
+
+        remote_name: Optional[str] = self.remote_of(remote)
+        config_remote: Optional[RCloneRemote] = (
+            self._config_remote(remote_name) if remote_name is not None else None
+        )
+
+        if config_remote is None:
+            return None
+
+        command_output: RcloneOutput = self.command(
+            "backend", ["features", f"{config_remote.name}:"]
+        )
+
+        if command_output.return_code is not RcloneError.SUCCESS:
+            return None
+
+        try:
+            probe: Dict[str, object] = json.loads("".join(command_output.output))
+        except ValueError:
+            self.logger.exception(f"Can't parse the features of {remote}")
+            return None
+
+        features: RcloneBackendFeatures = features_from_probe(
+            probe, config_remote.options.remote_type
+        )
+
+        if self.feature_cache is not None:
+            self.feature_cache.put(
+                config_remote.name, config_remote.options.remote_type, probe
+            )
+
+        return features
+
+    def _listing_flags(self, remote: str) -> List[str]:
+        """_listing_flags
+
+        The flags to speed up listing remote, ie "--fast-list" if its backend
+        supports it.
+        """
+
+        if self.backend_flags_mode and not self.backend_features(remote).fast_list:
+            return []
+
+        return ["--fast-list"]
+
+    def _local_root(self, path: str) -> Optional[str]:
+        """_local_root
+
+        The local directory a path refers to, ie the path itself for local
+        paths, or the path within a remote of the local type. None is returned
+        for other remotes, and local remotes with options set which may change
+        the listing, such as "copy_links".
+        """
+
+        if ":" not in path:
+            return path or None
+
+        remote_name, remote_path = path.split(":", 1)
+        remote: Optional[RCloneRemote] = self._config_remote(remote_name)
+
+        if (
+            remote is None
+            or remote.options.remote_type != LOCAL_TYPE
+            or any(
+                option not in NEUTRAL_OPTIONS for option in remote.options.option_names
+            )
+        ):
+            return None
+
+        return remote_path or "."
+
+    def _native_local(
+        self, command: str, remote: str, flags: List[str]
+    ) -> Optional[RcloneOutput]:
+        """_native_local
+
+        Run lsjson or "size --json" of a local path in process, when in native
+        local mode. None is returned if rclone should run the command instead.
+        """
+
+        if not self.native_local_mode or self.current_limits().stopped() is not None:
+            return None
+
+        root: Optional[str] = self._local_root(remote)
+
+        if root is None:
+            return None
+
+        native_output: Optional[Tuple[bytes, bytes]] = (
+            local_lsjson(root, flags, self.native_local_workers)
+            if command == "lsjson"
+            else local_size(root, flags, self.native_local_workers)
+        )
+
+        if native_output is None:
+            self.logger.debug(f"Running {command} of {remote} with rclone")
+            return None
+
+        self.logger.debug(f"Ran {command} of {remote} in process")
+        return self._make_output(
+            RcloneError.SUCCESS.value, native_output[0], native_output[1]
+        )
+
+    def run_many(
+        self,
+        specs: Iterable[RcloneCommandSpec],
+        max_workers: int = 4,
+        remote_limits: Optional[Dict[str, int]] = None,
+    ) -> RcloneBatchResult:
+        """run_many
+
+        Run many commands concurrently, returning their outputs in order.
+
+        See RcloneExecutor for how max_workers and remote_limits are applied.
+        """
+
+        return RcloneExecutor(self, max_workers, remote_limits).run(specs)
+
+    @contextmanager
+    def limits(
+        self,
+        timeout: Optional[float] = None,
+        deadline: Union[RcloneDeadline, float, None] = None,
+        cancel_handle: Optional[RcloneCancelHandle] = None,
+    ) -> Iterator[RcloneLimits]:
+        """limits
+
+        Limit the commands ran by this thread within the block, ie:
+            with rclone.limits(timeout=60, deadline=300, cancel_handle=handle):
+                rclone.sync("/local", "dropbox:Backup")
+                rclone.check("/local", "dropbox:Backup")
+
+        Each command can run for at most timeout seconds, and all of them must
+        finish within deadline seconds (or by an RcloneDeadline, to share it
+        between blocks). Cancelling the handle from another thread stops the
+        running command. Stopped commands return TIMEOUT or CANCELLED, and
+        later commands return straight away without running.
+
+        Blocks can be nested, in which case the tightest limits apply.
+        Streams and batches started in the block keep its limits.
+        """
+
+        if isinstance(deadline, (int, float)):
+            deadline = RcloneDeadline(deadline)
+
+        block_limits: RcloneLimits = self.current_limits().merge(
+            RcloneLimits(timeout, deadline, cancel_handle)
+        )
+        thread_id: int = threading.get_ident()
+
+        with self._limits_lock:
+            self._thread_limits.setdefault(thread_id, []).append(block_limits)
+
+        try:
+            yield block_limits
+        finally:
+            with self._limits_lock:
+                self._thread_limits[thread_id].pop()
+
+                if not self._thread_limits[thread_id]:
+                    del self._thread_limits[thread_id]
+
+    def current_limits(self) -> RcloneLimits:
+        """current_limits
+
+        The limits on commands ran by this thread right now, ie the default
+        timeout combined with any blocks from limits.
+        """
+
+        default_limits: RcloneLimits = RcloneLimits(self.timeout)
+
+        with self._limits_lock:
+            block_limits: List[RcloneLimits] = self._thread_limits.get(
+                threading.get_ident(), []
+            )
+
+            if not block_limits:
+                return default_limits
+
+            return default_limits.merge(block_limits[-1])
+
     def _execute(self, command_to_run: List[str]) -> RcloneOutput:
         """_execute
 
@@ -93,32 +502,115 @@ class Rclone:
         """
         self.logger.debug(f"Running: {command_to_run}")
 
+        if self.rcd_backend is not None:
+            rcd_output: Optional[RcloneOutput] = self.rcd_backend.execute(
+                command_to_run, self.current_limits()
+            )
+
+            if rcd_output is not None:
+                return rcd_output
+
         try:
             with subprocess.Popen(
                 command_to_run, stdout=subprocess.PIPE, stderr=subprocess.PIPE
             ) as rclone_process:
-                communication_output: Tuple[bytes, bytes] = rclone_process.communicate()
+                with RcloneProcessWatch(
+                    rclone_process, self.current_limits(), self.kill_grace
+                ) as watch:
+                    communication_output: Tuple[bytes, bytes] = (
+                        rclone_process.communicate()
+                    )
+
+                if watch.reason is not None:
+                    self.logger.warning(
+                        f"Stopped {command_to_run}: {watch.reason.name}"
+                    )
+
+                return self._make_output(
+                    (
+                        rclone_process.returncode
+                        if watch.reason is None
+                        else watch.reason.value
+                    ),
+                    communication_output[0],
+                    communication_output[1],
+                )
+        except Exception as exception:  # pylint: disable=broad-except
+            return self._exception_output(command_to_run, exception)
 
-                output: str = communication_output[0].decode("utf-8")
-                error: str = communication_output[1].decode("utf-8")
-                self.logger.debug(f"Command returned {output}")
+    def _execute_with_stats(
+        self, command_to_run: List[str], limits: Optional[RcloneLimits] = None
+    ) -> RcloneOutput:
+        """_execute_with_stats
 
-                if error:
-                    self.logger.warning(error.replace("\\n", "\n"))
+        Run a given rclone command, reporting its statistics and log as it
+        runs. The command is stopped by limits, or the current limits of the
+        thread if not given. See _execute.
+        """
+        self.logger.debug(f"Running with live stats: {command_to_run}")
 
-                return RcloneOutput(
-                    RcloneError(rclone_process.returncode),
-                    output.splitlines(),
-                    error.splitlines(),
-                )
-        except FileNotFoundError as file_missing:
-            self.logger.exception(f"Can't find rclone executable. {file_missing}")
+        try:
+            return run_with_stats(
+                command_to_run,
+                self.logger,
+                self.stats_callbacks,
+                limits if limits is not None else self.current_limits(),
+                self.kill_grace,
+                self.bytes_output_mode,
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            return self._exception_output(command_to_run, exception)
+
+    def _exception_output(
+        self, command_to_run: List[str], exception: Exception
+    ) -> RcloneOutput:
+        """_exception_output
+
+        Log an exception raised running a given command, and return its
+        output, ie RCLONE_MISSING if rclone couldn't be found.
+        """
+
+        if isinstance(exception, FileNotFoundError):
+            self.logger.exception(f"Can't find rclone executable. {exception}")
             return RcloneOutput(RcloneError.RCLONE_MISSING, [""], [""])
-        except Exception as exception:
-            self.logger.exception(
-                f"Exception running {command_to_run}. Exception: {exception}"
+
+        self.logger.exception(
+            f"Exception running {command_to_run}. Exception: {exception}"
+        )
+        return RcloneOutput(RcloneError.PYTHON_EXCEPTION, [""], [""])
+
+    def _make_output(
+        self, return_code: int, output_bytes: bytes, error_bytes: bytes
+    ) -> RcloneOutput:
+        """_make_output
+
+        Decode the raw output of a finished rclone process into an RcloneOutput.
+
+        In bytes output mode, the output isn't decoded, other than to log it
+        if the logger would output it.
+        """
+
+        if self.bytes_output_mode:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Command returned {output_bytes.decode('utf-8')}")
+
+            if error_bytes and self.logger.isEnabledFor(logging.WARNING):
+                self.logger.warning(error_bytes.decode("utf-8").replace("\\n", "\n"))
+
+            return RcloneBytesOutput(
+                RcloneError(return_code), output_bytes, error_bytes
             )
-            return RcloneOutput(RcloneError.PYTHON_EXCEPTION, [""], [""])
+
+        output: str = output_bytes.decode("utf-8")
+        error: str = error_bytes.decode("utf-8")
+        self.logger.debug(f"Command returned {output}")
+
+        if error:
+            self.logger.warning(error.replace("\\n", "\n"))
+
+        return RcloneOutput(
+            RcloneError(return_code), output.splitlines(), error.splitlines()
+        )
 
     def command(self, command: str, arguments: Iterable[str] = tuple()) -> RcloneOutput:
         """command
@@ -142,9 +634,121 @@ class Rclone:
         This will add on the associated rclone parts (ie, "rclone", "--conf XXXX")
         """
 
+        command_run: RcloneCommandRun = RcloneCommandRun(self, command, arguments)
+
+        while True:
+            rate_limit_delay: float = command_run.rate_limit_delay()
+
+            if rate_limit_delay > 0:
+                time.sleep(rate_limit_delay)
+
+            stopped_output: Optional[RcloneOutput] = command_run.start()
+
+            if stopped_output is not None:
+                return stopped_output
+
+            command_output: RcloneOutput = (
+                self._execute_with_stats(command_run.command_line)
+                if command_run.live_stats
+                else self._execute(command_run.command_line)
+            )
+            retry_delay: Optional[float] = command_run.finish(command_output)
+
+            if retry_delay is None:
+                return command_output
+
+            # Cancelling the handle ends the wait, then the command is stopped
+            # when it is started again.
+            command_run.limits.sleep(retry_delay)
+
+    def _remotes_of(self, full_command: List[str]) -> List[str]:
+        """_remotes_of
+
+        The configured remotes a built command uses, in order.
+        """
+
+        remotes: List[str] = []
+
+        for argument in full_command[2:]:
+            remote: Optional[str] = self.remote_of(argument)
+
+            if remote is not None and remote not in remotes:
+                remotes.append(remote)
+
+        return remotes
+
+    def _record_metrics(
+        self,
+        command: str,
+        remote: Optional[str],
+        start_time: float,
+        cpu_time: Optional[float],
+        command_output: RcloneOutput,
+    ) -> None:
+        """_record_metrics
+
+        Pass the metrics of a finished command to the metrics sinks.
+        """
+
+        if not self.metrics_sinks:
+            return
+
+        wall_time: float = time.monotonic() - start_time
+
+        metrics: RcloneCommandMetrics = RcloneCommandMetrics(
+            command,
+            remote,
+            wall_time,
+            cpu_time,
+            command_output.output_size(),
+            command_output.error_size(),
+            command_output.return_code,
+        )
+
+        for sink in self.metrics_sinks:
+            try:
+                sink(metrics)
+            except Exception as exception:  # pylint: disable=broad-except
+                self.logger.exception(f"Metrics sink failed: {exception}")
+
+    def _prepare_command(
+        self, command: str, arguments: Iterable[str]
+    ) -> Optional[List[str]]:
+        """_prepare_command
+
+        Check a given command is safe to run in the current mode, and build its
+        full command line. None is returned if the command must not be ran.
+        """
+
+        arguments = list(arguments)
+
         if self.dry_run_mode and "--dry-run" not in arguments:
             self.logger.warning("Attempted to run non-trial command in dry-run mode.")
-            return RcloneOutput(RcloneError.PYTHON_EXCEPTION, [""], [""])
+            return None
+
+        if self.backend_flags_mode:
+            arguments += tuning_flags(
+                command,
+                arguments,
+                (
+                    self.backend_features(path)
+                    for path in [
+                        argument
+                        for argument in arguments
+                        if not argument.startswith("-")
+                    ][:2]
+                ),
+            )
+
+        return self._build_command(command, arguments)
+
+    def _build_command(self, command: str, arguments: Iterable[str]) -> List[str]:
+        """_build_command
+
+        Build the full command line for a given command and its arguments.
+
+        This will add on the associated rclone parts (ie, "rclone", "-vvv")
+        """
 
         full_command: List[str] = ["rclone", command]
         full_command += arguments
@@ -152,7 +756,7 @@ class Rclone:
         if self.verbose_mode and "-vvv" not in full_command:
             full_command += ["-vvv"]
 
-        return self._execute(full_command)
+        return full_command
 
     def dry_run_command(
         self, command: str, arguments: Iterable[str] = tuple()
@@ -164,82 +768,238 @@ class Rclone:
 
         return self.run_command(command, ["--dry-run"] + list(arguments))
 
-    def lsjson(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+    def lsjson(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
         """lsjson
 
         Wrap the rclone lsjson command.
+
+        If a listing filter is given, it is applied by rclone, so only the
+        matching entries are listed.
         """
-        return self.command("lsjson", [remote] + list(flags) + ["--fast-list"])
+        flags = list(flags) + listing_flags(listing_filter)
+        generation: int = 0
 
-    def ls(  # pylint: disable=C0103
-        self, remote: str, flags: Iterable[str] = tuple()
-    ) -> RcloneOutput:
-        """ls
+        if self.listing_cache is not None:
+            generation = self.listing_cache.generation
+            cached_output: Optional[RcloneOutput] = self.listing_cache.get(
+                remote, flags, self.bytes_output_mode
+            )
 
-        Wrap the rclone ls command.
+            if cached_output is not None:
+                return cached_output
+
+        native_output: Optional[RcloneOutput] = self._native_local(
+            "lsjson", remote, flags
+        )
+        command_output: RcloneOutput = (
+            native_output
+            if native_output is not None
+            else self.command("lsjson", [remote] + flags + self._listing_flags(remote))
+        )
+
+        if (
+            self.listing_cache is not None
+            and command_output.return_code is RcloneError.SUCCESS
+        ):
+            self.listing_cache.put(remote, flags, command_output, generation)
+
+        return command_output
+
+    def _invalidate_listings(self, *paths: str) -> None:
+        """_invalidate_listings
+
+        Remove any cached listings that may be changed by modifying the given
+        paths, including listings of them made through wrapping remotes.
+        Nothing is changed in dry run mode, so nothing is removed.
         """
 
-        if self.json_by_default:
-            return self.lsjson(remote, ["-R"] + list(flags))
+        if self.listing_cache is None or self.dry_run_mode:
+            return
 
-        return self.command("ls", [remote] + list(flags))
+        for path in paths:
+            self.listing_cache.invalidate(path, self.underlying_path)
 
-    @staticmethod
-    def _filter_json(command_output: RcloneOutput, only_folders: bool) -> RcloneOutput:
-        """_filter_json
+    def iter_lsjson(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneJsonStream:
+        """iter_lsjson
 
-        Helper to remove either files or folders from a given output.
+        Wrap the rclone lsjson command, returning a stream of the parsed
+        entries rather than the buffered output.
 
-        If only_folders is set, then only folders are kept.
-        Otherwise, only files are kept.
+        The entries are read from rclone as they are produced, so the memory
+        used is independent of the size of the listing. Once the stream has
+        been consumed, its return_code and error are set.
         """
 
-        filtered_output: List[str] = []
+        arguments: List[str] = (
+            [remote]
+            + list(flags)
+            + listing_flags(listing_filter)
+            + self._listing_flags(remote)
+        )
 
-        output_line: str
-        for output_line in command_output.output:
+        if self.dry_run_mode:
+            arguments = ["--dry-run"] + arguments
+
+        return RcloneJsonStream(
+            self._build_command("lsjson", arguments),
+            self.logger,
+            self.current_limits(),
+            self.kill_grace,
+        )
+
+    def iter_check(
+        self,
+        source: str,
+        destination: str,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneLineStream[RcloneCheckEntry]:
+        """iter_check
+
+        Wrap the rclone check command, returning a stream of the result for
+        each file, ie if it matches, differs or is missing on either side, as
+        rclone checks them. See RcloneCheckStatus.
+
+        As with rclone, the return code is an error if any file didn't match.
+        """
 
-            if only_folders and '"IsDir":false' in output_line:
-                continue
+        return RcloneLineStream(
+            self._build_command(
+                "check", [source, destination, "--combined", "-"] + list(flags)
+            ),
+            self.logger,
+            parse_check_line,
+            self.current_limits(),
+            self.kill_grace,
+        )
+
+    def iter_hashsum(
+        self,
+        hash_type: str,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneLineStream[RcloneHashEntry]:
+        """iter_hashsum
+
+        Wrap the rclone hashsum command, returning a stream of the hash of
+        each file, as rclone produces them. Hashes are lower case.
+        """
 
-            if not only_folders and '"IsDir":true' in output_line:
-                continue
+        return RcloneLineStream(
+            self._build_command("hashsum", [hash_type, remote] + list(flags)),
+            self.logger,
+            parse_hashsum_line,
+            self.current_limits(),
+            self.kill_grace,
+        )
+
+    def iter_lsjson_sharded(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+        shard_depth: int = 1,
+        max_workers: int = 4,
+    ) -> RcloneShardedListing:
+        """iter_lsjson_sharded
+
+        Recursively list a remote as a stream of parsed entries, like
+        iter_lsjson with "-R", but split into a recursive listing of each
+        directory shard_depth levels down, with up to max_workers listings
+        running at once. See RcloneShardedListing.
+
+        This suits huge trees, where a single listing would walk millions of
+        directories one after another, or need too much memory for
+        "--fast-list". The filter shouldn't set a max depth. Include and
+        exclude patterns containing a "/" are matched from the root of the
+        listing, so can't be split into shards, and the remote is listed by a
+        single "lsjson -R" instead.
+        """
 
-            filtered_output.append(output_line)
+        return RcloneShardedListing(
+            self,
+            remote,
+            list(flags) + listing_flags(listing_filter),
+            shard_depth,
+            max_workers,
+        )
 
-        command_output.output = filtered_output
+    def ls(  # pylint: disable=C0103
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """ls
 
-        return command_output
+        Wrap the rclone ls command.
+        """
 
-    def lsd(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+        if self.json_by_default:
+            return self.lsjson(remote, ["-R"] + list(flags), listing_filter)
+
+        return self.command(
+            "ls", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
+
+    def lsd(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
         """lsd
 
         Wrap the rclone lsd command.
         """
+
         if self.json_by_default:
-            command_output: RcloneOutput = self.lsjson(remote, flags)
-            return self._filter_json(command_output, True)
+            return self.lsjson(remote, flags, only_dirs(listing_filter))
 
-        return self.command("lsd", [remote] + list(flags))
+        return self.command(
+            "lsd", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
 
-    def lsl(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+    def lsl(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
         """lsl
 
         Wrap the rclone lsl command.
         """
 
         if self.json_by_default:
-            command_output: RcloneOutput = self.lsjson(remote, ["-R"] + list(flags))
-            return self._filter_json(command_output, False)
+            return self.lsjson(remote, ["-R"] + list(flags), only_files(listing_filter))
 
-        return self.command("lsl", [remote] + list(flags))
+        return self.command(
+            "lsl", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
 
-    def lsf(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+    def lsf(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
         """lsf
 
         Wrap the rclone lsf command.
         """
-        return self.command("lsf", [remote] + list(flags))
+        return self.command(
+            "lsf", [remote] + list(flags) + listing_flags(listing_filter)
+        )
 
     def delete(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
         """delete
@@ -274,7 +1034,246 @@ class Rclone:
 
         Wrap the rclone size command.
         """
-        return self.command("size", [remote] + list(flags))
+
+        flags = list(flags)
+        native_output: Optional[RcloneOutput] = self._native_local(
+            "size", remote, flags
+        )
+
+        if native_output is not None:
+            return native_output
+
+        return self.command("size", [remote] + flags)
+
+    def open_read(
+        self,
+        remote_path: str,
+        offset: int = 0,
+        count: Optional[int] = None,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneReadStream:
+        """open_read
+
+        Open an object for reading, with "rclone cat", as a file like stream
+        of its content. Only count bytes from offset are read if count is
+        given, and a negative offset is from the end of the object. See
+        RcloneReadStream.
+        """
+
+        arguments: List[str] = [remote_path] + list(flags)
+
+        if offset:
+            arguments += ["--offset", str(offset)]
+
+        if count is not None:
+            arguments += ["--count", str(count)]
+
+        return RcloneReadStream(
+            self._build_command("cat", arguments),
+            self.logger,
+            self.current_limits(),
+            self.kill_grace,
+        )
+
+    def open_write(
+        self,
+        remote_path: str,
+        size: Optional[int] = None,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneWriteStream:
+        """open_write
+
+        Open an object for writing, with "rclone rcat", as a file like stream
+        uploaded to it. If the size is known, giving it lets rclone upload
+        the object in one go where a backend needs the size up front. See
+        RcloneWriteStream.
+
+        In dry run mode, rclone reads and discards what is written.
+        """
+
+        arguments: List[str] = [remote_path] + list(flags)
+
+        if size is not None:
+            arguments += ["--size", str(size)]
+
+        if self.dry_run_mode and "--dry-run" not in arguments:
+            arguments = ["--dry-run"] + arguments
+
+        self._invalidate_listings(remote_path)
+
+        return RcloneWriteStream(
+            self._build_command("rcat", arguments),
+            self.logger,
+            self.current_limits(),
+            self.kill_grace,
+        )
+
+    def rcat(
+        self,
+        remote_path: str,
+        content: Iterable[bytes],
+        size: Optional[int] = None,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneOutput:
+        """rcat
+
+        Wrap the rclone rcat command, uploading content given as chunks of
+        bytes, ie from a generator, to an object as they are produced. See
+        open_write.
+        """
+
+        stream: RcloneWriteStream = self.open_write(remote_path, size, flags)
+
+        try:
+            for chunk in content:
+                stream.write(chunk)
+        except BrokenPipeError:
+            self.logger.warning(f"rclone exited before {remote_path} was written")
+        except BaseException:
+            stream.abort()
+            raise
+
+        stream.close()
+
+        return RcloneOutput(
+            (
+                stream.return_code
+                if stream.return_code is not None
+                else RcloneError.PYTHON_EXCEPTION
+            ),
+            [],
+            stream.error,
+        )
+
+    def size_tree(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneSizeTree:
+        """size_tree
+
+        Recursively list a remote once, and total up the size of every
+        directory in it. The size of any directory below remote can then be
+        looked up without running rclone again.
+        """
+
+        listing: RcloneJsonStream = self.iter_lsjson(
+            remote, ["-R"] + list(flags), listing_filter
+        )
+        size_tree: RcloneSizeTree = RcloneSizeTree(listing)
+
+        size_tree.return_code = listing.return_code
+        size_tree.complete = listing.return_code is RcloneError.SUCCESS
+
+        return size_tree
+
+    def hash_index(
+        self,
+        remotes: Optional[Iterable[str]] = None,
+        hash_type: Optional[str] = None,
+        flags: Iterable[str] = tuple(),
+    ) -> RcloneHashIndex:
+        """hash_index
+
+        Recursively list the files of remotes (by default every remote in the
+        config which isn't stored on other remotes, such as an alias or a
+        crypt) with their hash_type hashes, and index where each hash is, to
+        find duplicates across them. Nothing is downloaded, though some
+        backends have to read files to hash them.
+
+        By default, the hash type is one all of the backends store, or md5 if
+        there isn't one.
+
+        Raises ValueError, before listing anything, if any of the remotes
+        could hold the same files, such as an alias and the remote it points
+        to, as each file would then be indexed as its own duplicate.
+        """
+
+        if remotes is None:
+            remotes = [
+                remote for remote in self.listremotes() if not self.wraps_remote(remote)
+            ]
+
+        remotes = list(remotes)
+        check_locations(self, remotes)
+
+        if hash_type is None:
+            hash_type = common_hash_type(
+                self.backend_features(remote) for remote in remotes
+            )
+
+            if hash_type is None:
+                self.logger.warning(f"{remotes} have no hash type in common")
+                hash_type = "md5"
+
+        hash_index: RcloneHashIndex = RcloneHashIndex(hash_type)
+
+        for remote in remotes:
+            listing: RcloneJsonStream = self.iter_lsjson(
+                remote,
+                ["-R", "--hash", "--hash-type", hash_type] + list(flags),
+                RcloneListingFilter(files_only=True),
+            )
+            hash_index.add_listing(remote, listing)
+            hash_index.return_codes[remote] = listing.return_code
+
+        return hash_index
+
+    def retention_plan(
+        self,
+        remote: str,
+        policy: RcloneRetentionPolicy,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneRetentionPlan:
+        """retention_plan
+
+        List the backups directly inside remote, and work out which of them a
+        retention policy keeps. Nothing is deleted; see prune.
+
+        The backups are the folders in remote, unless listing_filter says
+        otherwise. If the listing fails, nothing is marked for deletion.
+        Raises ValueError if the policy doesn't keep any backups.
+        """
+
+        policy.check()
+
+        if listing_filter is None:
+            listing_filter = RcloneListingFilter(dirs_only=True)
+
+        listing: RcloneJsonStream = self.iter_lsjson(remote, flags, listing_filter)
+        plan: RcloneRetentionPlan = plan_retention(listing, policy)
+        plan.return_code = listing.return_code
+
+        if plan.return_code is not RcloneError.SUCCESS:
+            self.logger.warning(
+                f"Listing {remote} failed with {plan.return_code}, keeping all backups"
+            )
+            plan.keep += plan.delete
+            plan.delete = []
+
+        return plan
+
+    def prune(
+        self,
+        remote: str,
+        policy: RcloneRetentionPolicy,
+        flags: Iterable[str] = tuple(),
+        dry_run: bool = False,
+    ) -> Tuple[RcloneRetentionPlan, RcloneBulkResult]:
+        """prune
+
+        Delete the backups in remote which a retention policy doesn't keep,
+        with a single batched delete. With dry_run, rclone only reports what
+        it would delete. Raises ValueError if the policy doesn't keep any
+        backups.
+        """
+
+        flags = list(flags)
+        plan: RcloneRetentionPlan = self.retention_plan(remote, policy, flags)
+
+        return (plan, plan.apply(self, remote, flags, dry_run))
 
     def sync(
         self, local: str, remote: str, flags: Iterable[str] = tuple()
@@ -302,3 +1301,486 @@ class Rclone:
         Wrap the rclone move command.
         """
         return self.command("move", [local] + [remote] + list(flags))
+
+    def _bulk(
+        self,
+        run_chunk: Callable[[List[str]], RcloneOutput],
+        paths: Iterable[str],
+        list_flag: str,
+        chunk_size: int,
+    ) -> RcloneBulkResult:
+        """_bulk
+
+        Run a command over many paths, chunk_size paths at a time.
+
+        Each chunk is written to a file given by list_flag, and ran with
+        logging to give a result per path.
+        """
+
+        log_flags: List[str] = ["--use-json-log"]
+        if not self.verbose_mode:
+            log_flags.append("-v")
+
+        bulk_result: RcloneBulkResult = RcloneBulkResult()
+
+        for chunk in chunks(paths, chunk_size):
+            with files_from(chunk) as list_path:
+                bulk_result.add_output(run_chunk([list_flag, list_path] + log_flags))
+
+        return bulk_result
+
+    def delete_many(
+        self,
+        remote: str,
+        paths: Iterable[str],
+        flags: Iterable[str] = tuple(),
+        chunk_size: int = 10000,
+        directories: bool = False,
+    ) -> RcloneBulkResult:
+        """delete_many
+
+        Delete many paths, given relative to remote, with one delete command
+        per chunk_size paths rather than one per path.
+
+        If directories is set, the paths are folders, which are removed along
+        with everything in them.
+        """
+
+        flags = list(flags)
+
+        if directories:
+            paths = (f"/{escape_glob(path.strip('/'))}/**" for path in paths)
+            return self._bulk(
+                lambda list_flags: self.delete(
+                    remote, list_flags + ["--rmdirs"] + flags
+                ),
+                paths,
+                "--include-from",
+                chunk_size,
+            )
+
+        return self._bulk(
+            lambda list_flags: self.delete(remote, list_flags + flags),
+            paths,
+            "--files-from-raw",
+            chunk_size,
+        )
+
+    def copy_many(
+        self,
+        source: str,
+        destination: str,
+        paths: Iterable[str],
+        flags: Iterable[str] = tuple(),
+        chunk_size: int = 10000,
+    ) -> RcloneBulkResult:
+        """copy_many
+
+        Copy many files, given relative to source, to the same relative path
+        in destination, with one copy command per chunk_size files.
+        """
+
+        flags = list(flags)
+        return self._bulk(
+            lambda list_flags: self.copy(
+                source, destination, list_flags + ["--no-traverse"] + flags
+            ),
+            paths,
+            "--files-from-raw",
+            chunk_size,
+        )
+
+    def move_many(
+        self,
+        source: str,
+        destination: str,
+        paths: Iterable[str],
+        flags: Iterable[str] = tuple(),
+        chunk_size: int = 10000,
+    ) -> RcloneBulkResult:
+        """move_many
+
+        Move many files, given relative to source, to the same relative path
+        in destination, with one move command per chunk_size files.
+        """
+
+        flags = list(flags)
+        return self._bulk(
+            lambda list_flags: self.move(
+                source, destination, list_flags + ["--no-traverse"] + flags
+            ),
+            paths,
+            "--files-from-raw",
+            chunk_size,
+        )
+
+    def copy_parallel(
+        self,
+        source: str,
+        destination: str,
+        flags: Iterable[str] = tuple(),
+        partitions: int = 4,
+        listing: Optional[Iterable[LsjsonEntry]] = None,
+    ) -> RcloneTransferResult:
+        """copy_parallel
+
+        Copy source to destination as several concurrent copy commands, each
+        given a partition of the files balanced by size. See plan_transfer.
+
+        The files are taken from the given listing of source, or otherwise
+        source is listed first.
+        """
+        return self._transfer_parallel(
+            False, source, destination, list(flags), partitions, listing
+        )
+
+    def sync_parallel(
+        self,
+        source: str,
+        destination: str,
+        flags: Iterable[str] = tuple(),
+        partitions: int = 4,
+        listing: Optional[Iterable[LsjsonEntry]] = None,
+    ) -> RcloneTransferResult:
+        """sync_parallel
+
+        Sync source to destination, by copying the files as in copy_parallel,
+        then, if every partition succeeded, running a single sync to delete
+        anything not in source, which has nothing left to transfer.
+        """
+        return self._transfer_parallel(
+            True, source, destination, list(flags), partitions, listing
+        )
+
+    def _transfer_parallel(  # pylint: disable=too-many-arguments
+        self,
+        sync: bool,
+        source: str,
+        destination: str,
+        flags: List[str],
+        partitions: int,
+        listing: Optional[Iterable[LsjsonEntry]],
+    ) -> RcloneTransferResult:
+        """_transfer_parallel
+
+        Plan and run a partitioned copy, with a final sync if sync is set.
+
+        Each partition is given to rclone with "--files-from-raw", without
+        "--no-traverse" as the lists are expected to be large.
+        """
+
+        plan, listing_output = self._plan_source(source, partitions, listing)
+
+        if listing_output is not None:
+            return RcloneTransferResult(
+                plan, RcloneBatchResult([listing_output], 0.0, 1)
+            )
+
+        with ExitStack() as list_files:
+            batch: RcloneBatchResult = self.run_many(
+                [
+                    RcloneCommandSpec(
+                        "copy",
+                        [
+                            source,
+                            destination,
+                            "--files-from-raw",
+                            list_files.enter_context(files_from(partition)),
+                        ]
+                        + flags,
+                    )
+                    for partition in plan.partitions
+                ],
+                max_workers=max(1, len(plan.partitions)),
+            )
+
+        sync_output: Optional[RcloneOutput] = None
+        if sync and batch.failures == 0:
+            sync_output = self.sync(source, destination, flags)
+
+        return RcloneTransferResult(plan, batch, sync_output)
+
+    def _plan_source(
+        self,
+        source: str,
+        partitions: int,
+        listing: Optional[Iterable[LsjsonEntry]],
+    ) -> Tuple[RcloneTransferPlan, Optional[RcloneOutput]]:
+        """_plan_source
+
+        Split the files of source into partitions, from the given listing of
+        it, or otherwise by listing it. If the listing fails, an empty plan is
+        returned, along with the output of the listing.
+        """
+
+        if listing is not None:
+            return plan_listing(listing, partitions), None
+
+        source_listing: RcloneJsonStream = self.iter_lsjson(
+            source, ["-R", "--files-only"]
+        )
+        plan: RcloneTransferPlan = plan_listing(source_listing, partitions)
+
+        if source_listing.return_code is not RcloneError.SUCCESS:
+            return RcloneTransferPlan(), RcloneOutput(
+                source_listing.return_code or RcloneError.PYTHON_EXCEPTION,
+                [],
+                source_listing.error,
+            )
+
+        return plan, None
+
+    def copy_fan_out(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        source: str,
+        destinations: Iterable[str],
+        flags: Iterable[str] = tuple(),
+        per_destination: int = 1,
+        max_workers: Optional[int] = None,
+        remote_limits: Optional[Dict[str, int]] = None,
+        listing: Optional[Iterable[LsjsonEntry]] = None,
+    ) -> RcloneFanOutResult:
+        """copy_fan_out
+
+        Copy source to each of many destinations concurrently, listing source
+        only once, rather than copying to each in turn.
+
+        The files are split into per_destination partitions balanced by size
+        (see plan_transfer), and each partition is copied to each destination
+        as its own copy command. rclone looks up the files it is given with
+        "--files-from-raw" directly, so source isn't listed again. Up to
+        max_workers commands run at once, by default all of them, such that
+        the job takes about as long as the slowest destination. remote_limits
+        are as in RcloneExecutor.
+
+        The files are taken from the given listing of source, or otherwise
+        source is listed first.
+        """
+
+        flags = list(flags)
+        destination_list: List[str] = []
+
+        for destination in destinations:
+            if destination not in destination_list:
+                destination_list.append(destination)
+
+        start_time: float = time.monotonic()
+
+        plan, listing_output = self._plan_source(source, per_destination, listing)
+
+        if listing_output is not None:
+            failed_batch: RcloneBatchResult = RcloneBatchResult(
+                [listing_output], 0.0, 1
+            )
+            return RcloneFanOutResult(
+                plan,
+                {
+                    destination: RcloneTransferResult(plan, failed_batch)
+                    for destination in destination_list
+                },
+                time.monotonic() - start_time,
+            )
+
+        outputs: List[List[Optional[RcloneOutput]]] = [
+            [None] * len(plan.partitions) for _ in destination_list
+        ]
+        finish_times: List[float] = [0.0] * len(destination_list)
+
+        with ExitStack() as list_files:
+            list_paths: List[str] = [
+                list_files.enter_context(files_from(partition))
+                for partition in plan.partitions
+            ]
+
+            # Ordered by partition then destination, so every destination is
+            # started on before any gets a second partition.
+            specs: List[RcloneCommandSpec] = [
+                RcloneCommandSpec(
+                    "copy",
+                    [source, destination, "--files-from-raw", list_path] + flags,
+                )
+                for list_path in list_paths
+                for destination in destination_list
+            ]
+            executor: RcloneExecutor = RcloneExecutor(
+                self, max_workers or max(1, len(specs)), remote_limits
+            )
+
+            for index, output in executor.as_completed(specs):
+                partition_index, destination_index = divmod(
+                    index, len(destination_list)
+                )
+                outputs[destination_index][partition_index] = output
+                finish_times[destination_index] = time.monotonic() - start_time
+
+        results: Dict[str, RcloneTransferResult] = {}
+
+        for destination_index, destination in enumerate(destination_list):
+            destination_outputs: List[RcloneOutput] = [
+                output for output in outputs[destination_index] if output is not None
+            ]
+            results[destination] = RcloneTransferResult(
+                plan,
+                RcloneBatchResult(
+                    destination_outputs,
+                    finish_times[destination_index],
+                    sum(
+                        output.return_code is not RcloneError.SUCCESS
+                        for output in destination_outputs
+                    ),
+                ),
+            )
+
+        return RcloneFanOutResult(plan, results, time.monotonic() - start_time)
+
+
+class RcloneCommandRun:
+    """RcloneCommandRun
+
+    The attempts at running a single command with an Rclone instance, ie its
+    command line, along with the rate limiting, limits, metrics and retries
+    around each attempt. Rclone and AsyncRclone share it, and only differ in
+    how they wait and run rclone:
+        command_run = RcloneCommandRun(rclone, "copy", arguments)
+        while True:
+            wait for command_run.rate_limit_delay() seconds
+            if command_run.start() isn't None, return it
+            run command_run.command_line within command_run.limits
+            if command_run.finish(command_output) is None, return the output
+            otherwise wait that many seconds, or until cancelled
+    """
+
+    def __init__(self, rclone: Rclone, command: str, arguments: Iterable[str]) -> None:
+        self.rclone: Rclone = rclone
+        self.command: str = command
+        self.limits: RcloneLimits = RcloneLimits()
+        self.attempt: int = 0
+
+        # pylint: disable=protected-access
+        full_command: Optional[List[str]] = rclone._prepare_command(command, arguments)
+
+        # The command line is empty if the command must not be ran.
+        self.command_line: List[str] = full_command or []
+        self.remotes: List[str] = rclone._remotes_of(self.command_line)
+
+        if self.command_line and self.live_stats:
+            self.command_line += stats_flags(rclone.stats_interval)
+
+        self._started: Tuple[float, Optional[RcloneCpuTimer]] = (0.0, None)
+
+    @property
+    def live_stats(self) -> bool:
+        """live_stats
+
+        If the command reports its statistics as it runs.
+        """
+        return self.rclone.live_stats_mode and self.command in STATS_COMMANDS
+
+    def rate_limit_delay(self) -> float:
+        """rate_limit_delay
+
+        Take a token from the rate limiter for each remote of the command,
+        returning how many seconds to wait before starting the attempt.
+        """
+
+        if self.rclone.rate_limiter is None or not self.command_line:
+            return 0.0
+
+        return self.rclone.rate_limiter.reserve(self.remotes)
+
+    def start(self) -> Optional[RcloneOutput]:
+        """start
+
+        Start an attempt, taking the current limits of the thread. The output
+        to return is given instead if the command must not be ran, or the
+        limits have already been reached.
+        """
+
+        if not self.command_line:
+            return RcloneOutput(RcloneError.PYTHON_EXCEPTION, [""], [""])
+
+        self.limits = self.rclone.current_limits()
+        stopped: Optional[RcloneError] = self.limits.stopped()
+
+        if stopped is not None:
+            self.rclone.logger.warning(f"Not running {self.command}: {stopped.name}")
+            return RcloneOutput(stopped, [], [])
+
+        self._started = (time.monotonic(), RcloneCpuTimer())
+        return None
+
+    def finish(self, command_output: RcloneOutput) -> Optional[float]:
+        """finish
+
+        Finish an attempt, recording its metrics, and return how many seconds
+        to wait before retrying it, or None if its output should be returned.
+        """
+
+        self.rclone._record_metrics(  # pylint: disable=protected-access
+            self.command,
+            self.remotes[0] if self.remotes else None,
+            self._started[0],
+            self._stop_cpu_timer(),
+            command_output,
+        )
+        self._invalidate_listings()
+
+        retry_delay: Optional[float] = None
+        if self.rclone.retry_policy is not None:
+            retry_delay = self.rclone.retry_policy.retry_delay(
+                command_output.return_code, self.attempt
+            )
+
+        # Don't wait for a retry that the deadline wouldn't allow to run.
+        if retry_delay is None or (
+            self.limits.deadline is not None
+            and self.limits.deadline.remaining() <= retry_delay
+        ):
+            return None
+
+        self.attempt += 1
+        self.rclone.logger.warning(
+            f"{self.command} returned {command_output.return_code.name}, "
+            f"retrying in {retry_delay:.1f}s (attempt {self.attempt + 1})"
+        )
+
+        return retry_delay
+
+    def abandon(self) -> None:
+        """abandon
+
+        Give up on an attempt which won't finish, ie whose task was cancelled,
+        without recording its metrics. It may have changed its paths already,
+        so their listings are still invalidated.
+        """
+        self._stop_cpu_timer()
+        self._invalidate_listings()
+
+    def _invalidate_listings(self) -> None:
+        """_invalidate_listings
+
+        Remove the cached listings of every path given to a command which can
+        change them, however it was ran, unless it was a dry run.
+        """
+
+        if self.command not in MUTATING_COMMANDS or "--dry-run" in self.command_line:
+            return
+
+        self.rclone._invalidate_listings(  # pylint: disable=protected-access
+            *[
+                argument
+                for argument in self.command_line[2:]
+                if not argument.startswith("-")
+            ]
+        )
+
+    def _stop_cpu_timer(self) -> Optional[float]:
+        """_stop_cpu_timer
+
+        The CPU time of the attempt, if it could be measured.
+        """
+
+        cpu_timer: Optional[RcloneCpuTimer] = self._started[1]
+        self._started = (self._started[0], None)
+
+        return cpu_timer.stop() if cpu_timer is not None else None
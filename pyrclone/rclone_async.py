@@ -0,0 +1,549 @@
+# pylint: disable=C0411
+"""rclone_async
+
+An asyncio interface for interactions with an RClone executable.
+"""
+
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Tuple, TypeVar, cast
+
+from .rclone import Rclone, RcloneCommandRun
+from .rclone_cache import RcloneListingCache
+from .rclone_cancel import RcloneCancelHandle, RcloneLimits
+from .rclone_config import RcloneConfig
+from .rclone_filter import RcloneListingFilter, listing_flags, only_dirs, only_files
+from .rclone_output import RcloneError, RcloneOutput
+
+# How often a cancel handle, which is cancelled from other threads, is checked
+# whilst waiting on a command or between retries.
+CANCEL_POLL_INTERVAL: float = 0.1
+
+T = TypeVar("T")
+
+
+class AsyncRclone:
+    """AsyncRclone
+
+    A class to wrap the Rclone binary, where every command is a coroutine.
+
+    The settings and command building are shared with a synchronous Rclone
+    instance, so the dry run, verbose and JSON modes behave identically.
+    Setting them on either class affects both.
+
+    Commands are stopped by the limits of the shared instance, as for
+    Rclone. Note that limits blocks apply to a thread, so a block held across
+    awaits applies to every task on the event loop. Use asyncio.wait_for for a
+    deadline on a single task. Cancelling the task running a command stops
+    its process, with SIGTERM, then SIGKILL after the kill grace.
+    """
+
+    def __init__(
+        self, config: Optional[RcloneConfig] = None, rclone: Optional[Rclone] = None
+    ) -> None:
+        self.rclone: Rclone = rclone if rclone is not None else Rclone(config)
+
+    @property
+    def logger(self) -> logging.Logger:
+        """logger
+
+        The logger of the shared Rclone instance.
+        """
+        return self.rclone.logger
+
+    @property
+    def config(self) -> RcloneConfig:
+        """config
+
+        The config of the shared Rclone instance.
+        """
+        return self.rclone.config
+
+    @property
+    def json_by_default(self) -> bool:
+        """json_by_default
+
+        If the ls commands are done in terms of lsjson.
+        """
+        return self.rclone.json_by_default
+
+    @json_by_default.setter
+    def json_by_default(self, value: bool) -> None:
+        self.rclone.json_by_default = value
+
+    @property
+    def dry_run_mode(self) -> bool:
+        """dry_run_mode
+
+        If all commands are ran with "--dry-run".
+        """
+        return self.rclone.dry_run_mode
+
+    @dry_run_mode.setter
+    def dry_run_mode(self, value: bool) -> None:
+        self.rclone.dry_run_mode = value
+
+    @property
+    def verbose_mode(self) -> bool:
+        """verbose_mode
+
+        If all commands are ran with "-vvv".
+        """
+        return self.rclone.verbose_mode
+
+    @verbose_mode.setter
+    def verbose_mode(self, value: bool) -> None:
+        self.rclone.verbose_mode = value
+
+    @property
+    def bytes_output_mode(self) -> bool:
+        """bytes_output_mode
+
+        If outputs are kept as bytes, and only decoded when accessed.
+        """
+        return self.rclone.bytes_output_mode
+
+    @bytes_output_mode.setter
+    def bytes_output_mode(self, value: bool) -> None:
+        self.rclone.bytes_output_mode = value
+
+    def listremotes(self) -> List[str]:
+        """listremotes
+
+        Return the defined remotes for the rclone config.
+        """
+        return self.rclone.listremotes()
+
+    async def _execute(
+        self, command_to_run: List[str], limits: Optional[RcloneLimits] = None
+    ) -> RcloneOutput:
+        """_execute
+
+        A helper coroutine to run a given rclone command, and return the output.
+
+        The command is expected to be given as a list of strings, ie
+        the command "rclone lsd dropbox:" would be:
+            ["rclone", "lsd", "dropbox:"]
+        The command is stopped by limits, or the current limits if not given.
+        """
+        self.logger.debug(f"Running: {command_to_run}")
+
+        command_limits: RcloneLimits = (
+            limits if limits is not None else self.rclone.current_limits()
+        )
+
+        if self.rclone.rcd_backend is not None:
+            loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            rcd_output: Optional[RcloneOutput] = await loop.run_in_executor(
+                None,
+                self.rclone.rcd_backend.execute,
+                command_to_run,
+                command_limits,
+            )
+
+            if rcd_output is not None:
+                return rcd_output
+
+        try:
+            rclone_process: asyncio.subprocess.Process = (
+                await asyncio.create_subprocess_exec(
+                    *command_to_run,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            )
+            communication: "asyncio.Future[Tuple[bytes, bytes]]" = (
+                asyncio.ensure_future(rclone_process.communicate())
+            )
+
+            try:
+                stopped: Optional[RcloneError] = await self._wait(
+                    communication, command_limits
+                )
+            except asyncio.CancelledError:
+                # Stopping the process is shielded, so cancelling the task
+                # again can't leave it running.
+                await asyncio.shield(self._stop(rclone_process, communication))
+                raise
+
+            if stopped is not None:
+                self.logger.warning(f"Stopped {command_to_run}: {stopped.name}")
+                await self._stop(rclone_process, communication)
+
+                output, error = communication.result()
+                return self.rclone._make_output(  # pylint: disable=protected-access
+                    stopped.value, output, error
+                )
+
+            output, error = communication.result()
+
+            return self.rclone._make_output(  # pylint: disable=protected-access
+                cast(int, rclone_process.returncode), output, error
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            return self.rclone._exception_output(  # pylint: disable=protected-access
+                command_to_run, exception
+            )
+
+    async def _execute_with_stats(
+        self, command_to_run: List[str], limits: RcloneLimits
+    ) -> RcloneOutput:
+        """_execute_with_stats
+
+        Run a given rclone command, reporting its statistics and log as it
+        runs, as Rclone does. The statistics are read in a worker thread,
+        under a cancel handle of its own, which is cancelled along with the
+        task or the cancel handle of limits.
+        """
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        task_handle: RcloneCancelHandle = RcloneCancelHandle()
+        running: "asyncio.Future[RcloneOutput]" = loop.run_in_executor(
+            None,
+            self.rclone._execute_with_stats,  # pylint: disable=protected-access
+            command_to_run,
+            RcloneLimits(limits.timeout, limits.deadline, task_handle),
+        )
+
+        try:
+            # Running out of time is left to the worker thread, which has the
+            # same timeout and deadline.
+            if await self._wait(running, limits) is RcloneError.CANCELLED:
+                task_handle.cancel()
+        except asyncio.CancelledError:
+            task_handle.cancel()
+            await asyncio.shield(running)
+            raise
+
+        return await running
+
+    @staticmethod
+    async def _wait(
+        running: "asyncio.Future[T]", limits: RcloneLimits
+    ) -> Optional[RcloneError]:
+        """_wait
+
+        Wait for a running command to finish, returning why it must be stopped
+        instead, ie TIMEOUT or CANCELLED, if limits run out first, otherwise
+        None.
+        """
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        time_left: Optional[float] = limits.time_left()
+        expires: Optional[float] = (
+            loop.time() + time_left if time_left is not None else None
+        )
+
+        while not running.done():
+            stopped: Optional[RcloneError] = limits.stopped()
+
+            if stopped is not None:
+                return stopped
+
+            wait_time: Optional[float] = (
+                expires - loop.time() if expires is not None else None
+            )
+
+            if wait_time is not None and wait_time <= 0:
+                return RcloneError.TIMEOUT
+
+            if limits.cancel_handle is not None:
+                wait_time = min(wait_time or CANCEL_POLL_INTERVAL, CANCEL_POLL_INTERVAL)
+
+            await asyncio.wait({running}, timeout=wait_time)
+
+        return None
+
+    @staticmethod
+    async def _sleep(seconds: float, limits: RcloneLimits) -> None:
+        """_sleep
+
+        Wait for seconds, ie between retries, returning early if the cancel
+        handle of limits is cancelled.
+        """
+
+        if limits.cancel_handle is None:
+            await asyncio.sleep(seconds)
+            return
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        wake_time: float = loop.time() + seconds
+
+        while not limits.cancel_handle.cancelled and loop.time() < wake_time:
+            await asyncio.sleep(min(wake_time - loop.time(), CANCEL_POLL_INTERVAL))
+
+    async def _stop(
+        self,
+        rclone_process: asyncio.subprocess.Process,
+        communication: "asyncio.Future[Tuple[bytes, bytes]]",
+    ) -> None:
+        """_stop
+
+        Stop a running process with SIGTERM, then SIGKILL if it hasn't exited
+        after the kill grace of the shared Rclone instance, and wait for the
+        rest of its output.
+        """
+
+        rclone_process.terminate()
+        await asyncio.wait({communication}, timeout=self.rclone.kill_grace)
+
+        if not communication.done():
+            rclone_process.kill()
+            await communication
+
+    async def command(
+        self, command: str, arguments: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """command
+
+        Run a given command in the correct mode.
+        When in dry run mode, all commands are ran as trials.
+        """
+
+        if self.dry_run_mode:
+            return await self.dry_run_command(command, arguments)
+
+        return await self.run_command(command, arguments)
+
+    async def run_command(
+        self, command: str, arguments: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """run_command
+
+        Run a given command, with the retry policy, rate limiter, limits, live
+        statistics and metrics sinks of the shared Rclone instance, without
+        blocking the event loop. See RcloneCommandRun.
+        """
+
+        command_run: RcloneCommandRun = RcloneCommandRun(
+            self.rclone, command, arguments
+        )
+
+        while True:
+            await asyncio.sleep(command_run.rate_limit_delay())
+            stopped_output: Optional[RcloneOutput] = command_run.start()
+
+            if stopped_output is not None:
+                return stopped_output
+
+            try:
+                command_output: RcloneOutput = await (
+                    self._execute_with_stats(
+                        command_run.command_line, command_run.limits
+                    )
+                    if command_run.live_stats
+                    else self._execute(command_run.command_line, command_run.limits)
+                )
+            except asyncio.CancelledError:
+                command_run.abandon()
+                raise
+            retry_delay: Optional[float] = command_run.finish(command_output)
+
+            if retry_delay is None:
+                return command_output
+
+            await self._sleep(retry_delay, command_run.limits)
+
+    async def dry_run_command(
+        self, command: str, arguments: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """dry_run_command
+
+        Run a given command in dry run mode, ie a trial mode with no actual changes.
+        """
+
+        return await self.run_command(command, ["--dry-run"] + list(arguments))
+
+    async def lsjson(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """lsjson
+
+        Wrap the rclone lsjson command.
+
+        The listing cache and native local mode of the shared Rclone instance
+        are used in the same way as Rclone.lsjson, with local listings made in
+        a worker thread.
+        """
+        flags = list(flags) + listing_flags(listing_filter)
+        listing_cache: Optional[RcloneListingCache] = self.rclone.listing_cache
+        generation: int = 0
+
+        if listing_cache is not None:
+            generation = listing_cache.generation
+            cached_output: Optional[RcloneOutput] = listing_cache.get(
+                remote, flags, self.rclone.bytes_output_mode
+            )
+
+            if cached_output is not None:
+                return cached_output
+
+        native_output: Optional[RcloneOutput] = None
+
+        if self.rclone.native_local_mode:
+            loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            native_output = await loop.run_in_executor(
+                None,
+                self.rclone._native_local,  # pylint: disable=protected-access
+                "lsjson",
+                remote,
+                flags,
+            )
+
+        command_output: RcloneOutput = (
+            native_output
+            if native_output is not None
+            else await self.command(
+                "lsjson",
+                [remote]
+                + flags
+                + self.rclone._listing_flags(  # pylint: disable=protected-access
+                    remote,
+                ),
+            )
+        )
+
+        if (
+            listing_cache is not None
+            and command_output.return_code is RcloneError.SUCCESS
+        ):
+            listing_cache.put(remote, flags, command_output, generation)
+
+        return command_output
+
+    async def ls(  # pylint: disable=C0103
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """ls
+
+        Wrap the rclone ls command.
+        """
+
+        if self.json_by_default:
+            return await self.lsjson(remote, ["-R"] + list(flags), listing_filter)
+
+        return await self.command(
+            "ls", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
+
+    async def lsd(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """lsd
+
+        Wrap the rclone lsd command.
+        """
+
+        if self.json_by_default:
+            return await self.lsjson(remote, flags, only_dirs(listing_filter))
+
+        return await self.command(
+            "lsd", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
+
+    async def lsl(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """lsl
+
+        Wrap the rclone lsl command.
+        """
+
+        if self.json_by_default:
+            return await self.lsjson(
+                remote, ["-R"] + list(flags), only_files(listing_filter)
+            )
+
+        return await self.command(
+            "lsl", [remote] + list(flags) + listing_flags(listing_filter, False)
+        )
+
+    async def lsf(
+        self,
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        listing_filter: Optional[RcloneListingFilter] = None,
+    ) -> RcloneOutput:
+        """lsf
+
+        Wrap the rclone lsf command.
+        """
+        return await self.command(
+            "lsf", [remote] + list(flags) + listing_flags(listing_filter)
+        )
+
+    async def delete(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+        """delete
+
+        Wrap the rclone delete command.
+        """
+        return await self.command("delete", [remote] + list(flags))
+
+    async def deletefile(
+        self, remote: str, flags: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """deletefile
+
+        Wrap the rclone deletefile command.
+        """
+        return await self.command("deletefile", [remote] + list(flags))
+
+    async def purge(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+        """purge
+
+        Wrap the rclone purge command.
+        """
+        return await self.command("purge", [remote] + list(flags))
+
+    async def mkdir(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+        """mkdir
+
+        Wrap the rclone mkdir command.
+        """
+        return await self.command("mkdir", [remote] + list(flags))
+
+    async def size(self, remote: str, flags: Iterable[str] = tuple()) -> RcloneOutput:
+        """size
+
+        Wrap the rclone size command.
+        """
+        return await self.command("size", [remote] + list(flags))
+
+    async def sync(
+        self, local: str, remote: str, flags: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """sync
+
+        Wrap the rclone sync command.
+        """
+        return await self.command("sync", [local] + [remote] + list(flags))
+
+    async def copy(
+        self, local: str, remote: str, flags: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """copy
+
+        Wrap the rclone copy command.
+        """
+        return await self.command("copy", [local] + [remote] + list(flags))
+
+    async def move(
+        self, local: str, remote: str, flags: Iterable[str] = tuple()
+    ) -> RcloneOutput:
+        """move
+
+        Wrap the rclone move command.
+        """
+        return await self.command("move", [local] + [remote] + list(flags))
@@ -0,0 +1,274 @@
+# pylint: disable=C0411
+"""rclone_backends
+
+What each rclone backend can do quickly, such that commands can be given the
+flags that suit the remotes they use, rather than the same flags for all.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List, Optional, Tuple, cast
+
+# The commands which transfer or check files, so can be tuned with
+# "--transfers" and "--checkers".
+TUNED_COMMANDS: Tuple[str, ...] = (
+    "copy",
+    "copyto",
+    "move",
+    "moveto",
+    "sync",
+    "check",
+)
+
+# Backends which wrap another remote, given by their "remote" option.
+WRAPPING_BACKENDS: Tuple[str, ...] = (
+    "alias",
+    "cache",
+    "chunker",
+    "compress",
+    "crypt",
+    "hasher",
+)
+
+# Wrapping backends which change the content, so lose the hashes of the
+# wrapped remote.
+HASHLESS_WRAPPERS: Tuple[str, ...] = ("chunker", "compress", "crypt")
+
+# Wrapping backends which keep the names of what they wrap, so a path on them
+# is the same path on the wrapped remote.
+PATH_PRESERVING_WRAPPERS: Tuple[str, ...] = ("alias", "cache", "hasher")
+
+# Backends which join several remotes, given by their "upstreams" option.
+JOINING_BACKENDS: Tuple[str, ...] = ("combine", "union")
+
+
+@dataclass
+class RcloneBackendFeatures:
+    """RcloneBackendFeatures
+
+    The performance relevant features of a backend, ie if it can list a
+    whole tree in one go ("--fast-list"), copy and move files server side,
+    the hash types it stores, and good values for "--checkers" and
+    "--transfers", where they differ from rclone's defaults (None).
+    """
+
+    fast_list: bool = False
+    server_side_copy: bool = False
+    server_side_move: bool = False
+    hash_types: List[str] = field(default_factory=list)
+    checkers: Optional[int] = None
+    transfers: Optional[int] = None
+
+
+# rclone ignores "--fast-list" where it isn't supported, so unknown backends
+# keep it, as before the table existed.
+UNKNOWN_FEATURES: RcloneBackendFeatures = RcloneBackendFeatures(fast_list=True)
+
+# The features of common backends, keyed by their type in the config. Object
+# stores handle many concurrent requests well, so are given more transfers
+# and checkers, whereas rate limited consumer services keep the defaults.
+BACKEND_FEATURES: Dict[str, RcloneBackendFeatures] = {
+    "local": RcloneBackendFeatures(
+        server_side_move=True, hash_types=["md5", "sha1", "crc32", "sha256"]
+    ),
+    "s3": RcloneBackendFeatures(True, True, False, ["md5"], 32, 16),
+    "b2": RcloneBackendFeatures(True, True, False, ["sha1"], 32, 32),
+    "google cloud storage": RcloneBackendFeatures(True, True, False, ["md5"], 32, 16),
+    "azureblob": RcloneBackendFeatures(True, True, False, ["md5"], 32, 16),
+    "swift": RcloneBackendFeatures(True, True, True, ["md5"], 32, 16),
+    "qingstor": RcloneBackendFeatures(True, True, False, ["md5"]),
+    "storj": RcloneBackendFeatures(True, True, True),
+    "drive": RcloneBackendFeatures(True, True, True, ["md5", "sha1", "sha256"]),
+    "jottacloud": RcloneBackendFeatures(True, True, True, ["md5"]),
+    "dropbox": RcloneBackendFeatures(False, True, True, ["dropbox"]),
+    "onedrive": RcloneBackendFeatures(False, True, True, ["quickxor"]),
+    "box": RcloneBackendFeatures(False, True, True, ["sha1"]),
+    "pcloud": RcloneBackendFeatures(False, True, True, ["md5", "sha1"]),
+    "mega": RcloneBackendFeatures(False, False, True),
+    "sftp": RcloneBackendFeatures(False, False, True, ["md5", "sha1"]),
+    "ftp": RcloneBackendFeatures(False, False, True),
+    "webdav": RcloneBackendFeatures(False, True, True),
+    "http": RcloneBackendFeatures(),
+}
+
+
+def features_from_probe(
+    probe: Dict[str, object], remote_type: Optional[str] = None
+) -> RcloneBackendFeatures:
+    """features_from_probe
+
+    Convert the output of "rclone backend features remote:" into features.
+    The tuning, which can't be probed, is taken from the table.
+    """
+
+    probed_features: Optional[object] = probe.get("Features")
+    probed_hashes: Optional[object] = probe.get("Hashes")
+
+    if not isinstance(probed_features, dict):
+        probed_features = {}
+
+    hash_types: List[str] = []
+
+    if isinstance(probed_hashes, list):
+        hash_types = [str(hash_type) for hash_type in cast(List[object], probed_hashes)]
+
+    features: Dict[str, object] = cast(Dict[str, object], probed_features)
+    known_features: RcloneBackendFeatures = BACKEND_FEATURES.get(
+        remote_type or "", RcloneBackendFeatures()
+    )
+
+    return RcloneBackendFeatures(
+        features.get("ListR") is True,
+        features.get("Copy") is True,
+        features.get("Move") is True,
+        hash_types,
+        known_features.checkers,
+        known_features.transfers,
+    )
+
+
+def wrapped_features(
+    wrapper_type: str, features: RcloneBackendFeatures
+) -> RcloneBackendFeatures:
+    """wrapped_features
+
+    The features of a wrapping backend, given those of the remote it wraps.
+    """
+
+    if wrapper_type in HASHLESS_WRAPPERS:
+        return replace(features, hash_types=[])
+
+    return replace(features)
+
+
+def tuning_flags(
+    command: str,
+    arguments: Iterable[str],
+    all_features: Iterable[RcloneBackendFeatures],
+) -> List[str]:
+    """tuning_flags
+
+    The "--checkers" and "--transfers" flags for a command using remotes
+    with the given features, ie the smallest value any of them suggests, so
+    no remote is pushed harder than it handles well. Flags already in the
+    arguments are left alone.
+    """
+
+    if command not in TUNED_COMMANDS:
+        return []
+
+    arguments = list(arguments)
+    features_list: List[RcloneBackendFeatures] = list(all_features)
+    flags: List[str] = []
+
+    checkers: List[int] = [
+        features.checkers for features in features_list if features.checkers
+    ]
+    transfers: List[int] = [
+        features.transfers for features in features_list if features.transfers
+    ]
+
+    if checkers and not _has_flag(arguments, "--checkers"):
+        flags += ["--checkers", str(min(checkers))]
+
+    # check doesn't transfer anything.
+    if transfers and command != "check" and not _has_flag(arguments, "--transfers"):
+        flags += ["--transfers", str(min(transfers))]
+
+    return flags
+
+
+def common_hash_type(
+    all_features: Iterable[RcloneBackendFeatures],
+) -> Optional[str]:
+    """common_hash_type
+
+    A hash type every one of the backends stores, preferring the first
+    backend's order, or None if there isn't one.
+    """
+
+    features_list: List[RcloneBackendFeatures] = list(all_features)
+
+    if not features_list:
+        return None
+
+    for hash_type in features_list[0].hash_types:
+        if all(hash_type in features.hash_types for features in features_list[1:]):
+            return hash_type
+
+    return None
+
+
+def _has_flag(arguments: List[str], flag: str) -> bool:
+    """_has_flag
+
+    If a flag is in the arguments, either as "--flag value" or "--flag=value".
+    """
+    return any(
+        argument == flag or argument.startswith(f"{flag}=") for argument in arguments
+    )
+
+
+class RcloneFeatureCache:
+    """RcloneFeatureCache
+
+    A JSON file of the probed features of backends, keyed by remote name,
+    such that each remote only has to be probed once.
+
+    Entries are stored with the type of the remote, and are ignored if the
+    type has since changed in the config. The file is rewritten atomically on
+    every change, so can be shared between processes.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        self.cache_path: str = cache_path
+
+        self._entries: Dict[str, Dict[str, object]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+        try:
+            with open(cache_path, encoding="utf-8") as cache_file:
+                self._entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, remote: str, remote_type: str) -> Optional[RcloneBackendFeatures]:
+        """get
+
+        The cached features of a remote, if any.
+        """
+
+        with self._lock:
+            entry: Optional[Dict[str, object]] = self._entries.get(remote)
+
+        if entry is None or entry.get("Type") != remote_type:
+            return None
+
+        return features_from_probe(entry, remote_type)
+
+    def put(self, remote: str, remote_type: str, probe: Dict[str, object]) -> None:
+        """put
+
+        Store the output of "rclone backend features" for a remote, and save
+        the cache.
+        """
+
+        with self._lock:
+            self._entries[remote] = {
+                "Type": remote_type,
+                "Features": probe.get("Features"),
+                "Hashes": probe.get("Hashes"),
+            }
+            entries: str = json.dumps(self._entries, indent=2, sort_keys=True)
+
+            directory: str = os.path.dirname(os.path.abspath(self.cache_path))
+            os.makedirs(directory, exist_ok=True)
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as cache_file:
+                cache_file.write(entries)
+
+            os.replace(temporary_path, self.cache_path)
@@ -0,0 +1,234 @@
+# pylint: disable=C0411
+"""rclone_batch
+
+Run many independent rclone commands concurrently, whilst limiting how many
+are running at once both overall and against any single remote.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from .rclone_cancel import RcloneLimits
+from .rclone_output import RcloneError, RcloneOutput
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+
+@dataclass
+class RcloneCommandSpec:
+    """RcloneCommandSpec
+
+    A simple data class to store a command to be ran as part of a batch.
+    """
+
+    command: str
+    arguments: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RcloneBatchResult:
+    """RcloneBatchResult
+
+    The outputs of a batch of commands, in the order they were given, along
+    with how long the batch took and how many commands failed.
+    """
+
+    outputs: List[RcloneOutput]
+    wall_time: float
+    failures: int
+
+
+class RcloneExecutor:
+    """RcloneExecutor
+
+    A class to run batches of rclone commands on a pool of workers.
+
+    At most max_workers commands run at once. Any remote in remote_limits
+    (keyed by the remote name, as in the config) additionally has at most
+    that many commands running against it at once, to avoid tripping the rate
+    limits of the provider. A command that uses several remotes counts
+    against each of them.
+    """
+
+    def __init__(
+        self,
+        rclone: "Rclone",
+        max_workers: int = 4,
+        remote_limits: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.rclone: "Rclone" = rclone
+        self.max_workers: int = max_workers
+        self.remote_limits: Dict[str, int] = {
+            remote.rstrip(":"): max(1, limit)
+            for remote, limit in (remote_limits or {}).items()
+        }
+
+    def _remotes_for(self, spec: RcloneCommandSpec) -> Set[str]:
+        """_remotes_for
+
+        Find the limited remotes a given command will use.
+        """
+
+        remotes: Set[str] = set()
+
+        for argument in spec.arguments:
+            remote: Optional[str] = self.rclone.remote_of(argument)
+
+            if remote is not None and remote in self.remote_limits:
+                remotes.add(remote)
+
+        return remotes
+
+    def _next_queue(
+        self,
+        queues: Dict[FrozenSet[str], Deque[Tuple[int, RcloneCommandSpec]]],
+        running_per_remote: Dict[str, int],
+    ) -> Optional[FrozenSet[str]]:
+        """_next_queue
+
+        The queue holding the earliest command that can start now, ie whose
+        limited remotes all have a free slot, or None if no command can.
+        """
+
+        next_remotes: Optional[FrozenSet[str]] = None
+        next_index: int = -1
+
+        for remotes, queue in queues.items():
+            if any(
+                running_per_remote[remote] >= self.remote_limits[remote]
+                for remote in remotes
+            ):
+                continue
+
+            if next_remotes is None or queue[0][0] < next_index:
+                next_remotes, next_index = remotes, queue[0][0]
+
+        return next_remotes
+
+    def _start_ready(  # pylint: disable=too-many-arguments
+        self,
+        pool: ThreadPoolExecutor,
+        queues: Dict[FrozenSet[str], Deque[Tuple[int, RcloneCommandSpec]]],
+        running_per_remote: Dict[str, int],
+        running: Dict["Future[RcloneOutput]", Tuple[int, FrozenSet[str]]],
+        limits: RcloneLimits,
+    ) -> None:
+        """_start_ready
+
+        Start the earliest commands that can run, until every worker is busy
+        or every remaining command is waiting for a limited remote.
+        """
+
+        while len(running) < self.max_workers:
+            remotes: Optional[FrozenSet[str]] = self._next_queue(
+                queues, running_per_remote
+            )
+
+            if remotes is None:
+                return
+
+            queue: Deque[Tuple[int, RcloneCommandSpec]] = queues[remotes]
+            index, spec = queue.popleft()
+
+            if not queue:
+                del queues[remotes]
+
+            for remote in remotes:
+                running_per_remote[remote] += 1
+
+            future: "Future[RcloneOutput]" = pool.submit(self._command, spec, limits)
+            running[future] = (index, remotes)
+
+    def _command(self, spec: RcloneCommandSpec, limits: RcloneLimits) -> RcloneOutput:
+        """_command
+
+        Run a command on a worker, with the limits of the thread that started
+        the batch.
+        """
+
+        with self.rclone.limits(limits.timeout, limits.deadline, limits.cancel_handle):
+            return self.rclone.command(spec.command, spec.arguments)
+
+    def as_completed(
+        self, specs: Iterable[RcloneCommandSpec]
+    ) -> Iterator[Tuple[int, RcloneOutput]]:
+        """as_completed
+
+        Run the given commands, yielding the index of each command along with
+        its output as soon as it finishes.
+
+        Commands are started in the order given, except that a command whose
+        remote is at its limit is passed over until a slot frees up, rather
+        than holding up commands for other remotes.
+        """
+
+        # Commands are queued by the limited remotes they use, so only the
+        # head of each queue has to be looked at to find the next to start.
+        queues: Dict[FrozenSet[str], Deque[Tuple[int, RcloneCommandSpec]]] = {}
+
+        for index, spec in enumerate(specs):
+            remotes: FrozenSet[str] = frozenset(self._remotes_for(spec))
+            queues.setdefault(remotes, deque()).append((index, spec))
+
+        running_per_remote: Dict[str, int] = {
+            remote: 0 for remote in self.remote_limits
+        }
+        running: Dict["Future[RcloneOutput]", Tuple[int, FrozenSet[str]]] = {}
+        limits: RcloneLimits = self.rclone.current_limits()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while queues or running:
+                self._start_ready(pool, queues, running_per_remote, running, limits)
+
+                done: Set["Future[RcloneOutput]"] = wait(
+                    set(running), return_when=FIRST_COMPLETED
+                ).done
+
+                for finished in done:
+                    finished_index, finished_remotes = running.pop(finished)
+
+                    for remote in finished_remotes:
+                        running_per_remote[remote] -= 1
+
+                    yield finished_index, finished.result()
+
+    def run(self, specs: Iterable[RcloneCommandSpec]) -> RcloneBatchResult:
+        """run
+
+        Run the given commands, and return their outputs in the order given.
+        """
+
+        start_time: float = time.monotonic()
+        spec_list: List[RcloneCommandSpec] = list(specs)
+        outputs: List[Optional[RcloneOutput]] = [None] * len(spec_list)
+
+        for index, output in self.as_completed(spec_list):
+            outputs[index] = output
+
+        finished_outputs: List[RcloneOutput] = [
+            output for output in outputs if output is not None
+        ]
+
+        return RcloneBatchResult(
+            finished_outputs,
+            time.monotonic() - start_time,
+            sum(
+                output.return_code is not RcloneError.SUCCESS
+                for output in finished_outputs
+            ),
+        )
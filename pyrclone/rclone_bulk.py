@@ -0,0 +1,123 @@
+# pylint: disable=C0411
+"""rclone_bulk
+
+Helpers to run an operation on many paths with a single rclone invocation,
+and to find out what happened to each path.
+"""
+
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .rclone_output import RcloneError, RcloneOutput
+
+# The start of the log messages rclone writes when it has done something to
+# a path, or would have done in dry run mode.
+SUCCESS_MESSAGES: Tuple[str, ...] = ("Deleted", "Copied", "Moved", "Skipped")
+
+# Characters with a special meaning in rclone filter patterns.
+GLOB_CHARACTERS: str = "\\*?[]{}"
+
+
+@dataclass
+class RcloneBulkResult:
+    """RcloneBulkResult
+
+    The outputs of each rclone invocation of a bulk operation, along with the
+    paths rclone reported as done and as failed (with the error).
+    """
+
+    outputs: List[RcloneOutput] = field(default_factory=list)
+    succeeded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def return_code(self) -> RcloneError:
+        """return_code
+
+        The first error returned by any invocation, or SUCCESS.
+        """
+
+        for output in self.outputs:
+            if output.return_code is not RcloneError.SUCCESS:
+                return output.return_code
+
+        return RcloneError.SUCCESS
+
+    def add_output(self, command_output: RcloneOutput) -> None:
+        """add_output
+
+        Add the output of an invocation, and the path results in its log.
+        """
+
+        self.outputs.append(command_output)
+
+        for log_line in command_output.error:
+            path_result: Optional[Tuple[str, str, str]] = parse_json_log_line(log_line)
+
+            if path_result is None:
+                continue
+
+            path, level, message = path_result
+
+            if level == "error":
+                self.failed[path] = message
+            elif message.startswith(SUCCESS_MESSAGES):
+                self.succeeded.append(path)
+
+
+def parse_json_log_line(log_line: str) -> Optional[Tuple[str, str, str]]:
+    """parse_json_log_line
+
+    Parse a line written by rclone with "--use-json-log", returning the
+    object it is about, the log level and the message. Lines that aren't
+    about an object return None.
+    """
+
+    if not log_line.startswith("{"):
+        return None
+
+    try:
+        log_entry: Dict[str, object] = json.loads(log_line)
+    except ValueError:
+        return None
+
+    log_object: Optional[object] = log_entry.get("object")
+
+    if not isinstance(log_object, str):
+        return None
+
+    return (
+        log_object,
+        str(log_entry.get("level", "")),
+        str(log_entry.get("msg", "")),
+    )
+
+
+def chunks(paths: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """chunks
+
+    Split the given paths into lists of at most chunk_size paths.
+    """
+
+    path_iterator: Iterator[str] = iter(paths)
+
+    while True:
+        chunk: List[str] = list(islice(path_iterator, chunk_size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def escape_glob(path: str) -> str:
+    """escape_glob
+
+    Escape a path, such that it only matches itself in a filter pattern.
+    """
+    return "".join(
+        f"\\{character}" if character in GLOB_CHARACTERS else character
+        for character in path
+    )
@@ -0,0 +1,252 @@
+# pylint: disable=C0411
+"""rclone_cache
+
+A cache for the output of listing commands, such that repeatedly listing the
+same path doesn't repeatedly walk the remote.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .rclone_output import RcloneBytesOutput, RcloneOutput
+
+# Flags that don't change the listing returned, so are ignored in the key.
+IGNORED_FLAGS: Tuple[str, ...] = ("--fast-list", "-v", "-vv", "-vvv", "--dry-run")
+
+# Filter rules are applied in the order given, so unlike other flags, their
+# order is significant.
+ORDERED_FLAGS: Tuple[str, ...] = ("--include", "--exclude", "--filter")
+
+# Commands which can change the contents of the paths they are given, so
+# invalidate any cached listings of them.
+MUTATING_COMMANDS: Tuple[str, ...] = (
+    "bisync",
+    "cleanup",
+    "copy",
+    "copyto",
+    "copyurl",
+    "dedupe",
+    "delete",
+    "deletefile",
+    "mkdir",
+    "move",
+    "moveto",
+    "purge",
+    "rcat",
+    "rmdir",
+    "rmdirs",
+    "settier",
+    "sync",
+    "touch",
+)
+
+# The path listed, the normalised flags and if the output holds raw bytes.
+CacheKey = Tuple[str, Tuple[Tuple[str, ...], ...], bool]
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    """split_path
+
+    Split a path into its remote and a normalised path on that remote, ie
+    "dropbox:Photos/2019/" becomes ("dropbox:", "Photos/2019").
+    """
+
+    if ":" in path and "/" not in path.split(":", 1)[0]:
+        remote, remote_path = path.split(":", 1)
+        return f"{remote}:", remote_path.strip("/")
+
+    return "", path.rstrip("/")
+
+
+def paths_overlap(first_path: str, second_path: str) -> bool:
+    """paths_overlap
+
+    Check if either of two paths is the same as, or inside, the other.
+    """
+
+    first_remote, first = split_path(first_path)
+    second_remote, second = split_path(second_path)
+
+    if first_remote != second_remote:
+        return False
+
+    if not first or not second or first == second:
+        return True
+
+    return first.startswith(second + "/") or second.startswith(first + "/")
+
+
+def normalise_flags(flags: Iterable[str]) -> Tuple[Tuple[str, ...], ...]:
+    """normalise_flags
+
+    Normalise a set of flags, such that equivalent flags given in a different
+    order produce the same result.
+
+    Each flag is grouped with its value (if any), and the groups sorted,
+    except for filter rules which keep their relative order.
+    """
+
+    groups: List[Tuple[str, ...]] = []
+
+    for flag in flags:
+        if flag in IGNORED_FLAGS:
+            continue
+
+        if groups and not flag.startswith("-") and len(groups[-1]) == 1:
+            groups[-1] = (groups[-1][0], flag)
+        else:
+            groups.append((flag,))
+
+    unordered: List[Tuple[str, ...]] = sorted(
+        group for group in groups if group[0] not in ORDERED_FLAGS
+    )
+    ordered: List[Tuple[str, ...]] = [
+        group for group in groups if group[0] in ORDERED_FLAGS
+    ]
+
+    return tuple(unordered + ordered)
+
+
+class RcloneListingCache:
+    """RcloneListingCache
+
+    A thread safe cache of listing outputs, keyed by the path listed and the
+    flags used.
+
+    Entries expire ttl seconds after being stored (never, if ttl is None),
+    and once max_entries is reached the least recently used entry is evicted.
+    The number of hits and misses are counted, to check the cache is useful.
+
+    Every invalidation starts a new generation. A listing started before an
+    invalidation may have missed the change, so it is only stored if the
+    generation read before it started is still current.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: Optional[float] = 60.0) -> None:
+        self.max_entries: int = max_entries
+        self.ttl: Optional[float] = ttl
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._entries: "OrderedDict[CacheKey, Tuple[float, RcloneOutput]]" = (
+            OrderedDict()
+        )
+        self._lock: threading.Lock = threading.Lock()
+        self._generation: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        """generation
+
+        The number of invalidations so far, to pass to put.
+        """
+        return self._generation
+
+    @staticmethod
+    def _key(remote: str, flags: Iterable[str], bytes_output: bool) -> CacheKey:
+        remote_name, remote_path = split_path(remote)
+        return (f"{remote_name}{remote_path}", normalise_flags(flags), bytes_output)
+
+    def get(
+        self, remote: str, flags: Iterable[str] = tuple(), bytes_output: bool = False
+    ) -> Optional[RcloneOutput]:
+        """get
+
+        Return a copy of the cached output for a given listing, or None if
+        it isn't cached or has expired. Outputs holding raw bytes are cached
+        separately, so bytes_output must match the output mode used.
+        """
+
+        key: CacheKey = self._key(remote, flags, bytes_output)
+
+        with self._lock:
+            cached: Optional[Tuple[float, RcloneOutput]] = self._entries.get(key)
+
+            if cached is not None and (
+                self.ttl is None or time.monotonic() - cached[0] < self.ttl
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1].copy()
+
+            if cached is not None:
+                del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        remote: str,
+        flags: Iterable[str],
+        command_output: RcloneOutput,
+        generation: Optional[int] = None,
+    ) -> None:
+        """put
+
+        Store the output of a given listing. If the generation read before
+        the listing started is given, the output is dropped when there has
+        been an invalidation since.
+        """
+
+        key: CacheKey = self._key(
+            remote, flags, isinstance(command_output, RcloneBytesOutput)
+        )
+        stored_output: RcloneOutput = command_output.copy()
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            self._entries[key] = (time.monotonic(), stored_output)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self, path: str, resolve: Optional[Callable[[str], Optional[str]]] = None
+    ) -> None:
+        """invalidate
+
+        Remove every cached listing that could include a given path, ie the
+        listings of the path itself, its parents and its children.
+
+        If given, resolve maps a path to the path on the remote storing it
+        (see Rclone.underlying_path), such that listings made through an
+        alias are removed when the remote it wraps changes, and vice versa.
+        Listings whose storage can't be resolved are always removed.
+        """
+
+        with self._lock:
+            self._generation += 1
+            resolved_path: Optional[str] = resolve(path) if resolve else path
+
+            for key in list(self._entries):
+                if paths_overlap(key[0], path):
+                    del self._entries[key]
+                elif resolve is not None:
+                    resolved_key: Optional[str] = resolve(key[0])
+
+                    if (
+                        resolved_path is None
+                        or resolved_key is None
+                        or paths_overlap(resolved_key, resolved_path)
+                    ):
+                        del self._entries[key]
+
+    def clear(self) -> None:
+        """clear
+
+        Remove every cached listing.
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
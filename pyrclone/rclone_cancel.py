@@ -0,0 +1,293 @@
+# pylint: disable=C0411
+"""rclone_cancel
+
+Stop running rclone commands, when they take too long or are cancelled from
+another thread, rather than waiting on them forever.
+"""
+
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set
+
+from .rclone_output import RcloneError
+
+
+class RcloneDeadline:
+    """RcloneDeadline
+
+    A point in time, seconds from when it was created, by which a sequence of
+    commands must have finished.
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.expires: float = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """remaining
+
+        The seconds left before the deadline, or 0 if it has passed.
+        """
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """expired
+
+        If the deadline has passed.
+        """
+        return time.monotonic() >= self.expires
+
+
+class RcloneCancelHandle:
+    """RcloneCancelHandle
+
+    A handle to cancel the commands ran under it, from any thread.
+
+    Cancelling stops every command running under the handle, and any later
+    command under it returns CANCELLED without being ran. A handle can't be
+    reset, so use a new one for new commands.
+    """
+
+    def __init__(self) -> None:
+        self._cancelled: threading.Event = threading.Event()
+        self._watches: Set["RcloneProcessWatch"] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """cancelled
+
+        If the handle has been cancelled.
+        """
+        return self._cancelled.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """wait
+
+        Wait up to timeout seconds for the handle to be cancelled, returning
+        if it has been.
+        """
+        return self._cancelled.wait(timeout)
+
+    def cancel(self) -> None:
+        """cancel
+
+        Stop every command running under the handle. This doesn't wait for
+        the commands to exit.
+        """
+
+        with self._lock:
+            self._cancelled.set()
+            watches: List["RcloneProcessWatch"] = list(self._watches)
+
+        for watch in watches:
+            watch.stop(RcloneError.CANCELLED)
+
+    def _register(self, watch: "RcloneProcessWatch") -> bool:
+        """_register
+
+        Track a running process, returning False if the handle has already
+        been cancelled.
+        """
+
+        with self._lock:
+            if self.cancelled:
+                return False
+
+            self._watches.add(watch)
+            return True
+
+    def _unregister(self, watch: "RcloneProcessWatch") -> None:
+        """_unregister
+
+        Stop tracking a finished process.
+        """
+
+        with self._lock:
+            self._watches.discard(watch)
+
+
+@dataclass
+class RcloneLimits:
+    """RcloneLimits
+
+    The limits on the commands ran in a block, ie how long each command can
+    run for in seconds, the deadline for all of them, and the handle to
+    cancel them with. None means no limit.
+    """
+
+    timeout: Optional[float] = None
+    deadline: Optional[RcloneDeadline] = None
+    cancel_handle: Optional[RcloneCancelHandle] = None
+
+    def merge(self, inner: "RcloneLimits") -> "RcloneLimits":
+        """merge
+
+        Combine these limits with those of a nested block, ie the shorter
+        timeout, the earlier deadline, and the inner cancel handle if it has
+        one.
+        """
+
+        timeouts: List[float] = [
+            timeout for timeout in (self.timeout, inner.timeout) if timeout is not None
+        ]
+        deadlines: List[RcloneDeadline] = [
+            deadline
+            for deadline in (self.deadline, inner.deadline)
+            if deadline is not None
+        ]
+
+        return RcloneLimits(
+            min(timeouts) if timeouts else None,
+            min(deadlines, key=_expires) if deadlines else None,
+            inner.cancel_handle or self.cancel_handle,
+        )
+
+    def time_left(self) -> Optional[float]:
+        """time_left
+
+        How long a command started now can run for, or None if forever.
+        """
+
+        if self.deadline is None:
+            return self.timeout
+
+        if self.timeout is None:
+            return self.deadline.remaining()
+
+        return min(self.timeout, self.deadline.remaining())
+
+    def stopped(self) -> Optional[RcloneError]:
+        """stopped
+
+        Why no more commands can be started, ie CANCELLED or TIMEOUT, or None
+        if they can.
+        """
+
+        if self.cancel_handle is not None and self.cancel_handle.cancelled:
+            return RcloneError.CANCELLED
+
+        if self.deadline is not None and self.deadline.expired:
+            return RcloneError.TIMEOUT
+
+        return None
+
+    def sleep(self, seconds: float) -> Optional[RcloneError]:
+        """sleep
+
+        Wait for seconds, ie between retries, returning early if the cancel
+        handle is cancelled. Returns why no more commands can be started, as
+        with stopped.
+        """
+
+        if self.cancel_handle is not None:
+            self.cancel_handle.wait(seconds)
+        else:
+            time.sleep(seconds)
+
+        return self.stopped()
+
+
+def _expires(deadline: RcloneDeadline) -> float:
+    """_expires
+
+    Order deadlines by when they expire.
+    """
+    return deadline.expires
+
+
+class RcloneProcessWatch:
+    """RcloneProcessWatch
+
+    Watch a running rclone process, stopping it if it runs out of time or is
+    cancelled, for use as a context manager around waiting on it.
+
+    The process is stopped cleanly where possible, ie it is sent SIGTERM, so
+    rclone can finish writing its output and clean up, then SIGKILL if it
+    hasn't exited after kill_grace seconds. Once the block exits, reason is
+    why the process was stopped, or None if it finished by itself.
+    """
+
+    def __init__(
+        self,
+        process: "subprocess.Popen[bytes]",
+        limits: RcloneLimits,
+        kill_grace: float = 5.0,
+    ) -> None:
+        self.process: "subprocess.Popen[bytes]" = process
+        self.limits: RcloneLimits = limits
+        self.kill_grace: float = kill_grace
+        self.reason: Optional[RcloneError] = None
+
+        self._finished: bool = False
+        self._timers: List[threading.Timer] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def __enter__(self) -> "RcloneProcessWatch":
+        time_left: Optional[float] = self.limits.time_left()
+
+        if time_left is not None:
+            self._start_timer(time_left, self._time_out)
+
+        if self.limits.cancel_handle is not None:
+            # pylint: disable=protected-access
+            if not self.limits.cancel_handle._register(self):
+                self.stop(RcloneError.CANCELLED)
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:  # type: ignore
+        with self._lock:
+            self._finished = True
+
+            for timer in self._timers:
+                timer.cancel()
+
+        if self.limits.cancel_handle is not None:
+            # pylint: disable=protected-access
+            self.limits.cancel_handle._unregister(self)
+
+    def _start_timer(self, seconds: float, action: Callable[[], None]) -> None:
+        """_start_timer
+
+        Run action after seconds, unless the process finishes first.
+        """
+
+        timer: threading.Timer = threading.Timer(seconds, action)
+        timer.daemon = True
+        self._timers.append(timer)
+        timer.start()
+
+    def _time_out(self) -> None:
+        """_time_out
+
+        Stop the process for running out of time.
+        """
+        self.stop(RcloneError.TIMEOUT)
+
+    def _kill(self) -> None:
+        """_kill
+
+        Kill the process, if it is still running.
+        """
+
+        with self._lock:
+            if not self._finished:
+                self.process.kill()
+
+    def stop(self, reason: RcloneError) -> None:
+        """stop
+
+        Ask the process to exit, killing it if it hasn't after kill_grace
+        seconds. Only the first reason is kept.
+        """
+
+        with self._lock:
+            if self._finished or self.reason is not None:
+                return
+
+            self.reason = reason
+            self.process.terminate()
+            self._start_timer(self.kill_grace, self._kill)
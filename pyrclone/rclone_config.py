@@ -7,9 +7,9 @@ a given location.
 from __future__ import annotations
 
 from configparser import ConfigParser
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from os import path
-from typing import List
+from typing import List, Optional
 
 
 class RcloneConfig:
@@ -54,7 +54,11 @@ class RCloneRemote:
     def __init__(self, remote_name: str, config_file: ConfigParser):
         self.name: str = remote_name
         self.options: RCloneRemoteOptions = RCloneRemoteOptions(
-            remote_type=config_file.get(self.name, "type")
+            remote_type=config_file.get(self.name, "type"),
+            wrapped_remote=config_file.get(self.name, "remote", fallback=None),
+            option_names=[
+                option for option in config_file.options(self.name) if option != "type"
+            ],
         )
 
 
@@ -63,6 +67,12 @@ class RCloneRemoteOptions:
     """RCloneRemoteOptions
 
     A simple data class to store option values about a remote.
+
+    For backends that wrap another remote, such as crypt or alias,
+    wrapped_remote is the path they wrap, ie "dropbox:Encrypted".
+    option_names are the names of every other option set for the remote.
     """
 
     remote_type: str
+    wrapped_remote: Optional[str] = None
+    option_names: List[str] = field(default_factory=list)
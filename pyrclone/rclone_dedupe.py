@@ -0,0 +1,334 @@
+# pylint: disable=C0411
+"""rclone_dedupe
+
+Find duplicate files across remotes by their hashes, as listed by rclone,
+without downloading anything.
+"""
+
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .rclone_bulk import RcloneBulkResult
+from .rclone_cache import paths_overlap
+from .rclone_listing import entry_hashes, entry_is_dir, entry_path, entry_size
+from .rclone_output import RcloneError
+from .rclone_stream import LsjsonEntry
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+# The end of a chain of records with the same hash.
+NO_RECORD: int = -1
+
+# Hash types rclone doesn't show as hex, so can't be packed into bytes.
+TEXT_HASH_TYPES: Tuple[str, ...] = ("quickxor",)
+
+
+class RcloneDuplicateGroup:
+    """RcloneDuplicateGroup
+
+    Files with the same hash, as (remote, path) locations in the order they
+    were added to the index.
+    """
+
+    __slots__ = ("hash", "size", "locations")
+
+    def __init__(
+        self, hash_value: str, size: int, locations: List[Tuple[str, str]]
+    ) -> None:
+        self.hash: str = hash_value
+        self.size: int = size
+        self.locations: List[Tuple[str, str]] = locations
+
+    def __repr__(self) -> str:
+        return f"RcloneDuplicateGroup({self.hash!r}, {self.size}, {self.locations!r})"
+
+    @property
+    def reclaimable(self) -> int:
+        """reclaimable
+
+        The bytes freed by keeping only one of the files.
+        """
+        return self.size * (len(self.locations) - 1)
+
+
+def keep_first(group: RcloneDuplicateGroup) -> int:  # pylint: disable=W0613
+    """keep_first
+
+    Keep the first location of a duplicate group, ie the one on the earliest
+    remote added to the index.
+    """
+    return 0
+
+
+def check_locations(rclone: "Rclone", locations: Iterable[str]) -> None:
+    """check_locations
+
+    Raise ValueError if any two locations could hold the same files, ie an
+    alias of a remote and the remote itself, or a folder and one inside it,
+    as a file found through both would look like its own duplicate, and
+    removing the duplicates would remove it.
+
+    Each location is resolved to where it is actually stored first. Remotes
+    joining several others, such as union, can't be resolved, so can only
+    be used on their own.
+    """
+
+    locations = list(locations)
+    resolved: List[Tuple[str, Optional[str]]] = [
+        (location, rclone.underlying_path(location)) for location in locations
+    ]
+
+    for position, (location, path) in enumerate(resolved):
+        for other_location, other_path in resolved[position + 1 :]:
+            if path is None or other_path is None or paths_overlap(path, other_path):
+                raise ValueError(
+                    f"{location} and {other_location} could hold the same files"
+                )
+
+
+class RcloneHashIndex:
+    """RcloneHashIndex
+
+    An index from the hashes of files to where they are, across any number
+    of remotes.
+
+    Only a single hash type can be compared across remotes, so files without
+    a hash of hash_type are skipped, and counted in unhashed. Remotes are
+    listed with only that hash, to avoid computing the others.
+
+    Records are held in flat arrays rather than an object per file, ie the
+    remote, size and path offset are packed into arrays, paths are stored as
+    UTF-8 in a single buffer, and files with the same hash are chained
+    through an array of record numbers. The only per file objects are the
+    dictionary entries of distinct hashes, so tens of millions of files can
+    be indexed.
+    """
+
+    def __init__(self, hash_type: str = "md5") -> None:
+        self.hash_type: str = hash_type
+        self.remotes: List[str] = []
+        self.return_codes: Dict[str, Optional[RcloneError]] = {}
+        self.unhashed: int = 0
+
+        self._hex: bool = hash_type not in TEXT_HASH_TYPES
+        self._remote_numbers: Dict[str, int] = {}
+        self._first: Dict[bytes, int] = {}
+        self._next: "array[int]" = array("q")
+        self._record_remotes: "array[int]" = array("H")
+        self._sizes: "array[int]" = array("q")
+        self._path_ends: "array[int]" = array("Q")
+        self._paths: bytearray = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def add(self, remote: str, entry: LsjsonEntry) -> None:
+        """add
+
+        Add a single entry of a listing of remote.
+        """
+
+        if entry_is_dir(entry):
+            return
+
+        hash_value: Optional[str] = entry_hashes(entry).get(self.hash_type)
+        digest: Optional[bytes] = self._digest(hash_value) if hash_value else None
+
+        if digest is None:
+            self.unhashed += 1
+            return
+
+        if remote not in self._remote_numbers:
+            self._remote_numbers[remote] = len(self.remotes)
+            self.remotes.append(remote)
+
+        record: int = len(self._sizes)
+
+        self._next.append(self._first.get(digest, NO_RECORD))
+        self._first[digest] = record
+        self._record_remotes.append(self._remote_numbers[remote])
+        self._sizes.append(entry_size(entry))
+        self._paths += entry_path(entry).encode("utf-8")
+        self._path_ends.append(len(self._paths))
+
+    def add_listing(self, remote: str, listing: Iterable[LsjsonEntry]) -> None:
+        """add_listing
+
+        Add every entry of a listing of remote.
+        """
+
+        for entry in listing:
+            self.add(remote, entry)
+
+    def _digest(self, hash_value: str) -> Optional[bytes]:
+        """_digest
+
+        Pack a hash into bytes, halving the size of hex hashes, or None if it
+        isn't a valid hash.
+        """
+
+        if not self._hex:
+            return hash_value.encode("utf-8")
+
+        try:
+            return bytes.fromhex(hash_value)
+        except ValueError:
+            return None
+
+    def _location(self, record: int) -> Tuple[str, str]:
+        """_location
+
+        The remote and path of a record.
+        """
+
+        start: int = self._path_ends[record - 1] if record else 0
+
+        return (
+            self.remotes[self._record_remotes[record]],
+            self._paths[start : self._path_ends[record]].decode("utf-8"),
+        )
+
+    def _group(self, digest: bytes, hash_value: str) -> RcloneDuplicateGroup:
+        """_group
+
+        Every location of the records with a given hash.
+        """
+
+        records: List[int] = []
+        record: int = self._first.get(digest, NO_RECORD)
+
+        while record != NO_RECORD:
+            records.append(record)
+            record = self._next[record]
+
+        # Chains run from the newest record back to the oldest.
+        records.reverse()
+
+        return RcloneDuplicateGroup(
+            hash_value,
+            self._sizes[records[0]] if records else 0,
+            [self._location(record) for record in records],
+        )
+
+    def locations(self, hash_value: str) -> List[Tuple[str, str]]:
+        """locations
+
+        The remote and path of every file with a given hash.
+        """
+
+        digest: Optional[bytes] = self._digest(hash_value)
+
+        if digest is None:
+            return []
+
+        return self._group(digest, hash_value).locations
+
+    def duplicates(self, min_size: int = 0) -> Iterator[RcloneDuplicateGroup]:
+        """duplicates
+
+        Every group of at least two files with the same hash, of at least
+        min_size bytes each.
+        """
+
+        for digest, record in self._first.items():
+            if self._next[record] == NO_RECORD or self._sizes[record] < min_size:
+                continue
+
+            yield self._group(
+                digest, digest.hex() if self._hex else digest.decode("utf-8")
+            )
+
+    def reclaimable_bytes(self, min_size: int = 0) -> int:
+        """reclaimable_bytes
+
+        The bytes freed by removing every duplicate, keeping one of each.
+        """
+
+        total: int = 0
+
+        for record in self._first.values():
+            size: int = self._sizes[record]
+            record = self._next[record]
+
+            if size < min_size:
+                continue
+
+            while record != NO_RECORD:
+                total += size
+                record = self._next[record]
+
+        return total
+
+    def removal_set(
+        self,
+        keep: Callable[[RcloneDuplicateGroup], int] = keep_first,
+        min_size: int = 0,
+    ) -> Dict[str, List[str]]:
+        """removal_set
+
+        The paths to delete to leave one copy of every duplicate, by remote.
+        keep picks the location to keep from each group, by its position in
+        locations.
+        """
+
+        removals: Dict[str, List[str]] = {}
+
+        for group in self.duplicates(min_size):
+            kept: int = keep(group)
+
+            for position, (remote, path) in enumerate(group.locations):
+                if position != kept:
+                    removals.setdefault(remote, []).append(path)
+
+        return removals
+
+    def remove_duplicates(
+        self,
+        rclone: "Rclone",
+        keep: Callable[[RcloneDuplicateGroup], int] = keep_first,
+        min_size: int = 0,
+        flags: Iterable[str] = tuple(),
+        dry_run: bool = False,
+    ) -> Dict[str, RcloneBulkResult]:
+        """remove_duplicates
+
+        Delete the removal set, with a batched delete per remote rather than
+        one per file, returning the result for each remote. Nothing is
+        deleted, and a warning is logged, if any listing failed. With
+        dry_run, rclone only reports what it would delete.
+
+        Raises ValueError if any of the remotes could hold the same files, as
+        found by check_locations.
+        """
+
+        flags = list(flags) + (["--dry-run"] if dry_run else [])
+        results: Dict[str, RcloneBulkResult] = {}
+
+        check_locations(rclone, self.remotes)
+
+        failed: List[str] = [
+            remote
+            for remote, return_code in self.return_codes.items()
+            if return_code not in (None, RcloneError.SUCCESS)
+        ]
+
+        if failed:
+            rclone.logger.warning(
+                f"Listing {failed} failed, not removing any duplicates"
+            )
+            return results
+
+        for remote, paths in self.removal_set(keep, min_size).items():
+            results[remote] = rclone.delete_many(remote, paths, flags)
+
+        return results
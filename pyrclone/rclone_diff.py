@@ -0,0 +1,174 @@
+# pylint: disable=C0411
+"""rclone_diff
+
+Compare two listings of files, to find the minimal set of files to transfer
+or delete to make one match the other.
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .rclone_listing import (
+    entry_hashes,
+    entry_is_dir,
+    entry_mod_time,
+    entry_path,
+    entry_size,
+    files_from,
+)
+from .rclone_output import RcloneOutput
+from .rclone_stream import LsjsonEntry
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+# The parts of an entry needed to compare it, ie (size, mod time, hashes).
+EntrySummary = Tuple[int, Optional[float], Dict[str, str]]
+
+
+@dataclass
+class RcloneDiff:
+    """RcloneDiff
+
+    The paths of the files that differ between two listings.
+    """
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    def transfer_paths(self) -> List[str]:
+        """transfer_paths
+
+        The files that need copying to bring the old listing up to date.
+        """
+        return self.added + self.modified
+
+    def apply(
+        self,
+        rclone: "Rclone",
+        source: str,
+        destination: str,
+        flags: Iterable[str] = tuple(),
+        delete: bool = True,
+    ) -> List[RcloneOutput]:
+        """apply
+
+        Make a destination match a source, where the destination was the old
+        listing and the source the new one.
+
+        Only the changed files are copied, in a single copy command, and if
+        delete is set, the removed files are deleted from the destination in
+        a single delete command. Neither side is walked again.
+        """
+
+        outputs: List[RcloneOutput] = []
+        flags = list(flags)
+
+        if self.transfer_paths():
+            with files_from(self.transfer_paths()) as list_path:
+                outputs.append(
+                    rclone.copy(
+                        source,
+                        destination,
+                        ["--files-from-raw", list_path, "--no-traverse"] + flags,
+                    )
+                )
+
+        if delete and self.removed:
+            with files_from(self.removed) as list_path:
+                outputs.append(
+                    rclone.delete(destination, ["--files-from-raw", list_path] + flags)
+                )
+
+        return outputs
+
+
+def _differs(
+    old: EntrySummary,
+    new: EntrySummary,
+    compare_mod_time: bool,
+    compare_hash: bool,
+    modify_window: float,
+) -> bool:
+    """_differs
+
+    Check if a file has changed, in the same way as rclone does, ie files of
+    a different size differ. Otherwise, if both have a hash of the same type,
+    they differ if it doesn't match, otherwise if their modification times
+    are further apart than modify_window.
+    """
+
+    if old[0] != new[0]:
+        return True
+
+    if compare_hash:
+        for hash_type, old_hash in old[2].items():
+            new_hash: Optional[str] = new[2].get(hash_type)
+
+            if old_hash and new_hash:
+                return old_hash != new_hash
+
+    if compare_mod_time and old[1] is not None and new[1] is not None:
+        return abs(old[1] - new[1]) > modify_window
+
+    return False
+
+
+def diff_listings(
+    old: Iterable[LsjsonEntry],
+    new: Iterable[LsjsonEntry],
+    compare_mod_time: bool = True,
+    compare_hash: bool = True,
+    modify_window: float = 0.0,
+) -> RcloneDiff:
+    """diff_listings
+
+    Compare two listings of files, ie from lsjson or RcloneListingIndex.
+
+    For a source and destination, the destination is the old listing and the
+    source the new one. Directories are ignored.
+
+    The old listing is loaded into a dictionary keyed by path, which the new
+    listing is then streamed against, so each side is only read once and
+    only the old side is held in memory.
+    """
+
+    old_files: Dict[str, EntrySummary] = {
+        entry_path(entry): (
+            entry_size(entry),
+            entry_mod_time(entry),
+            entry_hashes(entry),
+        )
+        for entry in old
+        if not entry_is_dir(entry)
+    }
+
+    diff: RcloneDiff = RcloneDiff()
+
+    for entry in new:
+        if entry_is_dir(entry):
+            continue
+
+        path: str = entry_path(entry)
+        old_file: Optional[EntrySummary] = old_files.pop(path, None)
+
+        if old_file is None:
+            diff.added.append(path)
+            continue
+
+        new_file: EntrySummary = (
+            entry_size(entry),
+            entry_mod_time(entry),
+            entry_hashes(entry),
+        )
+
+        if _differs(old_file, new_file, compare_mod_time, compare_hash, modify_window):
+            diff.modified.append(path)
+        else:
+            diff.unchanged.append(path)
+
+    diff.removed = list(old_files)
+
+    return diff
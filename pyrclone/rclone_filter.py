@@ -0,0 +1,133 @@
+# pylint: disable=C0411
+"""rclone_filter
+
+A typed description of which entries a listing should include, which is
+translated into rclone's own filter flags, so the filtering is done by rclone
+at the source rather than on its output.
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import timedelta
+from typing import List, Optional
+
+
+def format_duration(duration: timedelta) -> str:
+    """format_duration
+
+    Format a duration in the form rclone expects, ie "90s".
+    """
+
+    seconds: str = f"{duration.total_seconds():.6f}".rstrip("0").rstrip(".")
+
+    return f"{seconds}s"
+
+
+@dataclass
+class RcloneListingFilter:
+    """RcloneListingFilter
+
+    The entries a listing should include.
+
+    Sizes are in bytes, and ages are relative to when the listing is ran. The
+    include and exclude globs use rclone's filter pattern syntax, and as with
+    rclone, if both are given the includes take priority.
+    """
+
+    files_only: bool = False
+    dirs_only: bool = False
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    min_age: Optional[timedelta] = None
+    max_age: Optional[timedelta] = None
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    max_depth: Optional[int] = None
+
+    def to_flags(self) -> List[str]:
+        """to_flags
+
+        The rclone flags that apply this filter, for lsjson and lsf.
+        """
+        return self.type_flags() + self.rule_flags()
+
+    def type_flags(self) -> List[str]:
+        """type_flags
+
+        The flags restricting the listing to files or directories, which only
+        lsjson and lsf accept.
+        """
+
+        flags: List[str] = []
+
+        if self.files_only:
+            flags.append("--files-only")
+
+        if self.dirs_only:
+            flags.append("--dirs-only")
+
+        return flags
+
+    def rule_flags(self) -> List[str]:
+        """rule_flags
+
+        The size, age, pattern and depth flags, which every command accepts.
+        """
+
+        flags: List[str] = []
+
+        if self.min_size is not None:
+            flags += ["--min-size", f"{self.min_size}B"]
+
+        if self.max_size is not None:
+            flags += ["--max-size", f"{self.max_size}B"]
+
+        if self.min_age is not None:
+            flags += ["--min-age", format_duration(self.min_age)]
+
+        if self.max_age is not None:
+            flags += ["--max-age", format_duration(self.max_age)]
+
+        for pattern in self.include:
+            flags += ["--include", pattern]
+
+        for pattern in self.exclude:
+            flags += ["--exclude", pattern]
+
+        if self.max_depth is not None:
+            flags += ["--max-depth", str(self.max_depth)]
+
+        return flags
+
+
+def listing_flags(
+    listing_filter: Optional[RcloneListingFilter], type_flags: bool = True
+) -> List[str]:
+    """listing_flags
+
+    The flags for an optional filter. If type_flags isn't set, the flags only
+    lsjson and lsf accept are left out.
+    """
+
+    if listing_filter is None:
+        return []
+
+    if not type_flags:
+        return listing_filter.rule_flags()
+
+    return listing_filter.to_flags()
+
+
+def only_files(listing_filter: Optional[RcloneListingFilter]) -> RcloneListingFilter:
+    """only_files
+
+    A copy of an optional filter, which only includes files.
+    """
+    return replace(listing_filter or RcloneListingFilter(), files_only=True)
+
+
+def only_dirs(listing_filter: Optional[RcloneListingFilter]) -> RcloneListingFilter:
+    """only_dirs
+
+    A copy of an optional filter, which only includes directories.
+    """
+    return replace(listing_filter or RcloneListingFilter(), dirs_only=True)
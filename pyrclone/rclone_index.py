@@ -0,0 +1,389 @@
+# pylint: disable=C0411
+"""rclone_index
+
+A local SQLite index of remote listings, such that questions about a remote
+can be answered from a stored snapshot rather than by listing it again.
+"""
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .rclone_listing import (
+    entry_hashes,
+    entry_is_dir,
+    entry_mod_time,
+    entry_path,
+    entry_size,
+)
+from .rclone_output import RcloneError
+from .rclone_stream import LsjsonEntry, RcloneJsonStream
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    remote TEXT NOT NULL,
+    created REAL NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mod_time REAL,
+    mod_time_text TEXT,
+    is_dir INTEGER NOT NULL,
+    hashes TEXT,
+    PRIMARY KEY (snapshot_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_mod_time ON entries (snapshot_id, mod_time);
+CREATE INDEX IF NOT EXISTS entries_size ON entries (snapshot_id, size);
+CREATE INDEX IF NOT EXISTS entries_is_dir ON entries (snapshot_id, is_dir);
+CREATE INDEX IF NOT EXISTS snapshots_remote ON snapshots (remote, created);
+"""
+
+EntryRow = Tuple[int, str, int, Optional[float], Optional[str], int, Optional[str]]
+SqlValue = Union[int, float, str, None]
+
+
+@dataclass
+class RcloneSnapshot:
+    """RcloneSnapshot
+
+    A simple data class to store the details of a stored listing.
+
+    A snapshot is only complete if the listing finished successfully.
+    """
+
+    snapshot_id: int
+    remote: str
+    created: float
+    complete: bool
+
+
+class RcloneListingIndex:
+    """RcloneListingIndex
+
+    A class to store recursive listings of remotes in an SQLite database.
+
+    Each listing is stored as a snapshot, so a remote can have many, and the
+    entries of each snapshot are indexed by path, modification time, size and
+    type. Listings are inserted in batches as they are streamed from rclone,
+    so the full listing is never held in memory.
+    """
+
+    def __init__(self, database_path: str = ":memory:") -> None:
+        self.database_path: str = database_path
+
+        self._connection: sqlite3.Connection = sqlite3.connect(database_path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "RcloneListingIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:  # type: ignore
+        self.close()
+
+    def close(self) -> None:
+        """close
+
+        Close the database.
+        """
+        self._connection.close()
+
+    @staticmethod
+    def _entry_row(snapshot_id: int, entry: LsjsonEntry) -> EntryRow:
+        """_entry_row
+
+        Convert a listing entry to a row of the entries table.
+        """
+
+        mod_time_text: Optional[object] = entry.get("ModTime")
+        hashes: Optional[str] = None
+
+        if entry_hashes(entry):
+            hashes = json.dumps(entry_hashes(entry), sort_keys=True)
+
+        return (
+            snapshot_id,
+            entry_path(entry),
+            entry_size(entry),
+            entry_mod_time(entry),
+            mod_time_text if isinstance(mod_time_text, str) else None,
+            int(entry_is_dir(entry)),
+            hashes,
+        )
+
+    @staticmethod
+    def _row_entry(row: Sequence[SqlValue]) -> LsjsonEntry:
+        """_row_entry
+
+        Convert a row of the entries table back to a listing entry.
+        """
+
+        path: str = str(row[0])
+        entry: LsjsonEntry = {
+            "Path": path,
+            "Name": path.rsplit("/", 1)[-1],
+            "Size": row[1],
+            "IsDir": bool(row[3]),
+        }
+
+        if row[2] is not None:
+            entry["ModTime"] = row[2]
+
+        if row[4] is not None:
+            hashes: Dict[str, str] = json.loads(str(row[4]))
+            entry["Hashes"] = hashes
+
+        return entry
+
+    def add_snapshot(
+        self,
+        remote: str,
+        entries: Iterable[LsjsonEntry],
+        complete: bool = True,
+        batch_size: int = 10000,
+    ) -> RcloneSnapshot:
+        """add_snapshot
+
+        Store a listing of a remote as a new snapshot.
+
+        The entries are inserted batch_size at a time, so they can be given as
+        a stream.
+        """
+
+        created: float = time.time()
+        cursor: sqlite3.Cursor = self._connection.execute(
+            "INSERT INTO snapshots (remote, created) VALUES (?, ?)", (remote, created)
+        )
+        snapshot_id: int = int(cursor.lastrowid or 0)
+
+        entry_iterator: Iterator[LsjsonEntry] = iter(entries)
+        while True:
+            batch: List[EntryRow] = [
+                self._entry_row(snapshot_id, entry)
+                for entry in islice(entry_iterator, batch_size)
+            ]
+
+            if not batch:
+                break
+
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", batch
+            )
+
+        self._connection.execute(
+            "UPDATE snapshots SET complete = ? WHERE id = ?",
+            (int(complete), snapshot_id),
+        )
+        self._connection.commit()
+
+        return RcloneSnapshot(snapshot_id, remote, created, complete)
+
+    def ingest(
+        self,
+        rclone: "Rclone",
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        batch_size: int = 10000,
+    ) -> RcloneSnapshot:
+        """ingest
+
+        Recursively list a remote, and store the listing as a new snapshot.
+
+        If the listing fails, what was listed is kept, but the snapshot is
+        not marked as complete.
+        """
+
+        listing: RcloneJsonStream = rclone.iter_lsjson(remote, ["-R"] + list(flags))
+        snapshot: RcloneSnapshot = self.add_snapshot(remote, listing, False, batch_size)
+
+        if listing.return_code is RcloneError.SUCCESS:
+            self._connection.execute(
+                "UPDATE snapshots SET complete = 1 WHERE id = ?",
+                (snapshot.snapshot_id,),
+            )
+            self._connection.commit()
+            snapshot.complete = True
+
+        return snapshot
+
+    def snapshots(self, remote: Optional[str] = None) -> List[RcloneSnapshot]:
+        """snapshots
+
+        Return the stored snapshots, oldest first, optionally only for a
+        given remote.
+        """
+
+        query: str = "SELECT id, remote, created, complete FROM snapshots"
+        parameters: Tuple[str, ...] = tuple()
+
+        if remote is not None:
+            query += " WHERE remote = ?"
+            parameters = (remote,)
+
+        rows: List[Tuple[int, str, float, int]] = self._connection.execute(
+            query + " ORDER BY created, id", parameters
+        ).fetchall()
+
+        return [RcloneSnapshot(row[0], row[1], row[2], bool(row[3])) for row in rows]
+
+    def latest_snapshot(
+        self, remote: str, complete_only: bool = True
+    ) -> Optional[RcloneSnapshot]:
+        """latest_snapshot
+
+        Return the most recent snapshot of a given remote, if there is one.
+        """
+
+        for snapshot in reversed(self.snapshots(remote)):
+            if snapshot.complete or not complete_only:
+                return snapshot
+
+        return None
+
+    def delete_snapshot(self, snapshot_id: int) -> None:
+        """delete_snapshot
+
+        Remove a snapshot and all of its entries.
+        """
+
+        self._connection.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+        self._connection.commit()
+
+    def entries(
+        self,
+        snapshot_id: int,
+        prefix: Optional[str] = None,
+        files_only: bool = False,
+        dirs_only: bool = False,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        modified_before: Optional[float] = None,
+        modified_after: Optional[float] = None,
+    ) -> Iterator[LsjsonEntry]:
+        """entries
+
+        Query the entries of a snapshot, returning them in the same form as
+        lsjson, ordered by path.
+
+        Entries can be limited to those inside a given folder, of a given
+        type, in a given size range, or last modified in a given range of
+        times (as seconds since the epoch).
+        """
+
+        conditions: List[str] = ["snapshot_id = ?"]
+        parameters: List[SqlValue] = [snapshot_id]
+
+        if prefix:
+            conditions.append("path >= ? AND path < ?")
+            parameters += [prefix.rstrip("/") + "/", prefix.rstrip("/") + "0"]
+
+        if files_only:
+            conditions.append("is_dir = 0")
+
+        if dirs_only:
+            conditions.append("is_dir = 1")
+
+        if min_size is not None:
+            conditions.append("size >= ?")
+            parameters.append(min_size)
+
+        if max_size is not None:
+            conditions.append("size <= ?")
+            parameters.append(max_size)
+
+        if modified_before is not None:
+            conditions.append("mod_time < ?")
+            parameters.append(modified_before)
+
+        if modified_after is not None:
+            conditions.append("mod_time >= ?")
+            parameters.append(modified_after)
+
+        rows: Iterator[Sequence[SqlValue]] = iter(
+            self._connection.execute(
+                "SELECT path, size, mod_time_text, is_dir, hashes FROM entries "
+                f"WHERE {' AND '.join(conditions)} ORDER BY path",
+                parameters,
+            )
+        )
+
+        for row in rows:
+            yield self._row_entry(row)
+
+    def summary(self, snapshot_id: int) -> Tuple[int, int]:
+        """summary
+
+        Return the number of files in a snapshot, and their total size.
+        """
+
+        row: Tuple[Optional[int], Optional[int]] = self._connection.execute(
+            "SELECT COUNT(*), SUM(size) FROM entries "
+            "WHERE snapshot_id = ? AND is_dir = 0",
+            (snapshot_id,),
+        ).fetchone()
+
+        return row[0] or 0, row[1] or 0
+
+    def changes(
+        self, old_snapshot_id: int, new_snapshot_id: int
+    ) -> Iterator[Tuple[str, str]]:
+        """changes
+
+        Compare two snapshots of the same remote, returning pairs of
+        ("added" | "removed" | "modified", path) for every file that differs.
+
+        Files are modified if their size or modification time has changed.
+        """
+
+        queries: List[Tuple[str, str, Tuple[int, int]]] = [
+            (
+                "added",
+                "SELECT new.path FROM entries AS new LEFT JOIN entries AS old "
+                "ON old.snapshot_id = ? AND old.path = new.path "
+                "WHERE new.snapshot_id = ? AND new.is_dir = 0 AND old.path IS NULL",
+                (old_snapshot_id, new_snapshot_id),
+            ),
+            (
+                "removed",
+                "SELECT old.path FROM entries AS old LEFT JOIN entries AS new "
+                "ON new.snapshot_id = ? AND new.path = old.path "
+                "WHERE old.snapshot_id = ? AND old.is_dir = 0 AND new.path IS NULL",
+                (new_snapshot_id, old_snapshot_id),
+            ),
+            (
+                "modified",
+                "SELECT new.path FROM entries AS new JOIN entries AS old "
+                "ON old.snapshot_id = ? AND old.path = new.path "
+                "WHERE new.snapshot_id = ? AND new.is_dir = 0 AND ("
+                "old.size != new.size OR old.mod_time IS NOT new.mod_time)",
+                (old_snapshot_id, new_snapshot_id),
+            ),
+        ]
+
+        for change, query, parameters in queries:
+            rows: Iterator[Tuple[str]] = iter(
+                self._connection.execute(query, parameters)
+            )
+
+            for row in rows:
+                yield change, row[0]
@@ -0,0 +1,149 @@
+# pylint: disable=C0411
+"""rclone_listing
+
+Helpers to read the fields of the entries of an rclone JSON listing.
+"""
+
+import calendar
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Pattern, cast
+
+from .rclone_stream import LsjsonEntry
+
+# rclone writes times in RFC 3339 with up to nanosecond precision, ie
+# "2019-01-13T17:55:33.8053678Z" or "2019-01-13T17:41:00+01:00".
+MOD_TIME_PATTERN: Pattern[str] = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)?"
+)
+
+
+def parse_mod_time(mod_time: str) -> float:
+    """parse_mod_time
+
+    Convert a time written by rclone to seconds since the epoch.
+
+    This is done by hand rather than with datetime, as datetime can't parse
+    more than microsecond precision and is much slower over large listings.
+    """
+
+    time_match: Optional["re.Match[str]"] = MOD_TIME_PATTERN.match(mod_time)
+
+    if time_match is None:
+        raise ValueError(f"Can't parse time {mod_time}")
+
+    seconds: float = float(
+        calendar.timegm(
+            (
+                int(time_match.group(1)),
+                int(time_match.group(2)),
+                int(time_match.group(3)),
+                int(time_match.group(4)),
+                int(time_match.group(5)),
+                int(time_match.group(6)),
+                0,
+                0,
+                0,
+            )
+        )
+    )
+
+    fraction: Optional[str] = time_match.group(7)
+    if fraction is not None:
+        seconds += float(fraction)
+
+    offset: Optional[str] = time_match.group(8)
+    if offset is not None and offset != "Z":
+        offset_seconds: int = int(offset[1:3]) * 3600 + int(offset[4:6]) * 60
+        seconds += -offset_seconds if offset[0] == "+" else offset_seconds
+
+    return seconds
+
+
+def entry_path(entry: LsjsonEntry) -> str:
+    """entry_path
+
+    The path of an entry, relative to the listed remote.
+    """
+    return str(entry["Path"])
+
+
+def entry_size(entry: LsjsonEntry) -> int:
+    """entry_size
+
+    The size of an entry in bytes, which is -1 for directories.
+    """
+    return cast(int, entry.get("Size", -1))
+
+
+def entry_is_dir(entry: LsjsonEntry) -> bool:
+    """entry_is_dir
+
+    If an entry is a directory.
+    """
+    return entry.get("IsDir") is True
+
+
+def entry_mod_time(entry: LsjsonEntry) -> Optional[float]:
+    """entry_mod_time
+
+    The modification time of an entry in seconds since the epoch, if known.
+    """
+
+    mod_time: Optional[object] = entry.get("ModTime")
+
+    if not isinstance(mod_time, str):
+        return None
+
+    return parse_mod_time(mod_time)
+
+
+def entry_hashes(entry: LsjsonEntry) -> Dict[str, str]:
+    """entry_hashes
+
+    The hashes of an entry, keyed by hash type, if listed with "--hash".
+    """
+    no_hashes: Dict[str, str] = {}
+    return cast(Dict[str, str], entry.get("Hashes") or no_hashes)
+
+
+def join_path(remote: str, path: str) -> str:
+    """join_path
+
+    Join a path relative to a remote onto the remote, ie "dropbox:Photos" and
+    "2019/a.jpg" to "dropbox:Photos/2019/a.jpg".
+    """
+
+    if not path or not remote or remote.endswith((":", "/")):
+        return remote + path
+
+    return f"{remote}/{path}"
+
+
+@contextmanager
+def files_from(paths: Iterable[str]) -> Iterator[str]:
+    """files_from
+
+    Write a list of paths to a temporary file, for use with rclone's
+    "--files-from-raw", and remove it once finished with, ie:
+        with files_from(["a.txt", "b.txt"]) as list_path:
+            rclone.copy(source, destination, ["--files-from-raw", list_path])
+
+    The raw variant is expected, as "--files-from" would strip whitespace and
+    treat paths starting with "#" or ";" as comments.
+    """
+
+    file_descriptor, list_path = tempfile.mkstemp(prefix="pyrclone-", suffix=".txt")
+
+    try:
+        with os.fdopen(
+            file_descriptor, "w", encoding="utf-8", newline="\n"
+        ) as list_file:
+            for path in paths:
+                list_file.write(f"{path}\n")
+
+        yield list_path
+    finally:
+        os.remove(list_path)
@@ -0,0 +1,594 @@
+# pylint: disable=C0411
+"""rclone_local
+
+List local directories in process, with os.scandir, producing the same
+output as "rclone lsjson" and "rclone size --json", rather than starting
+rclone just to walk a directory.
+
+Only the flags understood here are supported. For anything else, ie include
+and exclude patterns, hashes or following symlinks, and for any error
+reading the tree, None is returned, so the caller can fall back to rclone,
+which produces its exact output and errors.
+"""
+
+import json
+import mimetypes
+import os
+import re
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+LOCAL_TYPE: str = "local"
+
+# Options of local remotes which don't change what is listed, so the remote
+# can still be listed in process.
+NEUTRAL_OPTIONS: Tuple[str, ...] = ("description", "nounc")
+
+# Flags which don't change what is listed, so are ignored.
+IGNORED_FLAGS: Tuple[str, ...] = ("--fast-list", "--dry-run", "-v", "-vv", "-vvv")
+
+# Flags which take a value, as "--flag value" or "--flag=value".
+VALUE_FLAGS: Tuple[str, ...] = (
+    "--max-depth",
+    "--min-size",
+    "--max-size",
+    "--min-age",
+    "--max-age",
+)
+
+# The multiplier of each size suffix rclone accepts. Sizes without a suffix
+# are in KiB.
+SIZE_SUFFIXES: Dict[str, int] = {
+    "": 1 << 10,
+    "b": 1,
+    "k": 1 << 10,
+    "m": 1 << 20,
+    "g": 1 << 30,
+    "t": 1 << 40,
+    "p": 1 << 50,
+    "e": 1 << 60,
+}
+
+# The seconds in each duration unit rclone accepts, where a month is 30 days
+# and a year 365.
+DURATION_UNITS: Dict[str, float] = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+    "M": 30 * 24 * 60 * 60,
+    "y": 365 * 24 * 60 * 60,
+}
+
+SIZE_PATTERN: "re.Pattern[str]" = re.compile(r"([0-9]*\.?[0-9]+)([a-zA-Z]?)(?:i?B)?")
+DURATION_PATTERN: "re.Pattern[str]" = re.compile(
+    r"([0-9]*\.?[0-9]+)(ns|us|ms|[smhdwMy])"
+)
+
+# Go's encoding/json escapes these characters, where Python's doesn't.
+JSON_ESCAPES: Dict[int, str] = {
+    ord("<"): "\\u003c",
+    ord(">"): "\\u003e",
+    ord("&"): "\\u0026",
+    0x2028: "\\u2028",
+    0x2029: "\\u2029",
+}
+
+DIRECTORY_MIME_TYPE: str = "inode/directory"
+DEFAULT_MIME_TYPE: str = "application/octet-stream"
+
+
+@dataclass
+class RcloneLocalOptions:
+    """RcloneLocalOptions
+
+    The flags of a listing which can be done in process. Ages are in seconds.
+    """
+
+    recursive: bool = False
+    max_depth: Optional[int] = None
+    files_only: bool = False
+    dirs_only: bool = False
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    min_age: Optional[float] = None
+    max_age: Optional[float] = None
+    no_modtime: bool = False
+    no_mimetype: bool = False
+    skip_links: bool = False
+    json: bool = False
+
+    def depth(self) -> Optional[int]:
+        """depth
+
+        How many levels to list, or None for all of them. As with rclone, a
+        max depth applies even without "-R".
+        """
+
+        if self.max_depth is not None:
+            return self.max_depth
+
+        return None if self.recursive else 1
+
+
+class _LocalEntry(NamedTuple):
+    """_LocalEntry
+
+    A file or directory found walking a local tree.
+    """
+
+    path: str
+    name: str
+    is_dir: bool
+    size: int
+    mtime_ns: int
+
+
+class _UnsupportedTree(Exception):
+    """_UnsupportedTree
+
+    The tree has something which can't be listed exactly as rclone would.
+    """
+
+
+def parse_local_flags(flags: Iterable[str]) -> Optional[RcloneLocalOptions]:
+    """parse_local_flags
+
+    The options given by a listing's flags, or None if any of them can't be
+    handled in process.
+    """
+
+    options: RcloneLocalOptions = RcloneLocalOptions()
+    flag_list: List[str] = list(flags)
+    index: int = 0
+
+    while index < len(flag_list):
+        flag: str = flag_list[index]
+        value: Optional[str] = None
+        index += 1
+
+        if flag.startswith("--") and "=" in flag:
+            flag, value = flag.split("=", 1)
+        elif flag in VALUE_FLAGS:
+            if index == len(flag_list):
+                return None
+
+            value = flag_list[index]
+            index += 1
+
+        if flag in IGNORED_FLAGS:
+            continue
+
+        if flag in VALUE_FLAGS:
+            if value is None or not _set_value(options, flag, value):
+                return None
+        elif flag in ("-R", "--recursive"):
+            options.recursive = True
+        elif flag == "--files-only":
+            options.files_only = True
+        elif flag == "--dirs-only":
+            options.dirs_only = True
+        elif flag == "--no-modtime":
+            options.no_modtime = True
+        elif flag == "--no-mimetype":
+            options.no_mimetype = True
+        elif flag == "--skip-links":
+            options.skip_links = True
+        elif flag == "--json":
+            options.json = True
+        else:
+            return None
+
+    if options.max_depth == 0:
+        return None
+
+    return options
+
+
+def _set_value(options: RcloneLocalOptions, flag: str, value: str) -> bool:
+    """_set_value
+
+    Set the option of a flag taking a value, returning False if the value
+    can't be parsed.
+    """
+
+    if flag == "--max-depth":
+        if not value.isdigit():
+            return False
+
+        options.max_depth = int(value)
+        return True
+
+    if flag in ("--min-size", "--max-size"):
+        size: Optional[int] = parse_size(value)
+
+        if size is None:
+            return False
+
+        if flag == "--min-size":
+            options.min_size = size
+        else:
+            options.max_size = size
+
+        return True
+
+    duration: Optional[float] = parse_duration(value)
+
+    if duration is None:
+        return False
+
+    if flag == "--min-age":
+        options.min_age = duration
+    else:
+        options.max_age = duration
+
+    return True
+
+
+def parse_size(value: str) -> Optional[int]:
+    """parse_size
+
+    Parse a size as rclone does, ie "10M" or "512B", into bytes. None is
+    returned if it can't be parsed.
+    """
+
+    match: Optional["re.Match[str]"] = SIZE_PATTERN.fullmatch(value.strip())
+
+    if match is None:
+        return None
+
+    number, suffix = match.groups("")
+    multiplier: Optional[int] = SIZE_SUFFIXES.get(suffix.lower())
+
+    if multiplier is None:
+        return None
+
+    return int(float(number) * multiplier)
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """parse_duration
+
+    Parse a duration as rclone does, ie "90s" or "1h30m", into seconds.
+    Durations without a unit are in seconds. None is returned if it can't be
+    parsed, such as for an absolute date.
+    """
+
+    value = value.strip()
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    if DURATION_PATTERN.sub("", value) or not value:
+        return None
+
+    seconds: float = 0.0
+
+    for duration_match in DURATION_PATTERN.finditer(value):
+        number, unit = duration_match.groups("")
+        seconds += float(number) * DURATION_UNITS[unit]
+
+    return seconds
+
+
+def format_mod_time(mtime_ns: int) -> str:
+    """format_mod_time
+
+    Format a modification time as rclone does for local files, ie RFC 3339
+    in the local timezone with up to nanosecond precision, trailing zeros
+    removed.
+    """
+
+    seconds, nanoseconds = divmod(mtime_ns, 1_000_000_000)
+    local_time: time.struct_time = time.localtime(seconds)
+    fraction: str = f"{nanoseconds:09d}".rstrip("0")
+    offset: int = local_time.tm_gmtoff
+
+    zone: str = "Z"
+
+    if offset:
+        hours, minutes = divmod(abs(offset) // 60, 60)
+        zone = f"{'-' if offset < 0 else '+'}{hours:02d}:{minutes:02d}"
+
+    return (
+        time.strftime("%Y-%m-%dT%H:%M:%S", local_time)
+        + (f".{fraction}" if fraction else "")
+        + zone
+    )
+
+
+def mime_type(name: str) -> str:
+    """mime_type
+
+    The MIME type rclone gives a file with a given name, from its extension.
+    As with Go, text types are given a UTF-8 charset.
+    """
+
+    dot: int = name.rfind(".")
+
+    if dot == -1:
+        return DEFAULT_MIME_TYPE
+
+    extension: str = name[dot:]
+    found_type: Optional[str] = mimetypes.types_map.get(
+        extension
+    ) or mimetypes.types_map.get(extension.lower())
+
+    if found_type is None:
+        return DEFAULT_MIME_TYPE
+
+    if found_type.startswith("text/"):
+        return f"{found_type}; charset=utf-8"
+
+    return found_type
+
+
+def _scan(
+    directory: str, prefix: str, options: RcloneLocalOptions
+) -> Tuple[List[_LocalEntry], List[str]]:
+    """_scan
+
+    The entries of a directory, sorted by name as rclone does, and the paths
+    of the symlinks skipped in it.
+    """
+
+    entries: List[_LocalEntry] = []
+    links: List[str] = []
+
+    try:
+        with os.scandir(directory) as directory_entries:
+            for directory_entry in directory_entries:
+                name: str = directory_entry.name
+                name.encode("utf-8")
+                path: str = prefix + name
+
+                if directory_entry.is_symlink():
+                    if not options.skip_links:
+                        links.append(path)
+                    continue
+
+                entry_stat: os.stat_result = directory_entry.stat(follow_symlinks=False)
+                is_dir: bool = stat.S_ISDIR(entry_stat.st_mode)
+
+                if not is_dir and not stat.S_ISREG(entry_stat.st_mode):
+                    continue
+
+                entries.append(
+                    _LocalEntry(
+                        path,
+                        name,
+                        is_dir,
+                        -1 if is_dir else entry_stat.st_size,
+                        entry_stat.st_mtime_ns,
+                    )
+                )
+    except (OSError, UnicodeError) as error:
+        raise _UnsupportedTree(directory) from error
+
+    entries.sort(key=_entry_name)
+
+    return entries, links
+
+
+def _entry_name(entry: _LocalEntry) -> str:
+    """_entry_name
+
+    Order entries by name.
+    """
+    return entry.name
+
+
+def walk_local(
+    root: str, options: RcloneLocalOptions, max_workers: int = 1
+) -> Optional[Tuple[List[_LocalEntry], List[str]]]:
+    """walk_local
+
+    Walk a local directory to the depth of the options, returning every
+    entry that passes their filters, and the paths of the symlinks skipped.
+    None is returned if rclone should list it instead.
+
+    The tree is walked a level at a time, so with max_workers above 1, the
+    directories of each level are read in parallel, which suits network
+    filesystems. The entries are still in the same order.
+    """
+
+    if not os.path.isdir(root) or os.path.islink(root):
+        return None
+
+    depth: Optional[int] = options.depth()
+    now_ns: int = time.time_ns()
+    entries: List[_LocalEntry] = []
+    links: List[str] = []
+    level: List[Tuple[str, str]] = [(root, "")]
+    current_depth: int = 1
+
+    executor: Optional[ThreadPoolExecutor] = (
+        ThreadPoolExecutor(max_workers) if max_workers > 1 else None
+    )
+
+    try:
+        while level:
+            scans: List[Tuple[List[_LocalEntry], List[str]]]
+
+            if executor is not None and len(level) > 1:
+                scans = [
+                    future.result()
+                    for future in [
+                        executor.submit(_scan, directory, prefix, options)
+                        for directory, prefix in level
+                    ]
+                ]
+            else:
+                scans = [
+                    _scan(directory, prefix, options) for directory, prefix in level
+                ]
+
+            next_level: List[Tuple[str, str]] = []
+            descend: bool = depth is None or current_depth < depth
+
+            for (directory, _), (directory_entries, directory_links) in zip(
+                level, scans
+            ):
+                links += directory_links
+
+                for entry in directory_entries:
+                    if entry.is_dir and descend:
+                        next_level.append(
+                            (os.path.join(directory, entry.name), entry.path + "/")
+                        )
+
+                    if _included(entry, options, now_ns):
+                        entries.append(entry)
+
+            level = next_level
+            current_depth += 1
+    except _UnsupportedTree:
+        return None
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return entries, links
+
+
+def _included(entry: _LocalEntry, options: RcloneLocalOptions, now_ns: int) -> bool:
+    """_included
+
+    If an entry passes the filters of the options. As with rclone, the size
+    and age filters only apply to files.
+    """
+
+    if entry.is_dir:
+        return not options.files_only
+
+    if options.dirs_only:
+        return False
+
+    if options.min_size is not None and entry.size < options.min_size:
+        return False
+
+    if options.max_size is not None and entry.size > options.max_size:
+        return False
+
+    age: float = (now_ns - entry.mtime_ns) / 1e9
+
+    if options.min_age is not None and age < options.min_age:
+        return False
+
+    if options.max_age is not None and age > options.max_age:
+        return False
+
+    return True
+
+
+def lsjson_record(entry: _LocalEntry, options: RcloneLocalOptions) -> str:
+    """lsjson_record
+
+    The JSON rclone's lsjson writes for an entry, with fields in the same
+    order and escaped the same way.
+    """
+
+    mime_field: str = ""
+
+    if not options.no_mimetype:
+        entry_type: str = DIRECTORY_MIME_TYPE if entry.is_dir else mime_type(entry.name)
+        mime_field = f'"MimeType":"{entry_type}",'
+
+    mod_time: str = "" if options.no_modtime else format_mod_time(entry.mtime_ns)
+    path: str = json.dumps(entry.path, ensure_ascii=False).translate(JSON_ESCAPES)
+    name: str = json.dumps(entry.name, ensure_ascii=False).translate(JSON_ESCAPES)
+
+    return (
+        f'{{"Path":{path},"Name":{name},"Size":{entry.size},{mime_field}'
+        f'"ModTime":"{mod_time}","IsDir":{"true" if entry.is_dir else "false"}}}'
+    )
+
+
+def skipped_link_lines(links: List[str]) -> List[str]:
+    """skipped_link_lines
+
+    The notices rclone logs for symlinks it skips.
+    """
+
+    timestamp: str = time.strftime("%Y/%m/%d %H:%M:%S")
+
+    return [
+        f"{timestamp} NOTICE: {link}: Can't follow symlink without -L/--copy-links"
+        for link in links
+    ]
+
+
+def local_lsjson(
+    root: str, flags: Iterable[str], max_workers: int = 1
+) -> Optional[Tuple[bytes, bytes]]:
+    """local_lsjson
+
+    The output and error "rclone lsjson" would write listing a local
+    directory with the given flags, or None if rclone should list it.
+    """
+
+    options: Optional[RcloneLocalOptions] = parse_local_flags(flags)
+
+    if options is None or options.json:
+        return None
+
+    walk: Optional[Tuple[List[_LocalEntry], List[str]]] = walk_local(
+        root, options, max_workers
+    )
+
+    if walk is None:
+        return None
+
+    records: List[str] = [lsjson_record(entry, options) for entry in walk[0]]
+    output: str = "[\n" + ",\n".join(records) + ("\n]\n" if records else "]\n")
+
+    return output.encode("utf-8"), _log_bytes(skipped_link_lines(walk[1]))
+
+
+def local_size(
+    root: str, flags: Iterable[str], max_workers: int = 1
+) -> Optional[Tuple[bytes, bytes]]:
+    """local_size
+
+    The output and error "rclone size --json" would write for a local
+    directory with the given flags, or None if rclone should size it. The
+    text output differs between rclone versions, so is left to rclone.
+    """
+
+    options: Optional[RcloneLocalOptions] = parse_local_flags(flags)
+
+    if options is None or not options.json or options.files_only or options.dirs_only:
+        return None
+
+    if options.max_depth is None:
+        options.recursive = True
+
+    walk: Optional[Tuple[List[_LocalEntry], List[str]]] = walk_local(
+        root, options, max_workers
+    )
+
+    if walk is None:
+        return None
+
+    files: List[_LocalEntry] = [entry for entry in walk[0] if not entry.is_dir]
+    total_bytes: int = sum(entry.size for entry in files)
+    output: str = f'{{"count":{len(files)},"bytes":{total_bytes},"sizeless":0}}\n'
+
+    return output.encode("utf-8"), _log_bytes(skipped_link_lines(walk[1]))
+
+
+def _log_bytes(lines: List[str]) -> bytes:
+    """_log_bytes
+
+    Lines of log as rclone would write them to stderr.
+    """
+    return "".join(f"{line}\n" for line in lines).encode("utf-8")
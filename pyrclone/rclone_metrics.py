@@ -0,0 +1,282 @@
+# pylint: disable=C0411
+"""rclone_metrics
+
+Record metrics about each rclone command ran, such as how long it took and
+how much it output, and pass them on to pluggable sinks.
+"""
+
+import math
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from .rclone_output import RcloneError
+
+# The upper bounds of the wall time histogram buckets, in seconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+
+@dataclass
+class RcloneCommandMetrics:
+    """RcloneCommandMetrics
+
+    A simple data class to store the metrics of a single rclone command.
+
+    The CPU time is that of the rclone process, or None where it can't be
+    measured, ie when other commands ran at the same time. The output sizes
+    are in bytes.
+    """
+
+    command: str
+    remote: Optional[str]
+    wall_time: float
+    cpu_time: Optional[float]
+    output_bytes: int
+    error_bytes: int
+    return_code: RcloneError
+
+
+MetricsSink = Callable[[RcloneCommandMetrics], None]
+MetricsKey = Tuple[str, str]
+
+
+def children_cpu_time() -> Optional[float]:
+    """children_cpu_time
+
+    The total CPU time used by finished child processes, or None if it isn't
+    available on this platform. See RcloneCpuTimer.
+    """
+
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    usage: resource.struct_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class RcloneCpuTimer:  # pylint: disable=too-few-public-methods
+    """RcloneCpuTimer
+
+    Time the CPU used by the rclone process of a single command, from the
+    difference of children_cpu_time before and after it ran.
+
+    That is only the CPU time of the command if no other command finished
+    whilst it ran, so the timers running at once are tracked, and any timer
+    which overlapped another gives no time, rather than the total of both.
+    """
+
+    _lock: threading.Lock = threading.Lock()
+    _running: int = 0
+    _started: int = 0
+
+    def __init__(self) -> None:
+        with RcloneCpuTimer._lock:
+            self._overlapped: bool = RcloneCpuTimer._running > 0
+            RcloneCpuTimer._running += 1
+            RcloneCpuTimer._started += 1
+
+            self._start_number: int = RcloneCpuTimer._started
+            self._start_time: Optional[float] = children_cpu_time()
+
+    def stop(self) -> Optional[float]:
+        """stop
+
+        Stop the timer, returning the CPU time used since it started, or None
+        if it can't be measured, or another timer ran at the same time.
+        """
+
+        with RcloneCpuTimer._lock:
+            RcloneCpuTimer._running -= 1
+
+            overlapped: bool = (
+                self._overlapped or RcloneCpuTimer._started != self._start_number
+            )
+            end_time: Optional[float] = children_cpu_time()
+
+        if overlapped or self._start_time is None or end_time is None:
+            return None
+
+        return end_time - self._start_time
+
+
+def _escape_label(value: str) -> str:
+    """_escape_label
+
+    Escape a Prometheus label value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RcloneMetricsAggregator:
+    """RcloneMetricsAggregator
+
+    A thread safe metrics sink, which aggregates metrics per command and
+    remote.
+
+    Wall times are kept in a histogram, and the most recent max_samples of
+    each are kept to give percentiles. Everything can be exported in the
+    Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        max_samples: int = 1000,
+    ) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.max_samples: int = max_samples
+
+        self.counts: Dict[MetricsKey, int] = {}
+        self.wall_time_totals: Dict[MetricsKey, float] = {}
+        self.cpu_time_totals: Dict[MetricsKey, float] = {}
+        self.output_bytes: Dict[MetricsKey, int] = {}
+        self.error_bytes: Dict[MetricsKey, int] = {}
+        self.bucket_counts: Dict[MetricsKey, List[int]] = {}
+        self.return_codes: Dict[MetricsKey, "Counter[RcloneError]"] = {}
+
+        self._samples: Dict[MetricsKey, Deque[float]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def __call__(self, metrics: RcloneCommandMetrics) -> None:
+        self.record(metrics)
+
+    def record(self, metrics: RcloneCommandMetrics) -> None:
+        """record
+
+        Add the metrics of a single command.
+        """
+
+        key: MetricsKey = (metrics.command, metrics.remote or "")
+
+        with self._lock:
+            if key not in self.counts:
+                self.counts[key] = 0
+                self.wall_time_totals[key] = 0.0
+                self.cpu_time_totals[key] = 0.0
+                self.output_bytes[key] = 0
+                self.error_bytes[key] = 0
+                self.bucket_counts[key] = [0] * len(self.buckets)
+                self.return_codes[key] = Counter()
+                self._samples[key] = deque(maxlen=self.max_samples)
+
+            self.counts[key] += 1
+            self.wall_time_totals[key] += metrics.wall_time
+            self.cpu_time_totals[key] += metrics.cpu_time or 0.0
+            self.output_bytes[key] += metrics.output_bytes
+            self.error_bytes[key] += metrics.error_bytes
+            self.return_codes[key][metrics.return_code] += 1
+            self._samples[key].append(metrics.wall_time)
+
+            for index, bucket in enumerate(self.buckets):
+                if metrics.wall_time <= bucket:
+                    self.bucket_counts[key][index] += 1
+
+    def percentile(
+        self, percent: float, command: str, remote: Optional[str] = None
+    ) -> Optional[float]:
+        """percentile
+
+        The given percentile (0 to 100) of the recent wall times of a command,
+        optionally only against a given remote. None if nothing was recorded.
+        """
+
+        with self._lock:
+            samples: List[float] = sorted(
+                sample
+                for key, key_samples in self._samples.items()
+                if key[0] == command and (remote is None or key[1] == remote)
+                for sample in key_samples
+            )
+
+        if not samples:
+            return None
+
+        rank: int = max(0, math.ceil(percent / 100 * len(samples)) - 1)
+        return samples[rank]
+
+    def to_prometheus(self, prefix: str = "pyrclone") -> str:
+        """to_prometheus
+
+        Export the aggregated metrics in the Prometheus text format.
+        """
+
+        lines: List[str] = []
+
+        with self._lock:
+            keys: List[MetricsKey] = sorted(self.counts)
+
+            lines += [
+                f"# HELP {prefix}_command_duration_seconds "
+                "Wall time of rclone commands.",
+                f"# TYPE {prefix}_command_duration_seconds histogram",
+            ]
+            for key in keys:
+                labels: str = (
+                    f'command="{_escape_label(key[0])}",'
+                    f'remote="{_escape_label(key[1])}"'
+                )
+
+                for bucket, count in zip(self.buckets, self.bucket_counts[key]):
+                    lines.append(
+                        f"{prefix}_command_duration_seconds_bucket"
+                        f'{{{labels},le="{bucket}"}} {count}'
+                    )
+                lines += [
+                    f"{prefix}_command_duration_seconds_bucket"
+                    f'{{{labels},le="+Inf"}} {self.counts[key]}',
+                    f"{prefix}_command_duration_seconds_sum{{{labels}}} "
+                    f"{self.wall_time_totals[key]}",
+                    f"{prefix}_command_duration_seconds_count{{{labels}}} "
+                    f"{self.counts[key]}",
+                ]
+
+            counters: List[Tuple[str, str, Dict[MetricsKey, float]]] = [
+                (
+                    "command_cpu_seconds_total",
+                    "CPU time of rclone processes.",
+                    dict(self.cpu_time_totals),
+                ),
+                (
+                    "command_output_bytes_total",
+                    "Bytes written to stdout by rclone.",
+                    {key: float(value) for key, value in self.output_bytes.items()},
+                ),
+                (
+                    "command_error_bytes_total",
+                    "Bytes written to stderr by rclone.",
+                    {key: float(value) for key, value in self.error_bytes.items()},
+                ),
+            ]
+            for name, description, values in counters:
+                lines += [
+                    f"# HELP {prefix}_{name} {description}",
+                    f"# TYPE {prefix}_{name} counter",
+                ]
+                for key in keys:
+                    lines.append(
+                        f'{prefix}_{name}{{command="{_escape_label(key[0])}",'
+                        f'remote="{_escape_label(key[1])}"}} {values[key]}'
+                    )
+
+            lines += [
+                f"# HELP {prefix}_command_exits_total "
+                "Exit codes of rclone commands.",
+                f"# TYPE {prefix}_command_exits_total counter",
+            ]
+            for key in keys:
+                for return_code in RcloneError:
+                    if return_code not in self.return_codes[key]:
+                        continue
+
+                    lines.append(
+                        f"{prefix}_command_exits_total"
+                        f'{{command="{_escape_label(key[0])}",'
+                        f'remote="{_escape_label(key[1])}",'
+                        f'code="{return_code.name}"}} '
+                        f"{self.return_codes[key][return_code]}"
+                    )
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,167 @@
+"""rclone_output
+
+The types used to report the result of running an rclone command.
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, List, Optional
+
+
+class RcloneError(Enum):
+    """RcloneError
+
+    An enum wrapping the errors that Rclone can raise, and some
+    interface specific ones.
+    """
+
+    RCLONE_MISSING = -1
+    PYTHON_EXCEPTION = -2
+    TIMEOUT = -3
+    CANCELLED = -4
+    SUCCESS = 0
+    SYNTAX_OR_USAGE_ERROR = 1
+    UNCATEGORISED = 2
+    FOLDER_NOT_FOUND = 3
+    FILE_NOT_FOUND = 4
+    RETRY_ERROR = 5
+    NO_RETRY_ERROR = 6
+    FATAL_ERROR = 7
+    TRANSFER_EXCEEDED = 8
+
+
+@dataclass
+class RcloneStats:
+    """RcloneStats
+
+    A snapshot of the transfer statistics of a running rclone command.
+
+    Sizes are in bytes, speed in bytes per second and times in seconds. The
+    eta is None when rclone can't estimate it.
+    """
+
+    bytes: int = 0
+    total_bytes: int = 0
+    speed: float = 0.0
+    eta: Optional[float] = None
+    transfers: int = 0
+    total_transfers: int = 0
+    checks: int = 0
+    total_checks: int = 0
+    deletes: int = 0
+    errors: int = 0
+    elapsed_time: float = 0.0
+    raw: Dict[str, object] = field(default_factory=dict)
+
+
+@dataclass
+class RcloneOutput:
+    """RcloneOutput
+
+    A wrapper for the Rclone command outputs, to ease access.
+
+    If the command was ran with live statistics, stats holds the last
+    statistics reported.
+    """
+
+    return_code: RcloneError
+    output: List[str]
+    error: List[str]
+    stats: Optional[RcloneStats] = None
+
+    def output_size(self) -> int:
+        """output_size
+
+        The number of bytes written to stdout, counting a newline at the end
+        of each line.
+        """
+        return sum(len(line.encode("utf-8")) + 1 for line in self.output)
+
+    def error_size(self) -> int:
+        """error_size
+
+        The number of bytes written to stderr, counting a newline at the end
+        of each line.
+        """
+        return sum(len(line.encode("utf-8")) + 1 for line in self.error)
+
+    def copy(self) -> "RcloneOutput":
+        """copy
+
+        A copy of the output, which can be changed without affecting this one.
+        """
+        return RcloneOutput(
+            self.return_code, list(self.output), list(self.error), self.stats
+        )
+
+
+class RcloneBytesOutput(RcloneOutput):
+    """RcloneBytesOutput
+
+    An RcloneOutput holding the raw bytes written by rclone, which are only
+    decoded and split into lines when output or error are first accessed.
+
+    Callers that only need the return code, or that pass raw_output straight
+    to a parser (ie json.loads), never pay for decoding the output.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(
+        self,
+        return_code: RcloneError,
+        raw_output: bytes,
+        raw_error: bytes,
+        stats: Optional[RcloneStats] = None,
+    ) -> None:
+        self.return_code = return_code
+        self.raw_output: bytes = raw_output
+        self.raw_error: bytes = raw_error
+        self.stats = stats
+
+        self._output: Optional[List[str]] = None
+        self._error: Optional[List[str]] = None
+
+    @property
+    def output(self) -> List[str]:
+        """output
+
+        The lines of stdout, decoded on first access.
+        """
+
+        if self._output is None:
+            self._output = self.raw_output.decode("utf-8").splitlines()
+
+        return self._output
+
+    @output.setter
+    def output(self, value: List[str]) -> None:
+        self._output = value
+
+    @property
+    def error(self) -> List[str]:
+        """error
+
+        The lines of stderr, decoded on first access.
+        """
+
+        if self._error is None:
+            self._error = self.raw_error.decode("utf-8").splitlines()
+
+        return self._error
+
+    @error.setter
+    def error(self, value: List[str]) -> None:
+        self._error = value
+
+    def output_size(self) -> int:
+        return len(self.raw_output)
+
+    def error_size(self) -> int:
+        return len(self.raw_error)
+
+    def copy(self) -> RcloneOutput:
+        # The raw bytes can't be changed, so are shared rather than copied,
+        # and anything already decoded is decoded again by the copy.
+        return RcloneBytesOutput(
+            self.return_code, self.raw_output, self.raw_error, self.stats
+        )
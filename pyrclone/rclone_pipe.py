@@ -0,0 +1,306 @@
+# pylint: disable=C0411
+"""rclone_pipe
+
+File like streams over the pipes of "rclone cat" and "rclone rcat", to read
+and write the content of objects without staging them on disk or holding
+them in memory.
+"""
+
+import io
+import logging
+import subprocess
+import threading
+from types import TracebackType
+from typing import IO, TYPE_CHECKING, Iterator, List, Optional, Type, cast
+
+from .rclone_cancel import RcloneLimits, RcloneProcessWatch
+from .rclone_output import RcloneError
+
+if TYPE_CHECKING:
+    from _typeshed import ReadableBuffer, WriteableBuffer
+
+# The size of the chunks iter_chunks reads by default.
+DEFAULT_CHUNK_SIZE: int = 1 << 16
+
+
+class _RclonePipeStream(io.RawIOBase):
+    """_RclonePipeStream
+
+    A running rclone process, whose stdin or stdout is read or written as a
+    raw stream. Once closed, return_code and error are populated.
+
+    Stopping the stream early kills rclone, leaving return_code as None. As
+    with RcloneJsonStream, the limits apply until rclone exits, so a timeout
+    includes the time spent handling the content.
+    """
+
+    def __init__(
+        self,
+        command_to_run: List[str],
+        logger: logging.Logger,
+        limits: Optional[RcloneLimits] = None,
+        kill_grace: float = 5.0,
+        writing: bool = False,
+    ) -> None:
+        super().__init__()
+
+        self.command: List[str] = command_to_run
+        self.logger: logging.Logger = logger
+        self.limits: RcloneLimits = limits or RcloneLimits()
+        self.kill_grace: float = kill_grace
+
+        self.return_code: Optional[RcloneError] = None
+        self.error: List[str] = []
+
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+        self._watch: Optional[RcloneProcessWatch] = None
+        self._error_thread: Optional[threading.Thread] = None
+
+        self._start(writing)
+
+    def _start(self, writing: bool) -> None:
+        """_start
+
+        Start rclone, with the pipe to stream, unless the limits have already
+        been reached.
+        """
+        self.logger.debug(f"Streaming: {self.command}")
+
+        stopped: Optional[RcloneError] = self.limits.stopped()
+
+        if stopped is not None:
+            self.logger.warning(f"Not running {self.command}: {stopped.name}")
+            self.return_code = stopped
+            return
+
+        try:
+            # The process outlives this call, so can't be used in a with.
+            self._process = subprocess.Popen(  # pylint: disable=R1732
+                self.command,
+                stdin=subprocess.PIPE if writing else subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL if writing else subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError as file_missing:
+            self.logger.exception(f"Can't find rclone executable. {file_missing}")
+            self.return_code = RcloneError.RCLONE_MISSING
+            return
+
+        self._watch = RcloneProcessWatch(self._process, self.limits, self.kill_grace)
+        self._watch.__enter__()  # pylint: disable=unnecessary-dunder-call
+
+        # The thread is given the error list rather than the stream, so it
+        # doesn't keep a dropped stream alive.
+        self._error_thread = threading.Thread(
+            target=self._drain_error, args=(self._process.stderr, self.error)
+        )
+        self._error_thread.daemon = True
+        self._error_thread.start()
+
+    @staticmethod
+    def _drain_error(error_pipe: IO[bytes], error: List[str]) -> None:
+        """_drain_error
+
+        Read stderr in the background, such that rclone never blocks on a
+        full stderr pipe whilst the content is streamed.
+        """
+
+        for error_line in error_pipe:
+            error.append(error_line.decode("utf-8").rstrip("\r\n"))
+
+    def _finish(self, stop: bool) -> None:
+        """_finish
+
+        Wait for rclone to exit, killing it first if stop is set, and record
+        how it exited. Any pipe still open is only closed once rclone has
+        exited, so a killed rclone never sees the end of its input.
+        """
+
+        process: Optional["subprocess.Popen[bytes]"] = self._process
+
+        if process is None:
+            return
+
+        self._process = None
+
+        if stop and process.poll() is None:
+            process.kill()
+
+        process.wait()
+
+        if self._watch is not None:
+            self._watch.__exit__(None, None, None)
+
+        if self._error_thread is not None:
+            self._error_thread.join()
+
+        for pipe in (process.stdin, process.stdout, process.stderr):
+            if pipe is not None:
+                try:
+                    pipe.close()
+                except BrokenPipeError:
+                    pass
+
+        if self.error:
+            self.logger.warning("\n".join(self.error))
+
+        if self._watch is not None and self._watch.reason is not None:
+            self.return_code = self._watch.reason
+        elif not stop:
+            self.return_code = RcloneError(process.returncode)
+
+
+class RcloneReadStream(_RclonePipeStream):
+    """RcloneReadStream
+
+    A raw, read only stream of the content "rclone cat" writes, ie an object
+    or a range of it.
+
+    Reads return what rclone has written so far, waiting for it if needed,
+    and rclone blocks once the pipe is full, so only what is being read is
+    held in memory. Wrap it in io.BufferedReader for buffered reads. Closing
+    it before the end of the content kills rclone. If rclone fails, reading
+    the end of the content raises OSError, rather than returning what was
+    read so far as if it were all of it.
+    """
+
+    def __init__(
+        self,
+        command_to_run: List[str],
+        logger: logging.Logger,
+        limits: Optional[RcloneLimits] = None,
+        kill_grace: float = 5.0,
+    ) -> None:
+        super().__init__(command_to_run, logger, limits, kill_grace)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: "WriteableBuffer") -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed stream.")
+
+        if self._process is not None:
+            read_size: int = cast(io.BufferedReader, self._process.stdout).readinto1(
+                buffer
+            )
+
+            if read_size:
+                return read_size
+
+            self._finish(False)
+
+        if self.return_code is not RcloneError.SUCCESS:
+            raise OSError(f"{self.command} failed with {self.return_code}")
+
+        return 0
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """iter_chunks
+
+        Iterate over the content in chunks of up to chunk_size bytes, closing
+        the stream once it has all been read.
+        """
+
+        try:
+            while True:
+                chunk: Optional[bytes] = self.read(chunk_size)
+
+                if not chunk:
+                    return
+
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._finish(True)
+
+        super().close()
+
+
+class RcloneWriteStream(_RclonePipeStream):
+    """RcloneWriteStream
+
+    A raw, write only stream into "rclone rcat", which uploads what is written
+    to an object.
+
+    Writes block whilst rclone catches up, so only what is being written is
+    held in memory. The object is only complete once the stream is closed,
+    which waits for rclone to finish the upload. Aborting the stream,
+    leaving its with block with an exception, or dropping it without closing
+    it, kills rclone instead. Writing after rclone has exited raises
+    BrokenPipeError, and return_code says why once closed.
+    """
+
+    def __init__(
+        self,
+        command_to_run: List[str],
+        logger: logging.Logger,
+        limits: Optional[RcloneLimits] = None,
+        kill_grace: float = 5.0,
+    ) -> None:
+        super().__init__(command_to_run, logger, limits, kill_grace, True)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: "ReadableBuffer") -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed stream.")
+
+        if self._process is None or self._process.stdin is None:
+            raise BrokenPipeError(f"{self.command} is not running")
+
+        return self._process.stdin.write(data)
+
+    def abort(self) -> None:
+        """abort
+
+        Stop writing without completing the object, killing rclone. rclone
+        is killed before its stdin is closed, as closing it first would let
+        rclone upload what has been written so far as the whole object.
+        """
+
+        if not self.closed:
+            self._finish(True)
+
+        super().close()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._close_input()
+            self._finish(False)
+
+        super().close()
+
+    def __del__(self) -> None:
+        # io.IOBase would close the stream, completing the object with what
+        # was written so far, so a stream that wasn't closed is aborted.
+        if not self.closed:
+            self.abort()
+
+    def _close_input(self) -> None:
+        """_close_input
+
+        Close rclone's stdin, flushing what has been written, so rclone sees
+        the end of the content.
+        """
+
+        if self._process is not None and self._process.stdin is not None:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
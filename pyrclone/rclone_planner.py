@@ -0,0 +1,214 @@
+# pylint: disable=C0411
+"""rclone_planner
+
+Split a large transfer into several partitions of roughly equal size, to be
+ran as concurrent rclone processes, for links a single process can't fill.
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .rclone_batch import RcloneBatchResult
+from .rclone_listing import entry_is_dir, entry_path, entry_size
+from .rclone_output import RcloneError, RcloneOutput, RcloneStats
+from .rclone_stream import LsjsonEntry
+
+
+@dataclass
+class RcloneTransferPlan:
+    """RcloneTransferPlan
+
+    The files of a transfer split into partitions, with the total size of
+    the files in each, in bytes.
+    """
+
+    partitions: List[List[str]] = field(default_factory=list)
+    sizes: List[int] = field(default_factory=list)
+
+
+@dataclass
+class RcloneTransferResult:
+    """RcloneTransferResult
+
+    The result of running a transfer plan, ie the plan, the output of each
+    partition in the same order, and of the final sync if there was one.
+    """
+
+    plan: RcloneTransferPlan
+    batch: RcloneBatchResult
+    sync_output: Optional[RcloneOutput] = None
+
+    @property
+    def outputs(self) -> List[RcloneOutput]:
+        """outputs
+
+        The output of every command ran, in order.
+        """
+
+        if self.sync_output is None:
+            return list(self.batch.outputs)
+
+        return self.batch.outputs + [self.sync_output]
+
+    @property
+    def return_code(self) -> RcloneError:
+        """return_code
+
+        The first error returned by any command, or SUCCESS.
+        """
+
+        for output in self.outputs:
+            if output.return_code is not RcloneError.SUCCESS:
+                return output.return_code
+
+        return RcloneError.SUCCESS
+
+    @property
+    def stats(self) -> Optional[RcloneStats]:
+        """stats
+
+        The combined statistics of the partitions, if they were ran with live
+        statistics.
+        """
+        return combine_stats(
+            output.stats for output in self.batch.outputs if output.stats is not None
+        )
+
+
+@dataclass
+class RcloneFanOutResult:
+    """RcloneFanOutResult
+
+    The result of copying one source to many destinations, ie the plan every
+    destination was copied with, the result for each destination (keyed by
+    destination, in the order given), and how long the whole job took.
+
+    The wall time of each destination's batch is how long after the job
+    started its last partition finished.
+    """
+
+    plan: RcloneTransferPlan
+    destinations: Dict[str, RcloneTransferResult] = field(default_factory=dict)
+    wall_time: float = 0.0
+
+    @property
+    def return_code(self) -> RcloneError:
+        """return_code
+
+        The first error returned for any destination, or SUCCESS.
+        """
+
+        for result in self.destinations.values():
+            if result.return_code is not RcloneError.SUCCESS:
+                return result.return_code
+
+        return RcloneError.SUCCESS
+
+    @property
+    def failed(self) -> List[str]:
+        """failed
+
+        The destinations which weren't copied to successfully.
+        """
+
+        return [
+            destination
+            for destination, result in self.destinations.items()
+            if result.return_code is not RcloneError.SUCCESS
+        ]
+
+    @property
+    def stats(self) -> Optional[RcloneStats]:
+        """stats
+
+        The combined statistics of every destination, if they were ran with
+        live statistics.
+        """
+        return combine_stats(
+            output.stats
+            for result in self.destinations.values()
+            for output in result.batch.outputs
+            if output.stats is not None
+        )
+
+
+def plan_transfer(
+    files: Iterable[Tuple[str, int]], partitions: int
+) -> RcloneTransferPlan:
+    """plan_transfer
+
+    Split (path, size) pairs into at most the given number of partitions,
+    balanced by total size.
+
+    Files are placed largest first into whichever partition is smallest so
+    far, so a file larger than a fair share ends up on its own, with the
+    small files grouped together to fill the other partitions.
+    """
+
+    sorted_files: List[Tuple[int, str]] = sorted(
+        ((max(0, size), path) for path, size in files), reverse=True
+    )
+    partitions = max(1, min(partitions, len(sorted_files)))
+
+    plan: RcloneTransferPlan = RcloneTransferPlan(
+        [[] for _ in range(partitions)], [0] * partitions
+    )
+    smallest: List[Tuple[int, int]] = [(0, index) for index in range(partitions)]
+
+    for size, path in sorted_files:
+        total, index = heapq.heappop(smallest)
+        plan.partitions[index].append(path)
+        plan.sizes[index] = total + size
+        heapq.heappush(smallest, (total + size, index))
+
+    # Partitions can only be empty if there were no files at all.
+    return RcloneTransferPlan(
+        [partition for partition in plan.partitions if partition],
+        [size for size, partition in zip(plan.sizes, plan.partitions) if partition],
+    )
+
+
+def plan_listing(listing: Iterable[LsjsonEntry], partitions: int) -> RcloneTransferPlan:
+    """plan_listing
+
+    Split the files of a JSON listing into partitions. See plan_transfer.
+    """
+    return plan_transfer(
+        (
+            (entry_path(entry), entry_size(entry))
+            for entry in listing
+            if not entry_is_dir(entry)
+        ),
+        partitions,
+    )
+
+
+def combine_stats(all_stats: Iterable[RcloneStats]) -> Optional[RcloneStats]:
+    """combine_stats
+
+    Combine the statistics of concurrent commands, ie the counts and speeds
+    are added together, and the longest time is taken.
+    """
+
+    combined: Optional[RcloneStats] = None
+
+    for stats in all_stats:
+        if combined is None:
+            combined = RcloneStats()
+
+        combined.bytes += stats.bytes
+        combined.total_bytes += stats.total_bytes
+        combined.speed += stats.speed
+        combined.transfers += stats.transfers
+        combined.total_transfers += stats.total_transfers
+        combined.checks += stats.checks
+        combined.total_checks += stats.total_checks
+        combined.deletes += stats.deletes
+        combined.errors += stats.errors
+        combined.elapsed_time = max(combined.elapsed_time, stats.elapsed_time)
+
+        if stats.eta is not None:
+            combined.eta = max(combined.eta or 0.0, stats.eta)
+
+    return combined
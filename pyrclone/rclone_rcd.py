@@ -0,0 +1,428 @@
+# pylint: disable=C0411
+"""rclone_rcd
+
+An execution backend that sends commands to a long running "rclone rcd"
+process over its remote control API, rather than starting a new rclone
+process for every command.
+"""
+
+import base64
+import http.client
+import json
+import logging
+import os
+import secrets
+import socket
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Iterator, List, Optional, Tuple, cast
+
+from .rclone_cancel import RcloneLimits
+from .rclone_output import RcloneError, RcloneOutput
+
+# Flags that can be translated into options for the remote control API. Any
+# other flag causes the command to be ran by a normal rclone process instead.
+IGNORED_FLAGS: Tuple[str, ...] = ("--fast-list", "-v", "-vv", "-vvv")
+LIST_FLAGS: Dict[str, str] = {
+    "-R": "recurse",
+    "--recursive": "recurse",
+    "--dirs-only": "dirsOnly",
+    "--files-only": "filesOnly",
+    "--hash": "showHash",
+    "--no-modtime": "noModTime",
+    "--no-mimetype": "noMimeType",
+}
+
+# Flags taking a number, which are passed as the given option of "_config".
+CONFIG_FLAGS: Dict[str, str] = {
+    "--checkers": "Checkers",
+    "--transfers": "Transfers",
+}
+
+# The rclone commands with a remote control equivalent, and the method used.
+# "size" is left to rclone, as its text output varies between versions, so
+# can't be rebuilt from operations/size.
+SINGLE_PATH_METHODS: Dict[str, str] = {
+    "lsjson": "operations/list",
+    "mkdir": "operations/mkdir",
+    "purge": "operations/purge",
+    "delete": "operations/delete",
+    "deletefile": "operations/deletefile",
+}
+TRANSFER_METHODS: Dict[str, str] = {
+    "copy": "sync/copy",
+    "sync": "sync/sync",
+    "move": "sync/move",
+}
+
+
+def split_remote_path(remote_path: str) -> Tuple[str, str]:
+    """split_remote_path
+
+    Split a path into the file system and the path of an object within it,
+    ie "dropbox:Folder/File.txt" becomes ("dropbox:Folder", "File.txt").
+    """
+
+    if "/" in remote_path:
+        file_system, object_path = remote_path.rsplit("/", 1)
+
+        if file_system.endswith(":") or not file_system:
+            file_system += "/"
+
+        return file_system, object_path
+
+    if ":" in remote_path:
+        file_system, object_path = remote_path.split(":", 1)
+        return f"{file_system}:", object_path
+
+    return ".", remote_path
+
+
+class RcloneRcdBackend:
+    """RcloneRcdBackend
+
+    A class to run rclone commands against a persistent "rclone rcd" process.
+
+    If a URL is given, an already running rcd is used, logging in with user
+    and password if they are given. Otherwise, calling start will launch one
+    on the given address, which is stopped by stop. It requires a user and
+    password, random unless given, so other local users can't control it.
+    Commands that have no remote control equivalent return None from
+    execute, such that the caller can fall back to running rclone directly.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        url: Optional[str] = None,
+        address: str = "localhost:5572",
+        startup_timeout: float = 10.0,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+    ) -> None:
+        self.logger: logging.Logger = logging.getLogger("Rclone")
+
+        self.address: str = address
+        self.url: str = url if url is not None else f"http://{address}/"
+        self.startup_timeout: float = startup_timeout
+
+        if not self.url.endswith("/"):
+            self.url += "/"
+
+        self._owns_process: bool = url is None
+        self._rcd_process: Optional["subprocess.Popen[bytes]"] = None
+
+        if self._owns_process:
+            user = user or secrets.token_urlsafe(16)
+            password = password or secrets.token_urlsafe(32)
+
+        self._credentials: Optional[Tuple[str, str]] = (
+            (user, password or "") if user is not None else None
+        )
+
+    def __enter__(self) -> "RcloneRcdBackend":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:  # type: ignore
+        self.stop()
+
+    def start(self) -> None:
+        """start
+
+        Start the rcd process if needed, and wait until it is accepting
+        commands.
+
+        The user and password of a started rcd are passed in its environment,
+        rather than as flags, so they don't show in the process list. Once it
+        answers, its process id is checked, and ConnectionError raised if
+        something else is answering on the address, or the rcd exited.
+        """
+
+        if self._owns_process and self._rcd_process is None:
+            self.logger.debug(f"Starting rclone rcd on {self.address}")
+            self._rcd_process = subprocess.Popen(
+                ["rclone", "rcd", f"--rc-addr={self.address}"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=dict(
+                    os.environ,
+                    RCLONE_RC_USER=self._credentials[0] if self._credentials else "",
+                    RCLONE_RC_PASS=self._credentials[1] if self._credentials else "",
+                ),
+            )
+
+        start_time: float = time.monotonic()
+        while True:
+            if self._rcd_process is not None and self._rcd_process.poll() is not None:
+                return_code: Optional[int] = self._rcd_process.returncode
+                self.stop()
+                raise ConnectionError(
+                    f"rclone rcd on {self.address} exited with {return_code}"
+                )
+
+            try:
+                status, response = self.call(
+                    "rc/noop" if self._rcd_process is None else "core/pid",
+                    timeout=self.startup_timeout,
+                )
+                break
+            except urllib.error.URLError:
+                if time.monotonic() - start_time > self.startup_timeout:
+                    self.stop()
+                    raise
+                time.sleep(0.1)
+
+        if self._rcd_process is not None and (
+            status != 200 or response.get("pid") != self._rcd_process.pid
+        ):
+            self.stop()
+            raise ConnectionError(
+                f"{self.address} is answered by another process, not rclone rcd"
+            )
+
+    def stop(self) -> None:
+        """stop
+
+        Stop the rcd process, if it was started by this backend.
+        """
+
+        if self._rcd_process is None:
+            return
+
+        self._rcd_process.terminate()
+        self._rcd_process.wait()
+        self._rcd_process = None
+
+    def call(
+        self,
+        method: str,
+        parameters: Optional[Dict[str, object]] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[int, Dict[str, object]]:
+        """call
+
+        Call a given remote control method, returning the HTTP status and the
+        decoded response. If a timeout is given, the call waits at most that
+        many seconds to connect, and for each read of the response.
+
+        Connection failures are raised as a urllib.error.URLError, and running
+        out of time as a socket.timeout.
+        """
+
+        if parameters is None:
+            parameters = {}
+
+        headers: Dict[str, str] = {"Content-Type": "application/json"}
+
+        if self._credentials is not None:
+            credentials: bytes = ":".join(self._credentials).encode("utf-8")
+            headers["Authorization"] = "Basic " + base64.b64encode(credentials).decode(
+                "ascii"
+            )
+
+        request: urllib.request.Request = urllib.request.Request(
+            self.url + method,
+            data=json.dumps(parameters).encode("utf-8"),
+            headers=headers,
+        )
+
+        status: int
+        body: bytes
+
+        try:
+            with cast(
+                http.client.HTTPResponse,
+                (
+                    urllib.request.urlopen(request)
+                    if timeout is None
+                    else urllib.request.urlopen(request, timeout=timeout)
+                ),
+            ) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as http_error:
+            status, body = http_error.code, http_error.read()
+
+        decoded_body: Dict[str, object] = json.loads(body or b"{}")
+        return status, decoded_body
+
+    def _parameters(
+        self, command: str, paths: List[str], options: Dict[str, object]
+    ) -> Optional[Dict[str, object]]:
+        """_parameters
+
+        Build the parameters of the remote control call for a given command.
+        """
+
+        parameters: Dict[str, object]
+
+        if command in TRANSFER_METHODS and len(paths) == 2:
+            parameters = {"srcFs": paths[0], "dstFs": paths[1]}
+        elif command == "deletefile" and len(paths) == 1:
+            file_system, object_path = split_remote_path(paths[0])
+            parameters = {"fs": file_system, "remote": object_path}
+        elif command in SINGLE_PATH_METHODS and len(paths) == 1:
+            parameters = {"fs": paths[0], "remote": ""}
+        else:
+            return None
+
+        if command == "lsjson":
+            parameters["opt"] = options
+
+        return parameters
+
+    @staticmethod
+    def _format_output(command: str, response: Dict[str, object]) -> List[str]:
+        """_format_output
+
+        Convert a remote control response to the output the rclone command
+        would have printed.
+        """
+
+        if command == "lsjson":
+            entries: List[Dict[str, object]] = cast(
+                List[Dict[str, object]], response.get("list", [])
+            )
+            lines: List[str] = [
+                json.dumps(entry, separators=(",", ":")) + "," for entry in entries
+            ]
+
+            if lines:
+                lines[-1] = lines[-1][:-1]
+
+            return ["["] + lines + ["]"]
+
+        return []
+
+    @staticmethod
+    def _error_code(message: str) -> RcloneError:
+        """_error_code
+
+        Map the error message of a failed call to the closest rclone exit code.
+        """
+
+        if "directory not found" in message:
+            return RcloneError.FOLDER_NOT_FOUND
+
+        if "object not found" in message:
+            return RcloneError.FILE_NOT_FOUND
+
+        return RcloneError.UNCATEGORISED
+
+    @staticmethod
+    def _timed_out(exception: Exception) -> bool:
+        """_timed_out
+
+        If a call failed by running out of time, which urllib raises as a
+        socket.timeout, or a URLError wrapping one if it was connecting.
+        """
+
+        if isinstance(exception, urllib.error.URLError):
+            return isinstance(exception.reason, socket.timeout)
+
+        return isinstance(exception, socket.timeout)
+
+    @staticmethod
+    def _split_arguments(
+        command: str, arguments: List[str]
+    ) -> Optional[Tuple[List[str], Dict[str, object], Dict[str, object]]]:
+        """_split_arguments
+
+        Split the arguments of a command into its paths, the options of a
+        listing, and the "_config" options of the call. None is returned if
+        any flag can't be translated.
+        """
+
+        paths: List[str] = []
+        options: Dict[str, object] = {}
+        config: Dict[str, object] = {}
+        remaining: Iterator[str] = iter(arguments)
+
+        for argument in remaining:
+            flag, _, value = argument.partition("=")
+
+            if argument == "--dry-run":
+                config["DryRun"] = True
+            elif flag in CONFIG_FLAGS:
+                value = value or next(remaining, "")
+
+                if not value.isdigit():
+                    return None
+
+                config[CONFIG_FLAGS[flag]] = int(value)
+            elif argument in LIST_FLAGS and command == "lsjson":
+                options[LIST_FLAGS[argument]] = True
+            elif argument in IGNORED_FLAGS:
+                continue
+            elif argument.startswith("-"):
+                return None
+            else:
+                paths.append(argument)
+
+        return paths, options, config
+
+    def execute(
+        self, command_to_run: List[str], limits: Optional[RcloneLimits] = None
+    ) -> Optional[RcloneOutput]:
+        """execute
+
+        Run a given rclone command through the remote control API.
+
+        The command is given in the same form as Rclone._execute, ie
+            ["rclone", "lsd", "dropbox:"]
+        If the command or any of its flags can't be expressed as a remote
+        control call, None is returned.
+
+        If the call takes longer than the time left by limits, TIMEOUT is
+        returned, as for a process that is stopped. The job may still finish
+        within the rcd.
+        """
+
+        command: str = command_to_run[1]
+        arguments: Optional[Tuple[List[str], Dict[str, object], Dict[str, object]]] = (
+            self._split_arguments(command, command_to_run[2:])
+        )
+
+        if arguments is None:
+            return None
+
+        paths, options, config = arguments
+        parameters: Optional[Dict[str, object]] = self._parameters(
+            command, paths, options
+        )
+
+        if parameters is None:
+            return None
+
+        if config:
+            parameters["_config"] = config
+
+        method: str = SINGLE_PATH_METHODS.get(
+            command, TRANSFER_METHODS.get(command, "")
+        )
+        self.logger.debug(f"Calling {method} with {parameters}")
+
+        try:
+            status, response = self.call(
+                method, parameters, (limits or RcloneLimits()).time_left()
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            if self._timed_out(exception):
+                self.logger.warning(f"Stopped {command_to_run}: TIMEOUT")
+                return RcloneOutput(RcloneError.TIMEOUT, [], [])
+
+            self.logger.exception(
+                f"Exception calling {method} for {command_to_run}. "
+                f"Exception: {exception}"
+            )
+            return RcloneOutput(RcloneError.PYTHON_EXCEPTION, [""], [""])
+
+        if status != 200:
+            message: str = str(response.get("error", f"HTTP status {status}"))
+            self.logger.warning(message)
+            return RcloneOutput(self._error_code(message), [], [message])
+
+        return RcloneOutput(
+            RcloneError.SUCCESS, self._format_output(command, response), []
+        )
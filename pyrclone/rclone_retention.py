@@ -0,0 +1,274 @@
+# pylint: disable=C0411
+"""rclone_retention
+
+Decide which backups to keep under a grandfather-father-son retention policy,
+ie keep the newest backup of each of the last N days, weeks, months and
+years, and delete the rest in a single batched command.
+"""
+
+import re
+from array import array
+from dataclasses import dataclass, field
+from datetime import date
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+from .rclone_bulk import RcloneBulkResult
+from .rclone_listing import entry_is_dir, entry_mod_time, entry_path
+from .rclone_output import RcloneError
+from .rclone_stream import LsjsonEntry
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+# A date, and optionally a time, in a backup name, ie "2019-07-30_FlatMove",
+# "backup-20190730T1200" or "2019-07-30 12-00-00".
+NAME_TIME_PATTERN: Pattern[str] = re.compile(
+    r"(?<!\d)(\d{4})-?(\d\d)-?(\d\d)(?:[T _-]?(\d\d)[:.-]?(\d\d)(?:[:.-]?(\d\d))?)?(?!\d)"
+)
+
+SECONDS_PER_DAY: int = 86400
+EPOCH_ORDINAL: int = date(1970, 1, 1).toordinal()
+
+
+@dataclass
+class RcloneRetentionPolicy:
+    """RcloneRetentionPolicy
+
+    How many backups to keep, ie the newest backup of each of the last daily
+    days, weekly weeks (starting on Monday), monthly months and yearly years
+    which have a backup, along with the last backups. Periods are in UTC.
+
+    The time of a backup is taken from a date in its name if use_names is
+    set and there is one, otherwise from its modification time. Backups
+    named in protected are always kept.
+    """
+
+    last: int = 0
+    daily: int = 0
+    weekly: int = 0
+    monthly: int = 0
+    yearly: int = 0
+    use_names: bool = True
+    protected: List[str] = field(default_factory=list)
+
+    def check(self) -> None:
+        """check
+
+        Raise ValueError if the policy keeps no backups by any rule, as
+        applying it would delete every backup which isn't protected.
+        """
+
+        if max(self.last, self.daily, self.weekly, self.monthly, self.yearly) <= 0:
+            raise ValueError(f"{self} doesn't keep any backups")
+
+
+@dataclass
+class RcloneRetentionPlan:
+    """RcloneRetentionPlan
+
+    The backups to keep and to delete, by path, along with the rules that
+    kept each backup. Backups without a time can't be judged so are kept,
+    and listed in undated.
+
+    When planned from a remote, return_code is that of the listing, and
+    nothing is deleted unless it succeeded.
+    """
+
+    keep: List[str] = field(default_factory=list)
+    delete: List[str] = field(default_factory=list)
+    undated: List[str] = field(default_factory=list)
+    reasons: Dict[str, List[str]] = field(default_factory=dict)
+    directories: Set[str] = field(default_factory=set)
+    return_code: Optional[RcloneError] = None
+
+    def apply(
+        self,
+        rclone: "Rclone",
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        dry_run: bool = False,
+    ) -> RcloneBulkResult:
+        """apply
+
+        Delete the backups in delete from remote, with one delete command for
+        the folders and one for the files, rather than one per backup. With
+        dry_run, rclone only reports what it would delete.
+        """
+
+        flags = list(flags) + (["--dry-run"] if dry_run else [])
+        bulk_result: RcloneBulkResult = RcloneBulkResult()
+
+        folders: List[str] = [path for path in self.delete if path in self.directories]
+        files: List[str] = [
+            path for path in self.delete if path not in self.directories
+        ]
+
+        for paths, directories in [(folders, True), (files, False)]:
+            if not paths:
+                continue
+
+            paths_result: RcloneBulkResult = rclone.delete_many(
+                remote, paths, flags, directories=directories
+            )
+            bulk_result.outputs += paths_result.outputs
+            bulk_result.succeeded += paths_result.succeeded
+            bulk_result.failed.update(paths_result.failed)
+
+        return bulk_result
+
+
+def name_time(name: str) -> Optional[float]:
+    """name_time
+
+    The time (seconds since the epoch, in UTC) of the date in a name, or None
+    if it doesn't contain one.
+    """
+
+    time_match: Optional["re.Match[str]"] = NAME_TIME_PATTERN.search(name)
+
+    if time_match is None:
+        return None
+
+    year, month, day, hour, minute, second = map(int, time_match.groups("0"))
+
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+
+    try:
+        days: int = date(year, month, day).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        return None
+
+    return float(days * SECONDS_PER_DAY + hour * 3600 + minute * 60 + second)
+
+
+def year_month(days: int) -> Tuple[int, int]:
+    """year_month
+
+    The year and month (1 to 12) of a number of days since the epoch.
+
+    This is the inverse of days from civil date by Howard Hinnant, which is
+    far faster than going through datetime or time.gmtime per backup.
+    """
+
+    shifted_days: int = days + 719468
+    era: int = shifted_days // 146097
+    day_of_era: int = shifted_days - era * 146097
+    year_of_era: int = (
+        day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096
+    ) // 365
+    day_of_year: int = day_of_era - (
+        365 * year_of_era + year_of_era // 4 - year_of_era // 100
+    )
+    month_index: int = (5 * day_of_year + 2) // 153
+    month: int = month_index + 3 if month_index < 10 else month_index - 9
+
+    return (year_of_era + era * 400 + (1 if month <= 2 else 0), month)
+
+
+def plan_retention(
+    listing: Iterable[LsjsonEntry], policy: RcloneRetentionPolicy
+) -> RcloneRetentionPlan:
+    """plan_retention
+
+    Apply a retention policy to the entries of a listing.
+
+    The times of the backups are gathered into compact arrays, along with the
+    day, week, month and year each falls in, then each rule is a single pass
+    over the backups from newest to oldest, keeping the first backup of
+    each new period until it has kept as many as it allows.
+
+    Raises ValueError if the policy doesn't keep any backups.
+    """
+
+    policy.check()
+    plan: RcloneRetentionPlan = RcloneRetentionPlan()
+    protected: Set[str] = set(policy.protected)
+
+    paths: List[str] = []
+    times: "array[float]" = array("d")
+
+    for entry in listing:
+        path: str = entry_path(entry)
+        backup_time: Optional[float] = None
+
+        if entry_is_dir(entry):
+            plan.directories.add(path)
+
+        if policy.use_names:
+            backup_time = name_time(path.rsplit("/", 1)[-1])
+
+        if backup_time is None:
+            backup_time = entry_mod_time(entry)
+
+        if backup_time is None:
+            plan.undated.append(path)
+            continue
+
+        paths.append(path)
+        times.append(backup_time)
+
+    days: "array[int]" = array("q", (int(time // SECONDS_PER_DAY) for time in times))
+    weeks: "array[int]" = array("q", ((day + 3) // 7 for day in days))
+    months: "array[int]" = array("q")
+    years: "array[int]" = array("q")
+
+    # Backups are usually taken at least daily, so many share a day.
+    day_months: Dict[int, Tuple[int, int]] = {}
+
+    for day in days:
+        if day not in day_months:
+            day_months[day] = year_month(day)
+
+        year, month = day_months[day]
+        years.append(year)
+        months.append(year * 12 + month)
+
+    newest_first: List[int] = sorted(
+        range(len(paths)), key=times.__getitem__, reverse=True
+    )
+    rules: List[Tuple[str, int, Callable[[int], int]]] = [
+        ("last", policy.last, int),
+        ("daily", policy.daily, days.__getitem__),
+        ("weekly", policy.weekly, weeks.__getitem__),
+        ("monthly", policy.monthly, months.__getitem__),
+        ("yearly", policy.yearly, years.__getitem__),
+    ]
+
+    for rule, count, period in rules:
+        kept: int = 0
+        last_period: Optional[int] = None
+
+        for index in newest_first:
+            if kept >= count:
+                break
+
+            if period(index) == last_period:
+                continue
+
+            last_period = period(index)
+            kept += 1
+            plan.reasons.setdefault(paths[index], []).append(rule)
+
+    for path in paths:
+        if path in plan.reasons:
+            plan.keep.append(path)
+        elif path.rsplit("/", 1)[-1] in protected or path in protected:
+            plan.reasons[path] = ["protected"]
+            plan.keep.append(path)
+        else:
+            plan.delete.append(path)
+
+    plan.keep += plan.undated
+
+    return plan
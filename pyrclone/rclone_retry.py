@@ -0,0 +1,175 @@
+# pylint: disable=C0411
+"""rclone_retry
+
+Retry failed rclone commands based on their return code, and limit the rate
+commands are started against each remote, to stay within provider quotas.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from .rclone_output import RcloneError
+
+
+@dataclass
+class RcloneRetryPolicy:
+    """RcloneRetryPolicy
+
+    When and how long to wait before retrying a failed command.
+
+    Commands returning one of the retry_codes are retried up to max_attempts
+    times in total, with an exponential backoff from base_delay up to
+    max_delay seconds, with full jitter so concurrent commands spread out.
+
+    A TRANSFER_EXCEEDED return code means a quota (usually daily) has been
+    hit, so retrying soon won't help. If transfer_exceeded_delay is set, the
+    command is retried once after that many seconds, otherwise it is
+    returned as failed straight away.
+    """
+
+    max_attempts: int = 5
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    retry_codes: Tuple[RcloneError, ...] = (RcloneError.RETRY_ERROR,)
+    transfer_exceeded_delay: Optional[float] = None
+
+    def retry_delay(self, return_code: RcloneError, attempt: int) -> Optional[float]:
+        """retry_delay
+
+        How long to wait before retrying a command, which returned the given
+        return code on the given attempt (starting from 0), or None if it
+        shouldn't be retried.
+        """
+
+        if return_code is RcloneError.TRANSFER_EXCEEDED:
+            if self.transfer_exceeded_delay is None or attempt > 0:
+                return None
+
+            return self.transfer_exceeded_delay
+
+        if return_code not in self.retry_codes or attempt + 1 >= self.max_attempts:
+            return None
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2.0**attempt))
+
+
+class RcloneTokenBucket:
+    """RcloneTokenBucket
+
+    A thread safe token bucket, which refills at rate tokens per second up to
+    capacity tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        self.rate: float = rate
+        self.capacity: float = capacity
+
+        self._tokens: float = capacity
+        self._updated: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """reserve
+
+        Take tokens from the bucket, returning how many seconds to wait before
+        they can be used. The tokens are taken straight away, so later callers
+        wait behind earlier ones.
+        """
+
+        with self._lock:
+            now: float = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+
+            if self._tokens >= 0:
+                return 0.0
+
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """acquire
+
+        Take tokens from the bucket, waiting until they can be used.
+        """
+
+        wait: float = self.reserve(tokens)
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RcloneRateLimiter:
+    """RcloneRateLimiter
+
+    A token bucket per remote, limiting how many commands a second are
+    started against it. It can be shared by any number of threads.
+
+    Remotes without a rate in rates use default_rate, or aren't limited if
+    that is None. Each bucket allows bursts of up to burst commands.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, float]] = None,
+        default_rate: Optional[float] = None,
+        burst: float = 1.0,
+    ) -> None:
+        self.rates: Dict[str, float] = dict(rates) if rates is not None else {}
+        self.default_rate: Optional[float] = default_rate
+        self.burst: float = burst
+
+        self._buckets: Dict[str, RcloneTokenBucket] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _bucket(self, remote: str) -> Optional[RcloneTokenBucket]:
+        """_bucket
+
+        Get the bucket for a remote, creating it on first use, or None if the
+        remote isn't limited.
+        """
+
+        rate: Optional[float] = self.rates.get(remote, self.default_rate)
+
+        if rate is None:
+            return None
+
+        with self._lock:
+            if remote not in self._buckets:
+                self._buckets[remote] = RcloneTokenBucket(rate, self.burst)
+
+            return self._buckets[remote]
+
+    def reserve(self, remotes: Iterable[str]) -> float:
+        """reserve
+
+        Take a token for each of the given remotes, returning how many seconds
+        to wait before starting the command.
+        """
+
+        wait: float = 0.0
+
+        for remote in set(remotes):
+            bucket: Optional[RcloneTokenBucket] = self._bucket(remote)
+
+            if bucket is not None:
+                wait = max(wait, bucket.reserve())
+
+        return wait
+
+    def acquire(self, remotes: Iterable[str]) -> None:
+        """acquire
+
+        Take a token for each of the given remotes, waiting until a command
+        can be started against all of them.
+        """
+
+        wait: float = self.reserve(remotes)
+
+        if wait > 0:
+            time.sleep(wait)
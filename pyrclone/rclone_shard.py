@@ -0,0 +1,296 @@
+# pylint: disable=C0411
+"""rclone_shard
+
+List huge trees by splitting them into subtrees, which are listed by many
+rclone processes at once, rather than walking every directory in turn with
+a single process.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .rclone_cancel import RcloneLimits
+from .rclone_listing import entry_is_dir, entry_path, join_path
+from .rclone_output import RcloneError
+from .rclone_stream import LsjsonEntry, RcloneJsonStream
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+# How long a blocked worker waits before checking if the listing was closed.
+PUT_TIMEOUT: float = 0.1
+
+# Filter flags taking a pattern, and filter flags reading their rules from a
+# file. rclone matches patterns with a "/" from the root of the listing.
+PATTERN_FLAGS: Tuple[str, ...] = ("--include", "--exclude", "--filter")
+FILTER_FILE_FLAGS: Tuple[str, ...] = (
+    "--include-from",
+    "--exclude-from",
+    "--filter-from",
+    "--files-from",
+    "--files-from-raw",
+)
+
+
+def root_relative_filters(flags: List[str]) -> bool:
+    """root_relative_filters
+
+    If any filter in flags is matched relative to the root of the listing, ie
+    "/2019/**" or "Trip/*.jpg", so would match different entries if applied
+    to each shard. Rules read from files can't be checked, so are assumed to
+    be.
+    """
+
+    for index, flag in enumerate(flags):
+        name, equals, pattern = flag.partition("=")
+
+        if name in FILTER_FILE_FLAGS:
+            return True
+
+        if name not in PATTERN_FLAGS:
+            continue
+
+        if not equals:
+            pattern = flags[index + 1] if index + 1 < len(flags) else ""
+
+        if name == "--filter" and pattern[:2] in ("+ ", "- "):
+            pattern = pattern[2:]
+
+        # A trailing "/" only restricts the pattern to directories.
+        if "/" in pattern.rstrip("/"):
+            return True
+
+    return False
+
+
+class _ShardFinished:  # pylint: disable=too-few-public-methods
+    """_ShardFinished
+
+    A marker put on the queue once a shard has been completely listed.
+    """
+
+
+class RcloneShardedListing:
+    """RcloneShardedListing
+
+    An iterator over the entries of a recursive JSON listing, which is listed
+    in parallel shards.
+
+    The top shard_depth levels of the remote are listed first, then each
+    directory at that depth is listed recursively by its own "lsjson -R", with
+    up to max_workers running at once. Entries from every listing are merged
+    into a single stream, with paths relative to the remote, in no particular
+    order. At most queue_size entries are buffered, so workers wait for the
+    stream to be consumed rather than holding the whole listing.
+
+    As with RcloneJsonStream, it can only be consumed once, after which
+    return_code (the first error of any listing) and error are populated.
+    Closing it early stops all of the listings.
+
+    Filters with patterns matched from the root, or read from files, can't
+    be applied to each shard, so the remote is listed by a single "lsjson -R"
+    instead. See root_relative_filters.
+    """
+
+    def __init__(
+        self,
+        rclone: "Rclone",
+        remote: str,
+        flags: Iterable[str] = tuple(),
+        shard_depth: int = 1,
+        max_workers: int = 4,
+        queue_size: int = 10000,
+    ) -> None:
+        self.rclone: "Rclone" = rclone
+        self.remote: str = remote
+        self.flags: List[str] = list(flags)
+        self.shard_depth: int = max(1, shard_depth)
+        self.max_workers: int = max_workers
+        self.limits: RcloneLimits = rclone.current_limits()
+
+        self.return_code: Optional[RcloneError] = None
+        self.error: List[str] = []
+        self.shards: List[str] = []
+
+        self._queue: "queue.Queue[Union[LsjsonEntry, _ShardFinished]]" = queue.Queue(
+            queue_size
+        )
+        self._closed: threading.Event = threading.Event()
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: Optional[Generator[LsjsonEntry, None, None]] = None
+
+    def __iter__(self) -> Iterator[LsjsonEntry]:
+        if self._entries is None:
+            self._entries = (
+                self._single_stream()
+                if root_relative_filters(self.flags)
+                else self._stream()
+            )
+
+        return self._entries
+
+    def close(self) -> None:
+        """close
+
+        Stop consuming the listing, stopping every rclone still running.
+        """
+
+        if self._entries is not None:
+            self._entries.close()
+
+    def _finish_listing(self, stream: RcloneJsonStream) -> None:
+        """_finish_listing
+
+        Record the result of a finished listing.
+        """
+
+        with self._lock:
+            self.error += stream.error
+
+            if stream.return_code is None:
+                return
+
+            if self.return_code is None or (
+                self.return_code is RcloneError.SUCCESS
+                and stream.return_code is not RcloneError.SUCCESS
+            ):
+                self.return_code = stream.return_code
+
+    def _put(self, item: Union[LsjsonEntry, _ShardFinished]) -> bool:
+        """_put
+
+        Put an item on the queue, waiting for space unless the listing has
+        been closed. Returns if the item was put.
+        """
+
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def _list_shard(self, shard: str) -> None:
+        """_list_shard
+
+        List a single shard recursively, putting its entries on the queue
+        with their full path.
+        """
+
+        with self.rclone.limits(
+            self.limits.timeout, self.limits.deadline, self.limits.cancel_handle
+        ):
+            stream: RcloneJsonStream = self.rclone.iter_lsjson(
+                join_path(self.remote, shard), self.flags + ["-R"]
+            )
+
+        try:
+            if self._closed.is_set():
+                return
+
+            for entry in stream:
+                entry["Path"] = f"{shard}/{entry_path(entry)}"
+
+                if not self._put(entry):
+                    break
+        finally:
+            # Stops rclone if the listing was closed part way through.
+            stream.close()
+
+            self._finish_listing(stream)
+            self._put(_ShardFinished())
+
+    def _single_stream(self) -> Generator[LsjsonEntry, None, None]:
+        """_single_stream
+
+        List the whole remote with a single listing, for filters which can't
+        be applied to each shard.
+        """
+
+        self.rclone.logger.debug(
+            f"Listing {self.remote} without shards, as its filters are matched "
+            "from the root"
+        )
+        stream: RcloneJsonStream = self.rclone.iter_lsjson(
+            self.remote, self.flags + ["-R"]
+        )
+
+        try:
+            yield from stream
+        finally:
+            stream.close()
+            self._finish_listing(stream)
+
+    def _stream(self) -> Generator[LsjsonEntry, None, None]:
+        """_stream
+
+        List the top levels, start a worker per shard, and yield the entries
+        of every listing as they arrive.
+        """
+
+        files_only: bool = "--files-only" in self.flags
+        top_flags: List[str] = [flag for flag in self.flags if flag != "--files-only"]
+        top_stream: RcloneJsonStream = self.rclone.iter_lsjson(
+            self.remote, top_flags + ["-R", "--max-depth", str(self.shard_depth)]
+        )
+
+        pending: int = 0
+        workers: ThreadPoolExecutor = ThreadPoolExecutor(self.max_workers)
+
+        try:
+            for entry in top_stream:
+                path: str = entry_path(entry)
+                is_dir: bool = entry_is_dir(entry)
+
+                if is_dir and path.count("/") + 1 == self.shard_depth:
+                    self.shards.append(path)
+                    workers.submit(self._list_shard, path)
+                    pending += 1
+
+                if not (files_only and is_dir):
+                    yield entry
+
+                # Keep the workers moving whilst the top levels are listed.
+                while True:
+                    try:
+                        item: Union[LsjsonEntry, _ShardFinished] = (
+                            self._queue.get_nowait()
+                        )
+                    except queue.Empty:
+                        break
+
+                    if isinstance(item, _ShardFinished):
+                        pending -= 1
+                    else:
+                        yield item
+
+            self._finish_listing(top_stream)
+
+            while pending:
+                finished_item: Union[LsjsonEntry, _ShardFinished] = self._queue.get()
+
+                if isinstance(finished_item, _ShardFinished):
+                    pending -= 1
+                else:
+                    yield finished_item
+        finally:
+            self._closed.set()
+            top_stream.close()
+            workers.shutdown(wait=True)
+
+            # Stopped early, so the result is incomplete.
+            if pending:
+                self.return_code = None
@@ -0,0 +1,184 @@
+# pylint: disable=C0411
+"""rclone_sizes
+
+Total up the sizes of every directory of a remote from a single recursive
+listing, rather than walking the remote again with "rclone size" for each.
+"""
+
+import heapq
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Set
+
+from .rclone_listing import entry_is_dir, entry_mod_time, entry_path, entry_size
+from .rclone_output import RcloneError
+from .rclone_stream import LsjsonEntry
+
+
+@dataclass
+class RcloneDirectorySize:
+    """RcloneDirectorySize
+
+    The totals of a directory and everything below it, ie the size in bytes,
+    the number of files, and the modification times (seconds since the epoch)
+    of the newest and oldest files, which are None if it has no files.
+    """
+
+    path: str
+    size: int = 0
+    files: int = 0
+    newest: Optional[float] = None
+    oldest: Optional[float] = None
+
+
+def parent_path(path: str) -> str:
+    """parent_path
+
+    The directory a path is in, or "" for the root.
+    """
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+class RcloneSizeTree:
+    """RcloneSizeTree
+
+    The rolled up size of every directory in a listing.
+
+    Each file is added to the totals of its directory and every directory
+    above it as the listing is read, so looking up the totals of any
+    directory afterwards is a single dictionary lookup. The root of the
+    listing is the path "".
+
+    When built from a remote, complete is only set if the listing succeeded.
+    """
+
+    def __init__(self, listing: Iterable[LsjsonEntry] = tuple()) -> None:
+        self.complete: bool = False
+        self.return_code: Optional[RcloneError] = None
+
+        self._totals: Dict[str, RcloneDirectorySize] = {"": RcloneDirectorySize("")}
+        self._children: Dict[str, Set[str]] = {"": set()}
+
+        self.add_listing(listing)
+
+    def _directory(self, path: str) -> RcloneDirectorySize:
+        """_directory
+
+        Get the totals of a directory, adding it and any missing parents.
+        """
+
+        totals: Optional[RcloneDirectorySize] = self._totals.get(path)
+
+        if totals is None:
+            totals = RcloneDirectorySize(path)
+            self._totals[path] = totals
+            self._children[path] = set()
+
+            self._directory(parent_path(path))
+            self._children[parent_path(path)].add(path)
+
+        return totals
+
+    def add(self, entry: LsjsonEntry) -> None:
+        """add
+
+        Add a single entry of a listing.
+        """
+
+        path: str = entry_path(entry).strip("/")
+
+        if entry_is_dir(entry):
+            self._directory(path)
+            return
+
+        size: int = max(0, entry_size(entry))
+        mod_time: Optional[float] = entry_mod_time(entry)
+        directory: Optional[str] = parent_path(path)
+
+        self._directory(parent_path(path))
+
+        while directory is not None:
+            totals: RcloneDirectorySize = self._totals[directory]
+            totals.size += size
+            totals.files += 1
+
+            if mod_time is not None:
+                if totals.newest is None or mod_time > totals.newest:
+                    totals.newest = mod_time
+
+                if totals.oldest is None or mod_time < totals.oldest:
+                    totals.oldest = mod_time
+
+            directory = parent_path(directory) if directory else None
+
+    def add_listing(self, listing: Iterable[LsjsonEntry]) -> None:
+        """add_listing
+
+        Add every entry of a listing.
+        """
+
+        for entry in listing:
+            self.add(entry)
+
+    def size(self, path: str = "") -> Optional[RcloneDirectorySize]:
+        """size
+
+        The totals of a directory, relative to the root of the listing, or
+        None if there is no such directory.
+        """
+
+        totals: Optional[RcloneDirectorySize] = self._totals.get(path.strip("/"))
+
+        if totals is None:
+            return None
+
+        return replace(totals)
+
+    def children(self, path: str = "") -> List[RcloneDirectorySize]:
+        """children
+
+        The totals of the directories directly inside a directory, largest
+        first.
+        """
+
+        return self._largest(
+            self._children.get(path.strip("/"), set()), len(self._totals)
+        )
+
+    def largest(
+        self, count: int, max_depth: Optional[int] = None
+    ) -> List[RcloneDirectorySize]:
+        """largest
+
+        The count largest directories, largest first, optionally only those
+        at most max_depth levels below the root. The root itself isn't
+        included.
+        """
+
+        return self._largest(
+            (
+                path
+                for path in self._totals
+                if path and (max_depth is None or path.count("/") + 1 <= max_depth)
+            ),
+            count,
+        )
+
+    def _largest(self, paths: Iterable[str], count: int) -> List[RcloneDirectorySize]:
+        """_largest
+
+        The totals of the count largest of the given directories.
+        """
+
+        sizes: List[RcloneDirectorySize] = [self._totals[path] for path in paths]
+
+        return [
+            replace(totals) for totals in heapq.nlargest(count, sizes, key=_size_key)
+        ]
+
+
+def _size_key(totals: RcloneDirectorySize) -> int:
+    """_size_key
+
+    Order directories by size.
+    """
+    return totals.size
@@ -0,0 +1,192 @@
+# pylint: disable=C0411
+"""rclone_stats
+
+Run rclone commands whilst reading their JSON log as it is written, to report
+transfer statistics and log messages as they happen, rather than once the
+command has finished.
+"""
+
+import json
+import logging
+import subprocess
+import threading
+from typing import IO, Callable, Dict, List, Optional, Tuple, cast
+
+from .rclone_cancel import RcloneLimits, RcloneProcessWatch
+from .rclone_output import RcloneBytesOutput, RcloneError, RcloneOutput, RcloneStats
+
+StatsCallback = Callable[[RcloneStats], None]
+
+# The commands that report transfer statistics.
+STATS_COMMANDS: Tuple[str, ...] = ("copy", "copyto", "move", "moveto", "sync", "check")
+
+# The Python equivalent of each rclone log level.
+LOG_LEVELS: Dict[str, int] = {
+    "critical": logging.CRITICAL,
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "notice": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG,
+}
+
+
+def stats_flags(interval: str) -> List[str]:
+    """stats_flags
+
+    The flags to have rclone write its statistics to its JSON log every
+    interval (ie "1s"), whatever the verbosity.
+    """
+    return ["--use-json-log", "--stats", interval, "--stats-log-level", "NOTICE"]
+
+
+def _number(stats: Dict[str, object], key: str) -> float:
+    """_number
+
+    Read a number from the statistics, defaulting to 0.
+    """
+
+    value: Optional[object] = stats.get(key)
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    return 0.0
+
+
+def parse_stats(stats: Dict[str, object]) -> RcloneStats:
+    """parse_stats
+
+    Convert the "stats" object of an rclone JSON log line to RcloneStats.
+    """
+
+    eta: Optional[object] = stats.get("eta")
+
+    return RcloneStats(
+        bytes=int(_number(stats, "bytes")),
+        total_bytes=int(_number(stats, "totalBytes")),
+        speed=_number(stats, "speed"),
+        eta=float(eta) if isinstance(eta, (int, float)) else None,
+        transfers=int(_number(stats, "transfers")),
+        total_transfers=int(_number(stats, "totalTransfers")),
+        checks=int(_number(stats, "checks")),
+        total_checks=int(_number(stats, "totalChecks")),
+        deletes=int(_number(stats, "deletes")),
+        errors=int(_number(stats, "errors")),
+        elapsed_time=_number(stats, "elapsedTime"),
+        raw=stats,
+    )
+
+
+class RcloneStatsReader:
+    """RcloneStatsReader
+
+    A class to handle the lines of an rclone JSON log as they are written.
+
+    Log messages are passed on to the logger at the matching level, and
+    every statistics update is kept and passed to each of the callbacks.
+    """
+
+    def __init__(self, logger: logging.Logger, callbacks: List[StatsCallback]) -> None:
+        self.logger: logging.Logger = logger
+        self.callbacks: List[StatsCallback] = callbacks
+
+        self.last_stats: Optional[RcloneStats] = None
+        self.error: List[str] = []
+
+    def read_line(self, log_line: str) -> None:
+        """read_line
+
+        Handle a single line of the log. Lines that aren't statistics are kept
+        as the error output of the command.
+        """
+
+        try:
+            log_entry: Dict[str, object] = json.loads(log_line)
+        except ValueError:
+            self.error.append(log_line)
+            self.logger.warning(log_line)
+            return
+
+        stats: Optional[object] = log_entry.get("stats")
+
+        if not isinstance(stats, dict):
+            self.error.append(log_line)
+            self.logger.log(
+                LOG_LEVELS.get(str(log_entry.get("level")), logging.WARNING),
+                str(log_entry.get("msg", log_line)),
+            )
+            return
+
+        self.last_stats = parse_stats(cast(Dict[str, object], stats))
+        self.logger.debug(f"Transfer statistics: {self.last_stats}")
+
+        for callback in self.callbacks:
+            try:
+                callback(self.last_stats)
+            except Exception as exception:  # pylint: disable=broad-except
+                self.logger.exception(f"Statistics callback failed: {exception}")
+
+
+def run_with_stats(  # pylint: disable=too-many-arguments
+    command_to_run: List[str],
+    logger: logging.Logger,
+    callbacks: List[StatsCallback],
+    limits: Optional[RcloneLimits] = None,
+    kill_grace: float = 5.0,
+    bytes_output: bool = False,
+) -> RcloneOutput:
+    """run_with_stats
+
+    Run a given rclone command, which is expected to be using a JSON log,
+    reading its log as it runs.
+
+    The command output is returned as normal, along with the last statistics
+    reported. If the command is stopped by its limits, the return code is
+    TIMEOUT or CANCELLED. With bytes_output, an RcloneBytesOutput is returned,
+    whose error is the log lines that weren't statistics.
+    """
+
+    reader: RcloneStatsReader = RcloneStatsReader(logger, callbacks)
+    output_chunks: List[bytes] = []
+
+    with subprocess.Popen(
+        command_to_run, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as rclone_process:
+        output_thread: threading.Thread = threading.Thread(
+            target=lambda: output_chunks.append(
+                cast(IO[bytes], rclone_process.stdout).read()
+            )
+        )
+        output_thread.daemon = True
+        output_thread.start()
+
+        with RcloneProcessWatch(
+            rclone_process, limits or RcloneLimits(), kill_grace
+        ) as watch:
+            for error_line in cast(IO[bytes], rclone_process.stderr):
+                reader.read_line(error_line.decode("utf-8").rstrip("\r\n"))
+
+            rclone_process.wait()
+            output_thread.join()
+
+        return_code: RcloneError = (
+            RcloneError(rclone_process.returncode)
+            if watch.reason is None
+            else watch.reason
+        )
+
+        if bytes_output:
+            return RcloneBytesOutput(
+                return_code,
+                b"".join(output_chunks),
+                "".join(f"{line}\n" for line in reader.error).encode("utf-8"),
+                reader.last_stats,
+            )
+
+        return RcloneOutput(
+            return_code,
+            b"".join(output_chunks).decode("utf-8").splitlines(),
+            reader.error,
+            reader.last_stats,
+        )
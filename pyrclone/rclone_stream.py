@@ -0,0 +1,201 @@
+# pylint: disable=C0411
+"""rclone_stream
+
+Helpers to consume the output of an rclone command as it is produced, rather
+than waiting for the process to exit and buffering everything it printed.
+"""
+
+import json
+import logging
+import subprocess
+import threading
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Generator,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from .rclone_cancel import RcloneLimits, RcloneProcessWatch
+from .rclone_output import RcloneError
+
+# A single decoded entry of a JSON listing, ie {"Path": "a.txt", "Size": 0, ...}
+LsjsonEntry = Dict[str, object]
+
+# What a line stream parses each line of output into.
+ParsedLine = TypeVar("ParsedLine")
+
+
+def parse_lsjson_line(line: Union[bytes, str]) -> Optional[LsjsonEntry]:
+    """parse_lsjson_line
+
+    Parse a single line of "rclone lsjson" output.
+
+    rclone prints one entry per line, wrapped in a JSON list, ie:
+        [
+        {"Path":"a.txt", ...},
+        {"Path":"b.txt", ...}
+        ]
+    so each entry can be decoded on its own once the surrounding list
+    characters and the trailing comma are removed. Lines that are not an entry
+    return None.
+    """
+
+    stripped_line: Union[bytes, str] = line.strip()
+
+    if isinstance(stripped_line, bytes):
+        stripped_line = stripped_line.decode("utf-8")
+
+    if stripped_line.endswith(","):
+        stripped_line = stripped_line[:-1]
+
+    if not stripped_line.startswith("{"):
+        return None
+
+    entry: LsjsonEntry = json.loads(stripped_line)
+    return entry
+
+
+class RcloneLineStream(Generic[ParsedLine]):
+    """RcloneLineStream
+
+    An iterator over the lines of an rclone command's output, each parsed by
+    parse_line, with lines it returns None for skipped.
+
+    Lines are parsed and yielded as rclone writes them, so only a single line
+    of the output is held in memory at a time. The stream can only be
+    consumed once, after which return_code and error are populated. If the
+    stream is closed before being exhausted, the process is killed and
+    return_code is left as None.
+
+    The limits apply from when the stream starts being consumed until rclone
+    exits, so a timeout includes the time spent handling the lines.
+    """
+
+    def __init__(
+        self,
+        command_to_run: List[str],
+        logger: logging.Logger,
+        parse_line: Callable[[bytes], Optional[ParsedLine]],
+        limits: Optional[RcloneLimits] = None,
+        kill_grace: float = 5.0,
+    ) -> None:
+        self.command: List[str] = command_to_run
+        self.logger: logging.Logger = logger
+        self.parse_line: Callable[[bytes], Optional[ParsedLine]] = parse_line
+        self.limits: RcloneLimits = limits or RcloneLimits()
+        self.kill_grace: float = kill_grace
+
+        self.return_code: Optional[RcloneError] = None
+        self.error: List[str] = []
+
+        self._entries: Optional[Generator[ParsedLine, None, None]] = None
+
+    def __iter__(self) -> Iterator[ParsedLine]:
+        if self._entries is None:
+            self._entries = self._stream()
+
+        return self._entries
+
+    def close(self) -> None:
+        """close
+
+        Stop consuming the stream, killing rclone if it is still running.
+        """
+
+        if self._entries is not None:
+            self._entries.close()
+
+    def _drain_error(self, error_pipe: IO[bytes]) -> None:
+        """_drain_error
+
+        Read stderr in the background, such that rclone never blocks on a
+        full stderr pipe whilst stdout is being consumed.
+        """
+
+        for error_line in error_pipe:
+            self.error.append(error_line.decode("utf-8").rstrip("\r\n"))
+
+    def _stream(self) -> Generator[ParsedLine, None, None]:
+        """_stream
+
+        Run the command, and yield each parsed line of its output.
+        """
+        self.logger.debug(f"Streaming: {self.command}")
+
+        stopped: Optional[RcloneError] = self.limits.stopped()
+
+        if stopped is not None:
+            self.logger.warning(f"Not running {self.command}: {stopped.name}")
+            self.return_code = stopped
+            return
+
+        try:
+            with subprocess.Popen(
+                self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            ) as rclone_process:
+                error_thread: threading.Thread = threading.Thread(
+                    target=self._drain_error, args=(rclone_process.stderr,)
+                )
+                error_thread.daemon = True
+                error_thread.start()
+
+                with RcloneProcessWatch(
+                    rclone_process, self.limits, self.kill_grace
+                ) as watch:
+                    try:
+                        for output_line in cast(IO[bytes], rclone_process.stdout):
+                            entry: Optional[ParsedLine] = self.parse_line(output_line)
+
+                            if entry is not None:
+                                yield entry
+
+                        rclone_process.wait()
+                    finally:
+                        # Stopped early, so stop rclone rather than waiting for
+                        # it to finish writing a listing no one will read.
+                        if rclone_process.poll() is None:
+                            rclone_process.kill()
+
+                error_thread.join()
+
+                if self.error:
+                    self.logger.warning("\n".join(self.error))
+
+                self.return_code = (
+                    RcloneError(rclone_process.returncode)
+                    if watch.reason is None
+                    else watch.reason
+                )
+        except FileNotFoundError as file_missing:
+            self.logger.exception(f"Can't find rclone executable. {file_missing}")
+            self.return_code = RcloneError.RCLONE_MISSING
+        except Exception as exception:  # pylint: disable=broad-except
+            self.logger.exception(
+                f"Exception running {self.command}. Exception: {exception}"
+            )
+            self.return_code = RcloneError.PYTHON_EXCEPTION
+
+
+class RcloneJsonStream(RcloneLineStream[LsjsonEntry]):
+    """RcloneJsonStream
+
+    An iterator over the entries of an rclone JSON listing. See
+    RcloneLineStream.
+    """
+
+    def __init__(
+        self,
+        command_to_run: List[str],
+        logger: logging.Logger,
+        limits: Optional[RcloneLimits] = None,
+        kill_grace: float = 5.0,
+    ) -> None:
+        super().__init__(command_to_run, logger, parse_lsjson_line, limits, kill_grace)
@@ -0,0 +1,597 @@
+# pylint: disable=C0411
+"""rclone_verify
+
+Structured, streamed results of "rclone check" and "rclone hashsum", and a
+local SQLite record of verified files, such that later verifications only
+hash what is new or has changed since the last good check.
+"""
+
+import sqlite3
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .rclone_backends import common_hash_type
+from .rclone_batch import RcloneCommandSpec, RcloneExecutor
+from .rclone_listing import entry_path, entry_size, files_from
+from .rclone_output import RcloneError, RcloneOutput
+from .rclone_stream import RcloneJsonStream
+
+if TYPE_CHECKING:
+    from .rclone import Rclone  # pylint: disable=cyclic-import
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS verified (
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    source_mod_time TEXT,
+    destination_mod_time TEXT,
+    hash TEXT,
+    verified REAL NOT NULL,
+    PRIMARY KEY (source, destination, path)
+) WITHOUT ROWID;
+"""
+
+RecordRow = Tuple[
+    str, str, str, int, Optional[str], Optional[str], Optional[str], float
+]
+
+VerifiedRow = Tuple[str, int, Optional[str], Optional[str], Optional[str]]
+
+# The size and ModTime of a listed file.
+ListedFile = Tuple[int, Optional[str]]
+
+
+class RcloneCheckStatus(Enum):
+    """RcloneCheckStatus
+
+    The result of checking a file, as given by the symbols of rclone check's
+    "--combined" report.
+    """
+
+    MATCH = "="
+    DIFFER = "*"
+    MISSING_ON_SOURCE = "-"
+    MISSING_ON_DESTINATION = "+"
+    ERROR = "!"
+
+
+class RcloneCheckEntry(NamedTuple):
+    """RcloneCheckEntry
+
+    The result of checking a single file.
+    """
+
+    status: RcloneCheckStatus
+    path: str
+
+
+class RcloneHashEntry(NamedTuple):
+    """RcloneHashEntry
+
+    A single line of "rclone hashsum" output.
+    """
+
+    hash: str
+    path: str
+
+
+def parse_check_line(line: Union[bytes, str]) -> Optional[RcloneCheckEntry]:
+    """parse_check_line
+
+    Parse a line of "rclone check --combined -" output, ie "= a.txt". Lines
+    that are not a result return None.
+    """
+
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+
+    line = line.rstrip("\r\n")
+
+    if len(line) < 3 or line[1] != " ":
+        return None
+
+    try:
+        return RcloneCheckEntry(RcloneCheckStatus(line[0]), line[2:])
+    except ValueError:
+        return None
+
+
+def parse_hashsum_line(line: Union[bytes, str]) -> Optional[RcloneHashEntry]:
+    """parse_hashsum_line
+
+    Parse a line of "rclone hashsum" output, ie "<hash>  a.txt". Files which
+    couldn't be hashed, where rclone writes a message in place of the hash,
+    return None.
+    """
+
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+
+    hash_value, separator, path = line.rstrip("\r\n").partition("  ")
+
+    if not separator or not hash_value.isalnum():
+        return None
+
+    return RcloneHashEntry(hash_value.lower(), path)
+
+
+@dataclass
+class RcloneVerifiedRecord:
+    """RcloneVerifiedRecord
+
+    A file which was the same on both sides when last verified, with the
+    size, ModTime on each side, and hash it had then. The hash is None if the
+    remotes have no hash type in common, so the file was verified by
+    downloading it.
+    """
+
+    path: str
+    size: int
+    source_mod_time: Optional[str]
+    destination_mod_time: Optional[str]
+    hash: Optional[str]
+
+
+@dataclass
+class RcloneVerifyResult:
+    """RcloneVerifyResult
+
+    The result of verifying a destination against its source, ie the number
+    of files found the same, and skipped as unchanged since they were last
+    verified, and the paths of the files with any other result.
+
+    The return code is the first error of any command ran, other than the
+    check finding differences, or SUCCESS.
+    """
+
+    matched: int = 0
+    skipped: int = 0
+    differ: List[str] = field(default_factory=list)
+    missing_on_source: List[str] = field(default_factory=list)
+    missing_on_destination: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    return_code: RcloneError = RcloneError.SUCCESS
+
+    @property
+    def ok(self) -> bool:
+        """ok
+
+        If every file was verified as the same on both sides.
+        """
+
+        return (
+            self.return_code is RcloneError.SUCCESS
+            and not self.differ
+            and not self.missing_on_source
+            and not self.missing_on_destination
+            and not self.errors
+        )
+
+    def add(self, entry: RcloneCheckEntry) -> None:
+        """add
+
+        Count the result of checking a file.
+        """
+
+        if entry.status is RcloneCheckStatus.MATCH:
+            self.matched += 1
+        elif entry.status is RcloneCheckStatus.DIFFER:
+            self.differ.append(entry.path)
+        elif entry.status is RcloneCheckStatus.MISSING_ON_SOURCE:
+            self.missing_on_source.append(entry.path)
+        elif entry.status is RcloneCheckStatus.MISSING_ON_DESTINATION:
+            self.missing_on_destination.append(entry.path)
+        else:
+            self.errors.append(entry.path)
+
+
+class RcloneVerificationStore:
+    """RcloneVerificationStore
+
+    A class to store the files verified between a source and destination in
+    an SQLite database, such that only new or changed files are verified
+    again.
+
+    A file is verified again if its size or ModTime on either side has
+    changed since it was recorded. Files which fail verification are removed
+    from the record, so they are always checked again.
+    """
+
+    def __init__(self, database_path: str = ":memory:") -> None:
+        self.database_path: str = database_path
+
+        # Workers only run rclone, so the database is only used from the
+        # thread verifying.
+        self._connection: sqlite3.Connection = sqlite3.connect(database_path)
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "RcloneVerificationStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:  # type: ignore
+        self.close()
+
+    def close(self) -> None:
+        """close
+
+        Close the database.
+        """
+        self._connection.close()
+
+    def records(self, source: str, destination: str) -> Dict[str, RcloneVerifiedRecord]:
+        """records
+
+        The verified files of a source and destination, keyed by path.
+        """
+
+        records: Dict[str, RcloneVerifiedRecord] = {}
+
+        rows: List[VerifiedRow] = self._connection.execute(
+            "SELECT path, size, source_mod_time, destination_mod_time, hash "
+            "FROM verified WHERE source = ? AND destination = ?",
+            (source, destination),
+        ).fetchall()
+
+        for row in rows:
+            records[row[0]] = RcloneVerifiedRecord(*row)
+
+        return records
+
+    def record(
+        self, source: str, destination: str, records: Iterable[RcloneVerifiedRecord]
+    ) -> None:
+        """record
+
+        Store files as verified now.
+        """
+
+        verified: float = time.time()
+        rows: List[RecordRow] = [
+            (
+                source,
+                destination,
+                record.path,
+                record.size,
+                record.source_mod_time,
+                record.destination_mod_time,
+                record.hash,
+                verified,
+            )
+            for record in records
+        ]
+
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO verified VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._connection.commit()
+
+    def forget(self, source: str, destination: str, paths: Iterable[str]) -> None:
+        """forget
+
+        Remove files from the record, so they are verified next time.
+        """
+
+        self._connection.executemany(
+            "DELETE FROM verified WHERE source = ? AND destination = ? AND path = ?",
+            [(source, destination, path) for path in paths],
+        )
+        self._connection.commit()
+
+    def verify(  # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        rclone: "Rclone",
+        source: str,
+        destination: str,
+        flags: Iterable[str] = tuple(),
+        max_workers: int = 4,
+        chunk_size: int = 1000,
+        full: bool = False,
+    ) -> RcloneVerifyResult:
+        """verify
+
+        Verify destination against source, only hashing the files which are
+        new or have changed since they were last verified, unless full is
+        set.
+
+        Both sides are listed without hashes first, which finds the missing
+        files, and those whose sizes differ, without hashing anything. The
+        rest are split into chunks of chunk_size files, and each chunk is
+        hashed on both sides with "rclone hashsum", with up to max_workers
+        commands running at once. If the remotes have no hash type in common,
+        each chunk is instead checked with "rclone check --download".
+
+        Nothing is recorded if either listing fails.
+        """
+
+        flags = list(flags)
+        result: RcloneVerifyResult = RcloneVerifyResult()
+
+        source_files: Optional[Dict[str, ListedFile]] = _list_files(
+            rclone, source, flags, result
+        )
+        destination_files: Optional[Dict[str, ListedFile]] = _list_files(
+            rclone, destination, flags, result
+        )
+
+        if source_files is None or destination_files is None:
+            return result
+
+        records: Dict[str, RcloneVerifiedRecord] = (
+            {} if full else self.records(source, destination)
+        )
+        candidates: List[RcloneVerifiedRecord] = []
+
+        for path, (size, source_mod_time) in source_files.items():
+            destination_file: Optional[ListedFile] = destination_files.get(path)
+
+            if destination_file is None:
+                result.missing_on_destination.append(path)
+                continue
+
+            if destination_file[0] != size:
+                result.differ.append(path)
+                continue
+
+            recorded: Optional[RcloneVerifiedRecord] = records.get(path)
+
+            if (
+                recorded is not None
+                and recorded.size == size
+                and recorded.source_mod_time == source_mod_time
+                and recorded.destination_mod_time == destination_file[1]
+            ):
+                result.skipped += 1
+            else:
+                candidates.append(
+                    RcloneVerifiedRecord(
+                        path, size, source_mod_time, destination_file[1], None
+                    )
+                )
+
+        result.missing_on_source = [
+            path for path in destination_files if path not in source_files
+        ]
+
+        hash_type: Optional[str] = common_hash_type(
+            [rclone.backend_features(source), rclone.backend_features(destination)]
+        )
+        for chunk_records, chunk_entries in _check_chunks(
+            rclone,
+            source,
+            destination,
+            flags,
+            hash_type,
+            candidates,
+            max_workers,
+            chunk_size,
+            result,
+        ):
+            # Each chunk is recorded as it finishes, so an interrupted run
+            # keeps what it verified.
+            for entry in chunk_entries:
+                result.add(entry)
+
+            self.record(
+                source,
+                destination,
+                [
+                    record
+                    for record, entry in zip(chunk_records, chunk_entries)
+                    if entry.status is RcloneCheckStatus.MATCH
+                ],
+            )
+
+        self.forget(
+            source,
+            destination,
+            result.differ
+            + result.missing_on_destination
+            + result.missing_on_source
+            + result.errors
+            + [path for path in records if path not in source_files],
+        )
+
+        return result
+
+
+def _list_files(
+    rclone: "Rclone", remote: str, flags: List[str], result: RcloneVerifyResult
+) -> Optional[Dict[str, ListedFile]]:
+    """_list_files
+
+    The size and ModTime of every file in a remote, keyed by path, or None if
+    the listing failed, in which case the failure is set on result.
+    """
+
+    listing: RcloneJsonStream = rclone.iter_lsjson(
+        remote, ["-R", "--files-only"] + flags
+    )
+    files: Dict[str, ListedFile] = {}
+
+    for entry in listing:
+        mod_time: Optional[object] = entry.get("ModTime")
+        files[entry_path(entry)] = (
+            entry_size(entry),
+            mod_time if isinstance(mod_time, str) else None,
+        )
+
+    if listing.return_code is not RcloneError.SUCCESS:
+        result.return_code = listing.return_code or RcloneError.PYTHON_EXCEPTION
+        return None
+
+    return files
+
+
+def _check_chunks(  # pylint: disable=too-many-arguments,too-many-locals
+    rclone: "Rclone",
+    source: str,
+    destination: str,
+    flags: List[str],
+    hash_type: Optional[str],
+    candidates: List[RcloneVerifiedRecord],
+    max_workers: int,
+    chunk_size: int,
+    result: RcloneVerifyResult,
+) -> Iterator[Tuple[List[RcloneVerifiedRecord], List[RcloneCheckEntry]]]:
+    """_check_chunks
+
+    Check the candidates a chunk at a time on a pool of workers, yielding the
+    records of each chunk with the result for each, as each chunk finishes.
+    The hash of matching records is set. Command failures are set on result.
+    """
+
+    chunk_list: List[List[RcloneVerifiedRecord]] = [
+        candidates[start : start + chunk_size]
+        for start in range(0, len(candidates), max(1, chunk_size))
+    ]
+
+    if not chunk_list:
+        return
+
+    commands_per_chunk: int = 1 if hash_type is None else 2
+    outputs: Dict[int, List[Optional[RcloneOutput]]] = {
+        index: [None] * commands_per_chunk for index in range(len(chunk_list))
+    }
+
+    with ExitStack() as list_files:
+        list_paths: List[str] = [
+            list_files.enter_context(files_from(record.path for record in chunk))
+            for chunk in chunk_list
+        ]
+        specs: List[RcloneCommandSpec] = []
+
+        for list_path in list_paths:
+            if hash_type is None:
+                specs.append(
+                    RcloneCommandSpec(
+                        "check",
+                        [source, destination, "--download", "--combined", "-"]
+                        + ["--files-from-raw", list_path]
+                        + flags,
+                    )
+                )
+            else:
+                specs += [
+                    RcloneCommandSpec(
+                        "hashsum",
+                        [hash_type, remote, "--files-from-raw", list_path] + flags,
+                    )
+                    for remote in (source, destination)
+                ]
+
+        for index, output in RcloneExecutor(rclone, max_workers).as_completed(specs):
+            chunk_index, command_index = divmod(index, commands_per_chunk)
+            chunk_outputs: List[Optional[RcloneOutput]] = outputs[chunk_index]
+            chunk_outputs[command_index] = output
+
+            if any(chunk_output is None for chunk_output in chunk_outputs):
+                continue
+
+            del outputs[chunk_index]
+            chunk_records: List[RcloneVerifiedRecord] = chunk_list[chunk_index]
+            finished: List[RcloneOutput] = [
+                chunk_output
+                for chunk_output in chunk_outputs
+                if chunk_output is not None
+            ]
+
+            yield chunk_records, _chunk_entries(
+                chunk_records, finished, hash_type is not None, result
+            )
+
+
+def _chunk_entries(
+    chunk_records: List[RcloneVerifiedRecord],
+    chunk_outputs: List[RcloneOutput],
+    hashed: bool,
+    result: RcloneVerifyResult,
+) -> List[RcloneCheckEntry]:
+    """_chunk_entries
+
+    The result for each record of a chunk, from the output of its hashsums,
+    or its check. Files missing from the output are errors.
+    """
+
+    statuses: Dict[str, RcloneCheckStatus] = {}
+
+    if hashed:
+        source_hashes: Dict[str, str] = _hashes(chunk_outputs[0], result)
+        destination_hashes: Dict[str, str] = _hashes(chunk_outputs[1], result)
+
+        for record in chunk_records:
+            source_hash: Optional[str] = source_hashes.get(record.path)
+            destination_hash: Optional[str] = destination_hashes.get(record.path)
+
+            if source_hash is None or destination_hash is None:
+                continue
+
+            record.hash = source_hash
+            statuses[record.path] = (
+                RcloneCheckStatus.MATCH
+                if source_hash == destination_hash
+                else RcloneCheckStatus.DIFFER
+            )
+    else:
+        # check exits with an error when it finds differences, which are
+        # reported in its output rather than as a failure.
+        for line in chunk_outputs[0].output:
+            entry: Optional[RcloneCheckEntry] = parse_check_line(line)
+
+            if entry is not None:
+                statuses[entry.path] = entry.status
+
+        if not statuses:
+            _set_failure(chunk_outputs[0], result)
+
+    return [
+        RcloneCheckEntry(
+            statuses.get(record.path, RcloneCheckStatus.ERROR), record.path
+        )
+        for record in chunk_records
+    ]
+
+
+def _hashes(output: RcloneOutput, result: RcloneVerifyResult) -> Dict[str, str]:
+    """_hashes
+
+    The hashes in the output of a hashsum, keyed by path.
+    """
+
+    _set_failure(output, result)
+    hashes: Dict[str, str] = {}
+
+    for line in output.output:
+        entry: Optional[RcloneHashEntry] = parse_hashsum_line(line)
+
+        if entry is not None:
+            hashes[entry.path] = entry.hash
+
+    return hashes
+
+
+def _set_failure(output: RcloneOutput, result: RcloneVerifyResult) -> None:
+    """_set_failure
+
+    Set the return code of a failed command on result, if it is the first.
+    """
+
+    if (
+        output.return_code is not RcloneError.SUCCESS
+        and result.return_code is RcloneError.SUCCESS
+    ):
+        result.return_code = output.return_code
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import io
 import unittest
 from unittest import mock
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneOutput
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneJsonStream, RcloneOutput
 
 BYTE_OUTPUT: List[bytes] = [
     b"[\n",
@@ -37,7 +38,25 @@ class rcloneMockProcess:
         self.error: bytes = error
         self.returncode: int = returncode
 
-    def communicate(self) -> Tuple[bytes, bytes]:
+        self.stdout: io.BytesIO = io.BytesIO(output)
+        self.stderr: io.BytesIO = io.BytesIO(error)
+        self.killed: bool = False
+
+    def wait(self) -> int:
+        return self.returncode
+
+    def poll(self) -> Optional[int]:
+        if self.stdout.tell() < len(self.output):
+            return None
+        return self.returncode
+
+    def kill(self) -> None:
+        self.killed = True
+
+    def terminate(self) -> None:
+        self.killed = True
+
+    def communicate(self, timeout: Optional[float] = None) -> Tuple[bytes, bytes]:
         return (self.output, self.error)
 
     def __enter__(self) -> rcloneMockProcess:
@@ -100,12 +119,13 @@ class rcloneTest(unittest.TestCase):
         with mock.patch("subprocess.Popen", self.process_mock):
             result: RcloneOutput = self.rclone.lsd("dropbox:")
 
+        # The filtering is done by rclone, so the output is returned as is.
         expected_result: RcloneOutput = RcloneOutput(
-            RcloneError.SUCCESS, [STRING_OUTPUT[i] for i in [0, 2, 3, -1]], []
+            RcloneError.SUCCESS, STRING_OUTPUT, []
         )
 
         # Assert is split so in the case of a failure, its easier to see.
-        assert self.last_mock_process.command == ["rclone", "lsjson", "dropbox:", "--fast-list"]
+        assert self.last_mock_process.command == ["rclone", "lsjson", "dropbox:", "--dirs-only", "--fast-list"]
         assert result.error == expected_result.error
         assert result.output == expected_result.output
         assert result.return_code == expected_result.return_code
@@ -114,12 +134,13 @@ class rcloneTest(unittest.TestCase):
         with mock.patch("subprocess.Popen", self.process_mock):
             result: RcloneOutput = self.rclone.lsl("dropbox:")
 
+        # The filtering is done by rclone, so the output is returned as is.
         expected_result: RcloneOutput = RcloneOutput(
-            RcloneError.SUCCESS, [STRING_OUTPUT[i] for i in [0, 1, 4, 5, -1]], []
+            RcloneError.SUCCESS, STRING_OUTPUT, []
         )
 
         # Assert is split so in the case of a failure, its easier to see.
-        assert self.last_mock_process.command == ["rclone", "lsjson", "dropbox:", "-R", "--fast-list"]
+        assert self.last_mock_process.command == ["rclone", "lsjson", "dropbox:", "-R", "--files-only", "--fast-list"]
         assert result.error == expected_result.error
         assert result.output == expected_result.output
         assert result.return_code == expected_result.return_code
@@ -335,3 +356,39 @@ class rcloneTest(unittest.TestCase):
         assert result.error == expected_result.error
         assert result.output == expected_result.output
         assert result.return_code == expected_result.return_code
+
+    def test_iter_lsjson(self) -> None:
+        self.mock_error = b"2019/01/13 20:03:41 NOTICE: Some notice\n"
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneJsonStream = self.rclone.iter_lsjson("dropbox:", ["-R"])
+
+            # Nothing should run until the stream is consumed.
+            assert stream.return_code is None
+
+            entries: List[Dict[str, Any]] = list(stream)
+
+        assert self.last_mock_process.command == ["rclone", "lsjson", "dropbox:", "-R", "--fast-list"]
+        assert [entry["Path"] for entry in entries] == [
+            "Test1.txt",
+            "TestFolder",
+            "TestFolder2",
+            "TestFolder2/Test3.txt",
+            "TestFolder/Test2.txt",
+        ]
+        assert entries[1]["IsDir"] is True
+        assert stream.return_code == RcloneError.SUCCESS
+        assert stream.error == ["2019/01/13 20:03:41 NOTICE: Some notice"]
+
+    def test_iter_lsjson_closed_early(self) -> None:
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneJsonStream = self.rclone.iter_lsjson("dropbox:")
+
+            for entry in stream:
+                assert entry["Path"] == "Test1.txt"
+                break
+
+            stream.close()
+
+        assert self.last_mock_process.killed
+        assert stream.return_code is None
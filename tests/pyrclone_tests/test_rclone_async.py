@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, List, Tuple
+from unittest import mock
+
+from pyrclone import (
+    AsyncRclone,
+    RcloneCancelHandle,
+    RcloneCommandMetrics,
+    RcloneConfig,
+    RcloneError,
+    RcloneListingCache,
+    RcloneOutput,
+    RcloneRetryPolicy,
+    RcloneStats,
+)
+
+from .test_rclone import BYTE_OUTPUT, STRING_OUTPUT, rcloneMockProcess
+from .test_rclone_stats import STATS_LOG
+
+
+class asyncRcloneMockProcess:
+    def __init__(self, command: List[str], output: bytes, error: bytes) -> None:
+        self.command: List[str] = command
+        self.output: bytes = output
+        self.error: bytes = error
+        self.returncode: int = 0
+
+    async def communicate(self) -> Tuple[bytes, bytes]:
+        await asyncio.sleep(0.01)
+        return (self.output, self.error)
+
+
+class asyncRcloneTest(unittest.TestCase):
+    """
+    Tests for the asyncio interface to rclone.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: AsyncRclone = AsyncRclone(RcloneConfig("[local]\ntype = local\n"))
+
+        self.mock_return: bytes = b"".join(BYTE_OUTPUT)
+        self.mock_processes: List[asyncRcloneMockProcess] = []
+
+    async def process_mock(self, *command: str, **kwargs: Any) -> asyncRcloneMockProcess:
+        mock_process: asyncRcloneMockProcess = asyncRcloneMockProcess(
+            list(command), self.mock_return, b""
+        )
+        self.mock_processes.append(mock_process)
+        return mock_process
+
+    def test_lsd(self) -> None:
+        with mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+            result: RcloneOutput = asyncio.run(self.rclone.lsd("dropbox:"))
+
+        assert self.mock_processes[0].command == ["rclone", "lsjson", "dropbox:", "--dirs-only", "--fast-list"]
+        assert result.return_code == RcloneError.SUCCESS
+        assert result.output == STRING_OUTPUT
+
+    def test_concurrent_copies(self) -> None:
+        self.mock_return = b""
+        self.rclone.dry_run_mode = True
+        self.rclone.verbose_mode = True
+
+        async def copy_all() -> List[RcloneOutput]:
+            return await asyncio.gather(
+                *[self.rclone.copy(f"dropbox:{i}", f"drive:{i}") for i in range(10)]
+            )
+
+        with mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+            results: List[RcloneOutput] = asyncio.run(copy_all())
+
+        assert len(results) == 10
+        assert all(result.return_code == RcloneError.SUCCESS for result in results)
+        assert self.mock_processes[3].command == [
+            "rclone",
+            "copy",
+            "--dry-run",
+            "dropbox:3",
+            "drive:3",
+            "-vvv",
+        ]
+        assert self.rclone.rclone.dry_run_mode
+
+    def test_metrics(self) -> None:
+        recorded: List[RcloneCommandMetrics] = []
+        self.rclone.rclone.metrics_sinks.append(recorded.append)
+
+        with mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+            asyncio.run(self.rclone.copy("/local", "local:Backups"))
+
+        assert len(recorded) == 1
+        assert recorded[0].command == "copy"
+        assert recorded[0].remote == "local"
+        assert recorded[0].output_bytes == len(self.mock_return)
+        assert recorded[0].wall_time >= 0.01
+        assert recorded[0].return_code == RcloneError.SUCCESS
+
+    def test_shared_listing_cache(self) -> None:
+        self.rclone.rclone.listing_cache = RcloneListingCache(ttl=None)
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            self.mock_processes.append(asyncRcloneMockProcess(command_to_run, b"", b""))
+            return RcloneOutput(RcloneError.SUCCESS, list(STRING_OUTPUT), [])
+
+        async def delete_and_list() -> Tuple[RcloneOutput, RcloneOutput]:
+            cached: RcloneOutput = await self.rclone.lsjson("dropbox:Photos")
+            await self.rclone.delete("dropbox:Photos/Test1.txt")
+            return cached, await self.rclone.lsjson("dropbox:Photos")
+
+        with mock.patch("asyncio.create_subprocess_exec", self.process_mock), mock.patch.object(
+            self.rclone.rclone, "_execute", execute_mock
+        ):
+            self.rclone.rclone.lsjson("dropbox:Photos")
+            cached, listed = asyncio.run(delete_and_list())
+            self.rclone.rclone.lsjson("dropbox:Photos")
+
+        # The async listing is served from the listing made by the synchronous
+        # instance, and the async delete invalidates it for both.
+        assert [process.command[1] for process in self.mock_processes] == ["lsjson", "delete", "lsjson"]
+        assert cached.output == STRING_OUTPUT
+        assert listed.output == STRING_OUTPUT
+
+    def test_dry_run_refused(self) -> None:
+        self.rclone.dry_run_mode = True
+
+        with mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+            result: RcloneOutput = asyncio.run(
+                self.rclone.run_command("delete", ["dropbox:Test1.txt"])
+            )
+
+        assert result.return_code == RcloneError.PYTHON_EXCEPTION
+        assert self.mock_processes == []
+
+    def test_timeout(self) -> None:
+        self.rclone.rclone.timeout = 0.5
+        self.rclone.rclone.kill_grace = 0.5
+
+        result: RcloneOutput = asyncio.run(
+            self.rclone._execute(
+                [sys.executable, "-c", "import time\nprint('partial', flush=True)\ntime.sleep(30)\n"]
+            )
+        )
+
+        assert result.return_code == RcloneError.TIMEOUT
+        assert result.output == ["partial"]
+
+    def test_cancel(self) -> None:
+        self.rclone.rclone.kill_grace = 0.2
+        processes: List[asyncio.subprocess.Process] = []
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        # The process ignores SIGTERM, so has to be killed.
+        async def stubborn_process_mock(*command: str, **kwargs: Any) -> asyncio.subprocess.Process:
+            processes.append(
+                await create_subprocess_exec(
+                    sys.executable,
+                    "-c",
+                    "import signal, time\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\ntime.sleep(30)\n",
+                    **kwargs,
+                )
+            )
+            return processes[-1]
+
+        async def cancel_copy() -> None:
+            task: "asyncio.Task[RcloneOutput]" = asyncio.ensure_future(self.rclone.copy("/local", "local:Backup"))
+
+            while not processes:
+                await asyncio.sleep(0.01)
+
+            # Give the process time to ignore SIGTERM.
+            await asyncio.sleep(0.3)
+            task.cancel()
+
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch("asyncio.create_subprocess_exec", stubborn_process_mock):
+            asyncio.run(cancel_copy())
+
+        assert processes[0].returncode is not None
+
+    def test_limits(self) -> None:
+        self.rclone.rclone.retry_policy = RcloneRetryPolicy(transfer_exceeded_delay=3600)
+        cancel_handle: RcloneCancelHandle = RcloneCancelHandle()
+
+        async def process_mock(*command: str, **kwargs: Any) -> asyncRcloneMockProcess:
+            mock_process: asyncRcloneMockProcess = await self.process_mock(*command, **kwargs)
+            mock_process.returncode = RcloneError.TRANSFER_EXCEEDED.value
+            return mock_process
+
+        async def slow_process_mock(*command: str, **kwargs: Any) -> asyncio.subprocess.Process:
+            return await create_subprocess_exec(sys.executable, "-c", "import time\ntime.sleep(30)\n", **kwargs)
+
+        create_subprocess_exec = asyncio.create_subprocess_exec
+        threading.Timer(0.3, cancel_handle.cancel).start()
+        start_time: float = time.monotonic()
+
+        # Cancelling the handle ends the wait for the retry.
+        with self.rclone.rclone.limits(cancel_handle=cancel_handle), mock.patch(
+            "asyncio.create_subprocess_exec", process_mock
+        ):
+            cancelled: RcloneOutput = asyncio.run(self.rclone.copy("/local", "local:Backup"))
+
+        # The deadline stops the running process.
+        with self.rclone.rclone.limits(deadline=0.3), mock.patch("asyncio.create_subprocess_exec", slow_process_mock):
+            timed_out: RcloneOutput = asyncio.run(self.rclone.copy("/local", "local:Backup"))
+            not_ran: RcloneOutput = asyncio.run(self.rclone.copy("/local", "local:Backup"))
+
+        assert len(self.mock_processes) == 1
+        assert cancelled.return_code == RcloneError.CANCELLED
+        assert timed_out.return_code == RcloneError.TIMEOUT
+        assert not_ran.return_code == RcloneError.TIMEOUT
+        assert time.monotonic() - start_time < 10
+
+    def test_live_stats(self) -> None:
+        reported: List[RcloneStats] = []
+        commands: List[List[str]] = []
+        self.rclone.rclone.live_stats_mode = True
+        self.rclone.rclone.stats_callbacks.append(reported.append)
+
+        def popen_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            return rcloneMockProcess(command, b"", STATS_LOG, 0)
+
+        with mock.patch("subprocess.Popen", popen_mock), mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+            result: RcloneOutput = asyncio.run(self.rclone.copy("/local", "dropbox:Backups"))
+
+        assert self.mock_processes == []
+        assert commands[0][-5:] == ["--use-json-log", "--stats", "1s", "--stats-log-level", "NOTICE"]
+        assert [stats.bytes for stats in reported] == [512, 1024]
+        assert result.stats is not None and result.stats.errors == 1
+
+    def test_native_local(self) -> None:
+        self.rclone.rclone.native_local_mode = True
+
+        with tempfile.TemporaryDirectory() as directory:
+            open(os.path.join(directory, "a.txt"), "w").close()
+
+            with mock.patch("asyncio.create_subprocess_exec", self.process_mock):
+                result: RcloneOutput = asyncio.run(self.rclone.lsjson(directory))
+
+        assert self.mock_processes == []
+        assert result.return_code == RcloneError.SUCCESS
+        assert '"Path":"a.txt"' in "".join(result.output).replace(" ", "")
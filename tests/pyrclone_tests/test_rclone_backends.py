@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from typing import List, Optional
+from unittest import mock
+
+from pyrclone import Rclone, RcloneBackendFeatures, RcloneConfig, RcloneError, RcloneFeatureCache, RcloneOutput
+from pyrclone.rclone_backends import BACKEND_FEATURES, common_hash_type
+
+CONFIG: str = """[s3]
+type = s3
+
+[b2]
+type = b2
+
+[dropbox]
+type = dropbox
+
+[secret]
+type = crypt
+remote = s3:bucket/secret
+
+[loop]
+type = alias
+remote = loop:
+"""
+
+PROBE: str = json.dumps(
+    {
+        "Name": "dropbox",
+        "Hashes": ["dropbox", "md5"],
+        "Features": {"ListR": True, "Copy": True, "Move": False},
+    }
+)
+
+
+class rcloneBackendsTest(unittest.TestCase):
+    """
+    Tests for choosing flags based on the backend of each remote.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+        self.rclone.backend_flags_mode = True
+        self.commands: List[List[str]] = []
+
+    def execute_mock(self, command_to_run: List[str]) -> RcloneOutput:
+        self.commands.append(command_to_run)
+        output: List[str] = [PROBE] if command_to_run[1] == "backend" else []
+        return RcloneOutput(RcloneError.SUCCESS, output, [])
+
+    def test_features(self) -> None:
+        assert self.rclone.backend_features("s3:bucket") == BACKEND_FEATURES["s3"]
+        assert self.rclone.backend_features("/home/backup").hash_types == BACKEND_FEATURES["local"].hash_types
+        assert self.rclone.backend_features("unknown:").fast_list
+
+        # Wrappers take the features of what they wrap, without its hashes for crypt.
+        secret: RcloneBackendFeatures = self.rclone.backend_features("secret:")
+        assert secret.fast_list and secret.transfers == 16
+        assert secret.hash_types == []
+
+        assert self.rclone.backend_features("loop:").fast_list
+
+        assert common_hash_type([BACKEND_FEATURES["drive"], BACKEND_FEATURES["s3"]]) == "md5"
+        assert common_hash_type([BACKEND_FEATURES["drive"], BACKEND_FEATURES["b2"]]) == "sha1"
+        assert common_hash_type([BACKEND_FEATURES["dropbox"], BACKEND_FEATURES["s3"]]) is None
+
+    def test_flags(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsjson("s3:bucket")
+            self.rclone.lsjson("dropbox:")
+            self.rclone.sync("s3:bucket", "b2:bucket")
+            self.rclone.copy("/local", "b2:bucket", ["--transfers=4"])
+            self.rclone.command("check", ["/local", "s3:bucket"])
+            self.rclone.copy("/local", "dropbox:")
+
+            self.rclone.backend_flags_mode = False
+            self.rclone.lsjson("dropbox:")
+            self.rclone.sync("s3:bucket", "b2:bucket")
+
+        assert self.commands == [
+            ["rclone", "lsjson", "s3:bucket", "--fast-list"],
+            ["rclone", "lsjson", "dropbox:"],
+            ["rclone", "sync", "s3:bucket", "b2:bucket", "--checkers", "32", "--transfers", "16"],
+            ["rclone", "copy", "/local", "b2:bucket", "--transfers=4", "--checkers", "32"],
+            ["rclone", "check", "/local", "s3:bucket", "--checkers", "32"],
+            ["rclone", "copy", "/local", "dropbox:"],
+            ["rclone", "lsjson", "dropbox:", "--fast-list"],
+            ["rclone", "sync", "s3:bucket", "b2:bucket"],
+        ]
+
+    def test_probe_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache_path: str = os.path.join(cache_directory, "rclone", "features.json")
+            self.rclone.feature_cache = RcloneFeatureCache(cache_path)
+
+            with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+                features: Optional[RcloneBackendFeatures] = self.rclone.probe_features("dropbox:Photos")
+
+            assert self.commands == [["rclone", "backend", "features", "dropbox:"]]
+            assert features == RcloneBackendFeatures(True, True, False, ["dropbox", "md5"])
+
+            # A new instance reads the probe back from disk.
+            rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+            rclone.feature_cache = RcloneFeatureCache(cache_path)
+            assert rclone.backend_features("dropbox:") == features
+
+            # But not if the remote has changed type.
+            rclone = Rclone(RcloneConfig("[dropbox]\ntype = drive\n"))
+            rclone.feature_cache = RcloneFeatureCache(cache_path)
+            assert rclone.backend_features("dropbox:") == BACKEND_FEATURES["drive"]
+
+        assert self.rclone.probe_features("unknown:") is None
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import threading
+import time
+import unittest
+from typing import Dict, Iterable, List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneBatchResult,
+    RcloneCommandSpec,
+    RcloneConfig,
+    RcloneError,
+    RcloneExecutor,
+    RcloneOutput,
+)
+
+
+class rcloneBatchTest(unittest.TestCase):
+    """
+    Tests for running batches of rclone commands.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(
+            RcloneConfig("[dropbox]\ntype = dropbox\n[drive]\ntype = drive\n")
+        )
+
+        self.lock: threading.Lock = threading.Lock()
+        self.running: Dict[str, int] = {"total": 0, "dropbox": 0, "drive": 0}
+        self.peak: Dict[str, int] = {"total": 0, "dropbox": 0, "drive": 0}
+
+    def command_mock(self, command: str, arguments: Iterable[str] = tuple()) -> RcloneOutput:
+        remotes: List[str] = ["total"] + [
+            argument.split(":")[0] for argument in arguments if ":" in argument
+        ]
+
+        with self.lock:
+            for remote in remotes:
+                self.running[remote] += 1
+                self.peak[remote] = max(self.peak[remote], self.running[remote])
+
+        time.sleep(0.02)
+
+        with self.lock:
+            for remote in remotes:
+                self.running[remote] -= 1
+
+        return_code: RcloneError = (
+            RcloneError.FILE_NOT_FOUND if "missing" in list(arguments)[0] else RcloneError.SUCCESS
+        )
+        return RcloneOutput(return_code, [list(arguments)[0]], [])
+
+    def test_remote_of(self) -> None:
+        assert self.rclone.remote_of("dropbox:Photos") == "dropbox"
+        assert self.rclone.remote_of("drive:") == "drive"
+        assert self.rclone.remote_of("unknown:Photos") is None
+        assert self.rclone.remote_of("/home/user/Photos") is None
+
+    def test_run_many(self) -> None:
+        specs: List[RcloneCommandSpec] = [
+            RcloneCommandSpec("copy", [f"dropbox:{i}", f"/tmp/{i}"]) for i in range(6)
+        ] + [RcloneCommandSpec("copy", [f"drive:{i}", f"/tmp/{i}"]) for i in range(6)]
+        specs[3] = RcloneCommandSpec("copy", ["dropbox:missing", "/tmp/missing"])
+
+        with mock.patch.object(self.rclone, "command", self.command_mock):
+            result: RcloneBatchResult = self.rclone.run_many(
+                specs, max_workers=4, remote_limits={"dropbox:": 1}
+            )
+
+        assert [output.output[0] for output in result.outputs] == [
+            spec.arguments[0] for spec in specs
+        ]
+        assert result.failures == 1
+        assert result.wall_time > 0
+        assert self.peak["total"] <= 4
+        assert self.peak["dropbox"] == 1
+        assert self.peak["drive"] > 1
+
+    def test_as_completed(self) -> None:
+        specs: List[RcloneCommandSpec] = [
+            RcloneCommandSpec("mkdir", [f"drive:{i}"]) for i in range(5)
+        ]
+
+        with mock.patch.object(self.rclone, "command", self.command_mock):
+            indexes: List[int] = sorted(
+                index for index, _ in RcloneExecutor(self.rclone, 2).as_completed(specs)
+            )
+
+        assert indexes == list(range(5))
+        assert self.peak["total"] == 2
+
+    def test_as_completed_large_batch(self) -> None:
+        specs: List[RcloneCommandSpec] = [
+            RcloneCommandSpec("mkdir", [f"{'dropbox' if i % 10 == 0 else 'drive'}:{i}"])
+            for i in range(2000)
+        ]
+
+        def command_mock(command: str, arguments: Iterable[str] = tuple()) -> RcloneOutput:
+            remote: str = list(arguments)[0].split(":")[0]
+
+            with self.lock:
+                self.running[remote] += 1
+                self.peak[remote] = max(self.peak[remote], self.running[remote])
+
+            time.sleep(0)
+
+            with self.lock:
+                self.running[remote] -= 1
+
+            return RcloneOutput(RcloneError.SUCCESS, [list(arguments)[0]], [])
+
+        start_time: float = time.monotonic()
+
+        with mock.patch.object(self.rclone, "command", command_mock):
+            indexes: List[int] = sorted(
+                index
+                for index, _ in RcloneExecutor(self.rclone, 8, {"dropbox:": 1}).as_completed(specs)
+            )
+
+        assert indexes == list(range(2000))
+        assert self.peak["dropbox"] == 1
+        assert time.monotonic() - start_time < 10
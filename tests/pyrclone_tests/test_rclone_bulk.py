@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneBulkResult, RcloneConfig, RcloneError, RcloneOutput
+from pyrclone.rclone_bulk import escape_glob
+
+
+def json_log(level: str, message: str, path: str) -> str:
+    return json.dumps({"level": level, "msg": message, "object": path, "source": "x.go:1"})
+
+
+class rcloneBulkTest(unittest.TestCase):
+    """
+    Tests for the bulk file operations.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+        self.commands: List[List[str]] = []
+        self.file_lists: List[List[str]] = []
+
+    def execute_mock(self, command_to_run: List[str]) -> RcloneOutput:
+        self.commands.append(command_to_run)
+
+        list_flag: str = "--include-from" if "--include-from" in command_to_run else "--files-from-raw"
+        with open(command_to_run[command_to_run.index(list_flag) + 1]) as list_file:
+            paths: List[str] = list_file.read().splitlines()
+        self.file_lists.append(paths)
+
+        log: List[str] = ["not json", json.dumps({"level": "info", "msg": "There was nothing to transfer"})]
+        return_code: RcloneError = RcloneError.SUCCESS
+        for path in paths:
+            if "bad" in path:
+                log.append(json_log("error", "Failed to delete: permission denied", path))
+                return_code = RcloneError.UNCATEGORISED
+            else:
+                log.append(json_log("info", "Deleted", path))
+
+        return RcloneOutput(return_code, [], log)
+
+    def test_delete_many(self) -> None:
+        paths: List[str] = [f"file{i}.txt" for i in range(5)] + ["bad.txt"]
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            result: RcloneBulkResult = self.rclone.delete_many("dropbox:Backups", paths, chunk_size=4)
+
+        assert len(self.commands) == 2
+        assert self.commands[0][:4] == ["rclone", "delete", "dropbox:Backups", "--files-from-raw"]
+        assert self.commands[0][5:] == ["--use-json-log", "-v"]
+        assert self.file_lists == [paths[:4], paths[4:]]
+        assert result.succeeded == paths[:5]
+        assert result.failed == {"bad.txt": "Failed to delete: permission denied"}
+        assert result.return_code == RcloneError.UNCATEGORISED
+
+    def test_delete_many_directories(self) -> None:
+        self.rclone.dry_run_mode = True
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.delete_many("dropbox:Backups", ["2019-01-01/", "[old]"], directories=True)
+
+        assert self.commands[0][:5] == [
+            "rclone",
+            "delete",
+            "--dry-run",
+            "dropbox:Backups",
+            "--include-from",
+        ]
+        assert "--rmdirs" in self.commands[0]
+        assert self.file_lists == [["/2019-01-01/**", "/\\[old\\]/**"]]
+
+    def test_copy_and_move_many(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.copy_many("/local", "dropbox:Backups", ["a.txt", "b.txt"])
+            self.rclone.move_many("/local", "dropbox:Backups", ["c.txt"], ["--checksum"])
+
+        assert self.commands[0][:5] == ["rclone", "copy", "/local", "dropbox:Backups", "--files-from-raw"]
+        assert self.commands[1][:5] == ["rclone", "move", "/local", "dropbox:Backups", "--files-from-raw"]
+        assert self.commands[1][-1] == "--checksum"
+        assert self.file_lists == [["a.txt", "b.txt"], ["c.txt"]]
+
+    def test_escape_glob(self) -> None:
+        assert escape_glob("a*b?[c]{d}") == "a\\*b\\?\\[c\\]\\{d\\}"
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneBytesOutput,
+    RcloneCommandSpec,
+    RcloneConfig,
+    RcloneError,
+    RcloneListingCache,
+    RcloneOutput,
+)
+from pyrclone.rclone_cache import normalise_flags, paths_overlap
+
+from .test_rclone import STRING_OUTPUT
+
+
+class rcloneCacheTest(unittest.TestCase):
+    """
+    Tests for the listing cache.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(
+            RcloneConfig(
+                "[dropbox]\ntype = dropbox\n"
+                "[music]\ntype = alias\nremote = dropbox:Music\n"
+            )
+        )
+        self.rclone.listing_cache = RcloneListingCache(max_entries=2, ttl=None)
+
+        self.commands: List[List[str]] = []
+
+    def execute_mock(self, command_to_run: List[str]) -> RcloneOutput:
+        self.commands.append(command_to_run)
+        return RcloneOutput(RcloneError.SUCCESS, list(STRING_OUTPUT), [])
+
+    def test_repeated_listing(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            first: RcloneOutput = self.rclone.lsd("dropbox:Photos")
+            second: RcloneOutput = self.rclone.lsd("dropbox:Photos/")
+            full: RcloneOutput = self.rclone.ls("dropbox:Photos")
+
+        assert len(self.commands) == 2
+        assert first.output == second.output
+        assert len(full.output) == len(STRING_OUTPUT)
+        assert self.rclone.listing_cache is not None
+        assert self.rclone.listing_cache.hits == 1
+        assert self.rclone.listing_cache.misses == 2
+
+    def test_invalidation(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsd("dropbox:Photos")
+            self.rclone.deletefile("dropbox:Photos/2019/a.jpg")
+            self.rclone.lsd("dropbox:Photos")
+
+            self.rclone.lsd("dropbox:Music")
+            self.rclone.copy("/home/user/Music", "dropbox:Videos")
+            self.rclone.lsd("dropbox:Music")
+
+        assert [command[1] for command in self.commands] == [
+            "lsjson",
+            "deletefile",
+            "lsjson",
+            "lsjson",
+            "copy",
+        ]
+
+    def test_command_invalidation(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsd("dropbox:Music")
+            self.rclone.command("copy", ["/home/user/Music", "dropbox:Music", "--dry-run"])
+            self.rclone.lsd("dropbox:Music")
+            self.rclone.command("copy", ["/home/user/Music", "dropbox:Music"])
+            self.rclone.lsd("dropbox:Music")
+            self.rclone.run_many(
+                [RcloneCommandSpec("moveto", ["dropbox:Music/a.mp3", "dropbox:Music/b.mp3"])]
+            )
+            self.rclone.lsd("dropbox:Music")
+
+        assert [command[1] for command in self.commands] == [
+            "lsjson",
+            "copy",
+            "copy",
+            "lsjson",
+            "moveto",
+            "lsjson",
+        ]
+
+    def test_alias_invalidation(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsd("music:")
+            self.rclone.deletefile("dropbox:Music/a.mp3")
+            self.rclone.lsd("music:")
+
+            self.rclone.lsd("dropbox:Music/2019")
+            self.rclone.deletefile("music:2019/a.mp3")
+            self.rclone.lsd("dropbox:Music/2019")
+
+            self.rclone.lsd("dropbox:Photos")
+            self.rclone.deletefile("music:2019/b.mp3")
+            self.rclone.lsd("dropbox:Photos")
+
+        assert [command[1] for command in self.commands] == [
+            "lsjson",
+            "deletefile",
+            "lsjson",
+            "lsjson",
+            "deletefile",
+            "lsjson",
+            "lsjson",
+            "deletefile",
+        ]
+
+    def test_late_put(self) -> None:
+        cache: RcloneListingCache = RcloneListingCache()
+        generation: int = cache.generation
+
+        cache.invalidate("dropbox:Photos/a.jpg")
+        cache.put("dropbox:Photos", [], RcloneOutput(RcloneError.SUCCESS, ["["], []), generation)
+        assert cache.get("dropbox:Photos") is None
+
+        cache.put(
+            "dropbox:Photos", [], RcloneOutput(RcloneError.SUCCESS, ["["], []), cache.generation
+        )
+        assert cache.get("dropbox:Photos") is not None
+
+    def test_bytes_output(self) -> None:
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            self.commands.append(command_to_run)
+
+            if self.rclone.bytes_output_mode:
+                return RcloneBytesOutput(RcloneError.SUCCESS, b"[\n]\n", b"")
+
+            return RcloneOutput(RcloneError.SUCCESS, ["[", "]"], [])
+
+        with mock.patch.object(self.rclone, "_execute", execute_mock):
+            self.rclone.lsjson("dropbox:Photos")
+            self.rclone.bytes_output_mode = True
+            first: RcloneOutput = self.rclone.lsjson("dropbox:Photos")
+            second: RcloneOutput = self.rclone.lsjson("dropbox:Photos")
+
+        assert len(self.commands) == 2
+        assert isinstance(first, RcloneBytesOutput)
+        assert isinstance(second, RcloneBytesOutput)
+        assert second.raw_output == b"[\n]\n"
+
+    def test_lru_eviction(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            for path in ["dropbox:A", "dropbox:B", "dropbox:A", "dropbox:C", "dropbox:B"]:
+                self.rclone.lsjson(path)
+
+        assert self.rclone.listing_cache is not None
+        assert len(self.rclone.listing_cache) == 2
+        assert [command[2] for command in self.commands] == [
+            "dropbox:A",
+            "dropbox:B",
+            "dropbox:C",
+            "dropbox:B",
+        ]
+
+    def test_ttl(self) -> None:
+        cache: RcloneListingCache = RcloneListingCache(ttl=10)
+        cache.put("dropbox:", [], RcloneOutput(RcloneError.SUCCESS, ["["], []))
+
+        with mock.patch("time.monotonic", return_value=1e9):
+            assert cache.get("dropbox:") is None
+
+    def test_normalise_flags(self) -> None:
+        assert normalise_flags(["--max-depth", "2", "-R", "--fast-list"]) == normalise_flags(
+            ["-R", "--max-depth", "2"]
+        )
+        assert normalise_flags(["--include", "a", "--exclude", "b"]) != normalise_flags(
+            ["--exclude", "b", "--include", "a"]
+        )
+
+    def test_paths_overlap(self) -> None:
+        assert paths_overlap("dropbox:", "dropbox:Photos")
+        assert paths_overlap("dropbox:Photos/2019", "dropbox:Photos")
+        assert not paths_overlap("dropbox:Photos", "dropbox:Photos2")
+        assert not paths_overlap("dropbox:Photos", "drive:Photos")
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneBatchResult,
+    RcloneCancelHandle,
+    RcloneCommandSpec,
+    RcloneConfig,
+    RcloneDeadline,
+    RcloneError,
+    RcloneLimits,
+    RcloneOutput,
+    RcloneRetryPolicy,
+)
+
+# Prints a line, then hangs, optionally ignoring SIGTERM.
+HANGING_SCRIPT: str = "import time\nprint('partial', flush=True)\ntime.sleep(30)\n"
+STUBBORN_SCRIPT: str = "import signal\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\n" + HANGING_SCRIPT
+
+
+class rcloneCancelTest(unittest.TestCase):
+    """
+    Tests for timeouts, deadlines and cancelling running commands.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.rclone.kill_grace = 0.5
+
+    def test_timeout(self) -> None:
+        self.rclone.timeout = 0.5
+        start_time: float = time.monotonic()
+
+        output: RcloneOutput = self.rclone._execute([sys.executable, "-c", HANGING_SCRIPT])
+
+        assert output.return_code == RcloneError.TIMEOUT
+        assert output.output == ["partial"]
+        assert time.monotonic() - start_time < 10
+
+    def test_kill_after_grace(self) -> None:
+        start_time: float = time.monotonic()
+
+        with self.rclone.limits(timeout=0.5):
+            output: RcloneOutput = self.rclone._execute([sys.executable, "-c", STUBBORN_SCRIPT])
+
+        assert output.return_code == RcloneError.TIMEOUT
+        assert output.output == ["partial"]
+        assert time.monotonic() - start_time < 10
+
+    def test_cancel(self) -> None:
+        handle: RcloneCancelHandle = RcloneCancelHandle()
+        threading.Timer(0.5, handle.cancel).start()
+
+        with self.rclone.limits(cancel_handle=handle):
+            output: RcloneOutput = self.rclone._execute([sys.executable, "-c", HANGING_SCRIPT])
+
+            # Later commands under the handle don't run at all.
+            with mock.patch.object(self.rclone, "_execute") as execute_mock:
+                assert self.rclone.lsjson("dropbox:").return_code == RcloneError.CANCELLED
+            execute_mock.assert_not_called()
+
+        assert handle.cancelled
+        assert output.return_code == RcloneError.CANCELLED
+        assert output.output == ["partial"]
+
+    def test_cancel_retry_delay(self) -> None:
+        handle: RcloneCancelHandle = RcloneCancelHandle()
+        self.rclone.retry_policy = RcloneRetryPolicy(transfer_exceeded_delay=3600)
+        threading.Timer(0.5, handle.cancel).start()
+        start_time: float = time.monotonic()
+
+        with mock.patch.object(
+            self.rclone, "_execute", return_value=RcloneOutput(RcloneError.TRANSFER_EXCEEDED, [], [])
+        ) as execute_mock:
+            with self.rclone.limits(cancel_handle=handle):
+                output: RcloneOutput = self.rclone.lsjson("dropbox:")
+
+        # Cancelling ends the wait for the retry, rather than the hour long
+        # backoff running out.
+        execute_mock.assert_called_once()
+        assert output.return_code == RcloneError.CANCELLED
+        assert time.monotonic() - start_time < 10
+
+    def test_limits(self) -> None:
+        self.rclone.timeout = 60
+        handle: RcloneCancelHandle = RcloneCancelHandle()
+
+        assert self.rclone.current_limits() == RcloneLimits(60)
+
+        with self.rclone.limits(deadline=100, cancel_handle=handle) as outer:
+            with self.rclone.limits(timeout=10, deadline=RcloneDeadline(1000)) as inner:
+                assert inner.timeout == 10
+                assert inner.deadline is outer.deadline
+                assert inner.cancel_handle is handle
+                assert self.rclone.current_limits() == inner
+
+            assert self.rclone.current_limits() == outer
+            assert outer.time_left() == 60
+
+        assert self.rclone.current_limits() == RcloneLimits(60)
+
+    def test_deadline(self) -> None:
+        commands: List[List[str]] = []
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            commands.append(command_to_run)
+            assert self.rclone.current_limits().deadline is not None
+            return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+        with mock.patch.object(self.rclone, "_execute", execute_mock):
+            with self.rclone.limits(deadline=60):
+                batch: RcloneBatchResult = self.rclone.run_many(
+                    [RcloneCommandSpec("lsjson", ["dropbox:"]), RcloneCommandSpec("lsjson", ["dropbox:a"])]
+                )
+
+            with self.rclone.limits(deadline=0):
+                expired: RcloneOutput = self.rclone.lsjson("dropbox:")
+
+        assert batch.failures == 0
+        assert len(commands) == 2
+        assert expired.return_code == RcloneError.TIMEOUT
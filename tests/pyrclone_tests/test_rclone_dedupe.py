@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneBulkResult, RcloneConfig, RcloneDuplicateGroup, RcloneError, RcloneHashIndex, RcloneOutput
+
+from .test_rclone import rcloneMockProcess
+
+LISTINGS: Dict[str, List[Dict[str, object]]] = {
+    "dropbox:": [
+        {"Path": "Photos", "Size": -1, "IsDir": True},
+        {"Path": "Photos/a.jpg", "Size": 100, "IsDir": False, "Hashes": {"md5": "aa" * 16}},
+        {"Path": "Photos/b.jpg", "Size": 200, "IsDir": False, "Hashes": {"md5": "bb" * 16}},
+        {"Path": "Photos/c.jpg", "Size": 300, "IsDir": False, "Hashes": {"md5": "cc" * 16}},
+        {"Path": "no-hash.txt", "Size": 5, "IsDir": False},
+    ],
+    "drive:": [
+        {"Path": "Backup/a.jpg", "Size": 100, "IsDir": False, "Hashes": {"md5": "AA" * 16}},
+        {"Path": "Backup/a copy.jpg", "Size": 100, "IsDir": False, "Hashes": {"md5": "aa" * 16}},
+        {"Path": "Backup/c.jpg", "Size": 300, "IsDir": False, "Hashes": {"md5": "cc" * 16}},
+        {"Path": "Backup/ü.jpg", "Size": 400, "IsDir": False, "Hashes": {"md5": "dd" * 16}},
+    ],
+}
+
+CONFIG: str = "[dropbox]\ntype = dropbox\n\n[drive]\ntype = drive\n"
+
+
+class rcloneDedupeTest(unittest.TestCase):
+    """
+    Tests for the cross remote duplicate index.
+    """
+
+    def setUp(self) -> None:
+        self.index: RcloneHashIndex = RcloneHashIndex()
+
+        for remote, listing in LISTINGS.items():
+            self.index.add_listing(remote, listing)
+
+    def test_index(self) -> None:
+        assert len(self.index) == 7
+        assert self.index.unhashed == 1
+        assert self.index.remotes == ["dropbox:", "drive:"]
+        assert self.index.locations("dd" * 16) == [("drive:", "Backup/ü.jpg")]
+        assert self.index.locations("ee" * 16) == []
+
+        groups: List[RcloneDuplicateGroup] = list(self.index.duplicates())
+        assert [(group.hash, group.size, group.reclaimable) for group in groups] == [
+            ("aa" * 16, 100, 200),
+            ("cc" * 16, 300, 300),
+        ]
+        assert groups[0].locations == [
+            ("dropbox:", "Photos/a.jpg"),
+            ("drive:", "Backup/a.jpg"),
+            ("drive:", "Backup/a copy.jpg"),
+        ]
+
+        assert self.index.reclaimable_bytes() == 500
+        assert self.index.reclaimable_bytes(min_size=200) == 300
+        assert [group.hash for group in self.index.duplicates(min_size=200)] == ["cc" * 16]
+
+    def test_removal_set(self) -> None:
+        assert self.index.removal_set() == {"drive:": ["Backup/a.jpg", "Backup/a copy.jpg", "Backup/c.jpg"]}
+
+        def keep_last(group: RcloneDuplicateGroup) -> int:
+            return len(group.locations) - 1
+
+        assert self.index.removal_set(keep_last) == {
+            "dropbox:": ["Photos/a.jpg", "Photos/c.jpg"],
+            "drive:": ["Backup/a.jpg"],
+        }
+
+    def test_hash_index(self) -> None:
+        commands: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            listing: List[Dict[str, object]] = LISTINGS[command[2]]
+            output: str = "[\n" + ",\n".join(json.dumps(entry) for entry in listing) + "\n]\n"
+            return rcloneMockProcess(command, output.encode("utf-8"), b"", 0)
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            commands.append(command_to_run)
+            return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+        rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+
+        with mock.patch("subprocess.Popen", process_mock), mock.patch.object(rclone, "_execute", execute_mock):
+            index: RcloneHashIndex = rclone.hash_index()
+            results: Dict[str, RcloneBulkResult] = index.remove_duplicates(rclone, dry_run=True)
+
+        assert commands[0] == [
+            "rclone",
+            "lsjson",
+            "dropbox:",
+            "-R",
+            "--hash",
+            "--hash-type",
+            "md5",
+            "--files-only",
+            "--fast-list",
+        ]
+        assert commands[1][2] == "drive:"
+        assert commands[2][:4] == ["rclone", "delete", "drive:", "--files-from-raw"]
+        assert "--dry-run" in commands[2]
+        assert len(commands) == 3
+        assert index.return_codes == {"dropbox:": RcloneError.SUCCESS, "drive:": RcloneError.SUCCESS}
+        assert list(results) == ["drive:"]
+
+    def test_failed_listing(self) -> None:
+        self.index.return_codes = {"dropbox:": RcloneError.SUCCESS, "drive:": RcloneError.RETRY_ERROR}
+        rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+
+        with mock.patch.object(rclone, "_execute") as execute_mock, self.assertLogs(rclone.logger, "WARNING"):
+            assert self.index.remove_duplicates(rclone) == {}
+
+        execute_mock.assert_not_called()
+
+    def test_alias_remote(self) -> None:
+        commands: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            output: str = "[\n" + ",\n".join(json.dumps(entry) for entry in LISTINGS[command[2]]) + "\n]\n"
+            return rcloneMockProcess(command, output.encode("utf-8"), b"", 0)
+
+        rclone: Rclone = Rclone(
+            RcloneConfig(
+                CONFIG
+                + "\n[backup]\ntype = alias\nremote = drive:Backup\n"
+                + "\n[secret]\ntype = crypt\nremote = backup:Secret\n"
+                + "\n[both]\ntype = union\nupstreams = dropbox: drive:\n"
+            )
+        )
+
+        assert rclone.underlying_path("backup:a.jpg") == "drive:Backup/a.jpg"
+        assert rclone.underlying_path("secret:a.jpg") == "drive:Backup/Secret"
+        assert rclone.underlying_path("both:a.jpg") is None
+
+        # The alias, crypt and union are all stored on the other remotes, so
+        # aren't indexed by default.
+        with mock.patch("subprocess.Popen", process_mock):
+            index: RcloneHashIndex = rclone.hash_index()
+
+        assert [command[2] for command in commands] == ["dropbox:", "drive:"]
+        assert index.remotes == ["dropbox:", "drive:"]
+
+        for remotes in [["drive:", "backup:"], ["drive:Backup", "drive:Backup/Old"], ["dropbox:", "both:"]]:
+            with mock.patch("subprocess.Popen", process_mock), self.assertRaises(ValueError):
+                rclone.hash_index(remotes)
+
+        assert len(commands) == 2
+
+        # The alias would be deleted through, as if it were a copy of itself.
+        self.index.add("backup:", {"Path": "a.jpg", "Size": 100, "IsDir": False, "Hashes": {"md5": "aa" * 16}})
+
+        with mock.patch.object(rclone, "_execute") as execute_mock, self.assertRaises(ValueError):
+            self.index.remove_duplicates(rclone)
+
+        execute_mock.assert_not_called()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import unittest
+from typing import Iterable, List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneDiff, RcloneError, RcloneOutput, diff_listings
+from pyrclone.rclone_stream import LsjsonEntry
+
+from .test_rclone_index import NEW_LISTING, OLD_LISTING
+
+
+class rcloneDiffTest(unittest.TestCase):
+    """
+    Tests for comparing listings.
+    """
+
+    def test_diff(self) -> None:
+        diff: RcloneDiff = diff_listings(OLD_LISTING, NEW_LISTING)
+
+        assert diff.added == ["Folder/d.txt"]
+        assert diff.removed == ["b.txt"]
+        assert diff.modified == ["Folder/c.txt"]
+        assert diff.unchanged == ["a.txt"]
+        assert diff.transfer_paths() == ["Folder/d.txt", "Folder/c.txt"]
+
+    def test_mod_time_and_hash(self) -> None:
+        old: List[LsjsonEntry] = [
+            {"Path": "a", "Size": 1, "ModTime": "2019-01-01T00:00:00Z", "Hashes": {"md5": "x"}},
+            {"Path": "b", "Size": 1, "ModTime": "2019-01-01T00:00:00Z", "Hashes": {"md5": "x"}},
+            {"Path": "c", "Size": 1, "ModTime": "2019-01-01T00:00:00Z"},
+        ]
+        new: List[LsjsonEntry] = [
+            {"Path": "a", "Size": 1, "ModTime": "2019-01-02T00:00:00Z", "Hashes": {"md5": "x"}},
+            {"Path": "b", "Size": 1, "ModTime": "2019-01-01T00:00:00Z", "Hashes": {"md5": "y"}},
+            {"Path": "c", "Size": 1, "ModTime": "2019-01-01T00:00:00.5Z"},
+        ]
+
+        diff: RcloneDiff = diff_listings(old, new, modify_window=1)
+        assert diff.modified == ["b"]
+        assert diff.unchanged == ["a", "c"]
+
+        diff = diff_listings(old, new, compare_hash=False)
+        assert diff.modified == ["a", "c"]
+
+    def test_apply(self) -> None:
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        commands: List[List[str]] = []
+        file_lists: List[str] = []
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            commands.append(command_to_run)
+            with open(command_to_run[command_to_run.index("--files-from-raw") + 1]) as list_file:
+                file_lists.append(list_file.read())
+            return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+        with mock.patch.object(rclone, "_execute", execute_mock):
+            outputs: List[RcloneOutput] = diff_listings(OLD_LISTING, NEW_LISTING).apply(
+                rclone, "/backup", "dropbox:backup"
+            )
+
+        assert len(outputs) == 2
+        assert [command[:4] for command in commands] == [
+            ["rclone", "copy", "/backup", "dropbox:backup"],
+            ["rclone", "delete", "dropbox:backup", "--files-from-raw"],
+        ]
+        assert file_lists == ["Folder/d.txt\nFolder/c.txt\n", "b.txt\n"]
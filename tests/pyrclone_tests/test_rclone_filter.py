@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import unittest
+from datetime import timedelta
+from typing import List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneListingFilter, RcloneOutput
+
+
+class rcloneFilterTest(unittest.TestCase):
+    """
+    Tests for pushing listing filters down to rclone.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.commands: List[List[str]] = []
+
+    def execute_mock(self, command: List[str]) -> RcloneOutput:
+        self.commands.append(command)
+        return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+    def test_to_flags(self) -> None:
+        listing_filter: RcloneListingFilter = RcloneListingFilter(
+            files_only=True,
+            min_size=1024,
+            max_size=1048576,
+            min_age=timedelta(minutes=90),
+            max_age=timedelta(days=7, milliseconds=500),
+            include=["*.jpg", "*.png"],
+            exclude=["/Trash/**"],
+            max_depth=2,
+        )
+
+        assert listing_filter.to_flags() == [
+            "--files-only",
+            "--min-size",
+            "1024B",
+            "--max-size",
+            "1048576B",
+            "--min-age",
+            "5400s",
+            "--max-age",
+            "604800.5s",
+            "--include",
+            "*.jpg",
+            "--include",
+            "*.png",
+            "--exclude",
+            "/Trash/**",
+            "--max-depth",
+            "2",
+        ]
+        assert RcloneListingFilter().to_flags() == []
+
+    def test_listing_commands(self) -> None:
+        listing_filter: RcloneListingFilter = RcloneListingFilter(
+            min_size=10, max_depth=1
+        )
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsjson("dropbox:", listing_filter=listing_filter)
+            self.rclone.lsd("dropbox:", ["--no-modtime"], listing_filter)
+            self.rclone.lsl("dropbox:", listing_filter=listing_filter)
+            self.rclone.json_by_default = False
+            self.rclone.lsl("dropbox:", listing_filter=listing_filter)
+
+        assert self.commands == [
+            ["rclone", "lsjson", "dropbox:", "--min-size", "10B", "--max-depth", "1", "--fast-list"],
+            ["rclone", "lsjson", "dropbox:", "--no-modtime", "--dirs-only", "--min-size", "10B", "--max-depth", "1", "--fast-list"],
+            ["rclone", "lsjson", "dropbox:", "-R", "--files-only", "--min-size", "10B", "--max-depth", "1", "--fast-list"],
+            ["rclone", "lsl", "dropbox:", "--min-size", "10B", "--max-depth", "1"],
+        ]
+
+        # The given filter isn't changed by lsd and lsl.
+        assert not listing_filter.dirs_only
+        assert not listing_filter.files_only
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import unittest
+from typing import List, Tuple
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneConfig,
+    RcloneListingIndex,
+    RcloneSnapshot,
+)
+from pyrclone.rclone_listing import parse_mod_time
+from pyrclone.rclone_stream import LsjsonEntry
+
+from .test_rclone import BYTE_OUTPUT, rcloneMockProcess
+
+OLD_LISTING: List[LsjsonEntry] = [
+    {"Path": "a.txt", "Name": "a.txt", "Size": 1, "ModTime": "2019-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "b.txt", "Name": "b.txt", "Size": 2, "ModTime": "2019-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "Folder", "Name": "Folder", "Size": -1, "ModTime": "2019-01-01T00:00:00Z", "IsDir": True},
+    {"Path": "Folder/c.txt", "Name": "c.txt", "Size": 3, "ModTime": "2019-06-01T00:00:00Z", "IsDir": False},
+]
+
+NEW_LISTING: List[LsjsonEntry] = [
+    {"Path": "a.txt", "Name": "a.txt", "Size": 1, "ModTime": "2019-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "Folder", "Name": "Folder", "Size": -1, "ModTime": "2019-01-01T00:00:00Z", "IsDir": True},
+    {"Path": "Folder/c.txt", "Name": "c.txt", "Size": 30, "ModTime": "2019-07-01T00:00:00Z", "IsDir": False},
+    {"Path": "Folder/d.txt", "Name": "d.txt", "Size": 4, "ModTime": "2019-07-01T00:00:00Z", "IsDir": False, "Hashes": {"md5": "abc"}},
+]
+
+
+class rcloneIndexTest(unittest.TestCase):
+    """
+    Tests for the SQLite listing index.
+    """
+
+    def setUp(self) -> None:
+        self.index: RcloneListingIndex = RcloneListingIndex()
+
+    def tearDown(self) -> None:
+        self.index.close()
+
+    def test_parse_mod_time(self) -> None:
+        assert parse_mod_time("1970-01-01T00:00:00Z") == 0
+        assert parse_mod_time("1970-01-01T01:00:00+01:00") == 0
+        assert parse_mod_time("2019-01-13T17:55:33.8053678Z") == 1547402133.8053678
+
+    def test_snapshots(self) -> None:
+        old: RcloneSnapshot = self.index.add_snapshot("dropbox:", OLD_LISTING, batch_size=3)
+        new: RcloneSnapshot = self.index.add_snapshot("dropbox:", NEW_LISTING)
+        self.index.add_snapshot("drive:", NEW_LISTING, complete=False)
+
+        assert [snapshot.snapshot_id for snapshot in self.index.snapshots("dropbox:")] == [
+            old.snapshot_id,
+            new.snapshot_id,
+        ]
+        assert self.index.latest_snapshot("dropbox:") == new
+        assert self.index.latest_snapshot("drive:") is None
+
+        assert self.index.summary(old.snapshot_id) == (3, 6)
+        assert list(self.index.entries(new.snapshot_id)) == sorted(
+            NEW_LISTING, key=lambda entry: str(entry["Path"])
+        )
+
+        self.index.delete_snapshot(old.snapshot_id)
+        assert self.index.summary(old.snapshot_id) == (0, 0)
+
+    def test_queries(self) -> None:
+        snapshot: RcloneSnapshot = self.index.add_snapshot("dropbox:", NEW_LISTING)
+
+        def paths(**query: object) -> List[str]:
+            return [
+                str(entry["Path"])
+                for entry in self.index.entries(snapshot.snapshot_id, **query)  # type: ignore
+            ]
+
+        assert paths(prefix="Folder") == ["Folder/c.txt", "Folder/d.txt"]
+        assert paths(dirs_only=True) == ["Folder"]
+        assert paths(files_only=True, min_size=4) == ["Folder/c.txt", "Folder/d.txt"]
+        assert paths(files_only=True, max_size=3) == ["a.txt"]
+        assert paths(modified_before=parse_mod_time("2019-06-01T00:00:00Z")) == [
+            "Folder",
+            "a.txt",
+        ]
+
+    def test_changes(self) -> None:
+        old: RcloneSnapshot = self.index.add_snapshot("dropbox:", OLD_LISTING)
+        new: RcloneSnapshot = self.index.add_snapshot("dropbox:", NEW_LISTING)
+
+        changes: List[Tuple[str, str]] = sorted(
+            self.index.changes(old.snapshot_id, new.snapshot_id)
+        )
+
+        assert changes == [
+            ("added", "Folder/d.txt"),
+            ("modified", "Folder/c.txt"),
+            ("removed", "b.txt"),
+        ]
+
+    def test_ingest(self) -> None:
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        commands: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            return rcloneMockProcess(command, b"".join(BYTE_OUTPUT), b"", 0)
+
+        with mock.patch("subprocess.Popen", process_mock):
+            snapshot: RcloneSnapshot = self.index.ingest(rclone, "dropbox:", batch_size=2)
+
+        assert commands == [["rclone", "lsjson", "dropbox:", "-R", "--fast-list"]]
+        assert snapshot.complete
+        assert self.index.summary(snapshot.snapshot_id) == (3, 0)
+        assert [entry["Path"] for entry in self.index.entries(snapshot.snapshot_id)] == [
+            "Test1.txt",
+            "TestFolder",
+            "TestFolder/Test2.txt",
+            "TestFolder2",
+            "TestFolder2/Test3.txt",
+        ]
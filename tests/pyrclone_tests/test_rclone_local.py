@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneListingFilter, RcloneOutput
+from pyrclone.rclone_listing import parse_mod_time
+from pyrclone.rclone_local import parse_duration, parse_local_flags, parse_size
+
+CONFIG: str = "[local]\ntype = local\nnounc = true\n\n[links]\ntype = local\ncopy_links = true\n\n[dropbox]\ntype = dropbox\n"
+
+# The mtime given to every entry, with nanoseconds.
+MTIME_NS: int = 1_547_401_260_123_400_000
+
+
+class rcloneLocalTest(unittest.TestCase):
+    """
+    Tests for listing local paths in process.
+    """
+
+    def setUp(self) -> None:
+        self.directory: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory()
+        self.root: str = self.directory.name
+
+        for path, size in [("a.txt", 5), ("b.jpg", 2000), ("sub/c.bin", 10), ("sub/deep/d", 0), ("sub/deep/e.txt", 1)]:
+            full_path: str = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+            with open(full_path, "wb") as file:
+                file.write(b"x" * size)
+
+        for directory, _, files in os.walk(self.root):
+            for name in files + [""]:
+                os.utime(os.path.join(directory, name), ns=(MTIME_NS, MTIME_NS))
+
+        self.rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+        self.rclone.native_local_mode = True
+        self.commands: List[List[str]] = []
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def execute_mock(self, command_to_run: List[str]) -> RcloneOutput:
+        self.commands.append(command_to_run)
+        return RcloneOutput(RcloneError.SUCCESS, ["[", "]"], [])
+
+    def listing(self, output: RcloneOutput) -> List[Dict[str, object]]:
+        return [json.loads(line.rstrip(",")) for line in output.output[1:-1]]
+
+    def test_lsjson(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            output: RcloneOutput = self.rclone.lsjson(self.root, ["-R"])
+            remote_output: RcloneOutput = self.rclone.lsjson(f"local:{self.root}", ["-R", "--fast-list"])
+
+        assert self.commands == []
+        assert output.return_code == RcloneError.SUCCESS
+        assert output.output == remote_output.output
+        assert output.output[0] == "[" and output.output[-1] == "]"
+        assert output.output[1].endswith(",") and not output.output[-2].endswith(",")
+
+        entries: List[Dict[str, object]] = self.listing(output)
+
+        assert [entry["Path"] for entry in entries] == [
+            "a.txt",
+            "b.jpg",
+            "sub",
+            "sub/c.bin",
+            "sub/deep",
+            "sub/deep/d",
+            "sub/deep/e.txt",
+        ]
+        assert list(entries[0]) == ["Path", "Name", "Size", "MimeType", "ModTime", "IsDir"]
+        assert entries[0]["MimeType"] == "text/plain; charset=utf-8"
+        assert entries[2] == {
+            "Path": "sub",
+            "Name": "sub",
+            "Size": -1,
+            "MimeType": "inode/directory",
+            "ModTime": entries[2]["ModTime"],
+            "IsDir": True,
+        }
+        assert str(entries[0]["ModTime"]).split("T")[1][8:].startswith(".1234")
+
+        for entry in entries:
+            assert parse_mod_time(str(entry["ModTime"])) == MTIME_NS / 1e9
+
+        # Reading directories in parallel gives the same output.
+        self.rclone.native_local_workers = 4
+        assert self.rclone.lsjson(self.root, ["-R"]).output == output.output
+
+    def test_filters(self) -> None:
+        listing_filter: RcloneListingFilter = RcloneListingFilter(files_only=True, min_size=2, max_depth=2)
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            filtered: RcloneOutput = self.rclone.lsjson(self.root, ["-R", "--no-mimetype"], listing_filter)
+            top_level: RcloneOutput = self.rclone.lsd(self.root)
+            files: RcloneOutput = self.rclone.lsl(f"local:{self.root}/sub")
+            recent: RcloneOutput = self.rclone.lsjson(self.root, ["--max-age", "1d"])
+
+        assert self.commands == []
+        assert [(entry["Path"], entry["Size"]) for entry in self.listing(filtered)] == [
+            ("a.txt", 5),
+            ("b.jpg", 2000),
+            ("sub/c.bin", 10),
+        ]
+        assert "MimeType" not in self.listing(filtered)[0]
+        assert [entry["Path"] for entry in self.listing(top_level)] == ["sub"]
+        assert [entry["Path"] for entry in self.listing(files)] == ["c.bin", "deep/d", "deep/e.txt"]
+
+        # As with rclone, ages and sizes don't filter directories.
+        assert [entry["Path"] for entry in self.listing(recent)] == ["sub"]
+
+    def test_size(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            size: RcloneOutput = self.rclone.size(self.root, ["--json", "--max-size", "1k"])
+            self.rclone.size(self.root)
+
+        assert json.loads(size.output[0]) == {"count": 4, "bytes": 16, "sizeless": 0}
+        assert self.commands == [["rclone", "size", self.root]]
+
+    def test_fallback(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            self.rclone.lsjson(self.root, ["--include", "*.txt"])
+            self.rclone.lsjson(self.root, ["--hash"])
+            self.rclone.lsjson(f"links:{self.root}")
+            self.rclone.lsjson("dropbox:")
+            self.rclone.lsjson(os.path.join(self.root, "missing"))
+
+            self.rclone.native_local_mode = False
+            self.rclone.lsjson(self.root)
+
+        assert [command[2] for command in self.commands] == [
+            self.root,
+            self.root,
+            f"links:{self.root}",
+            "dropbox:",
+            os.path.join(self.root, "missing"),
+            self.root,
+        ]
+
+    def test_parse_flags(self) -> None:
+        assert parse_size("10") == 10240
+        assert parse_size("512B") == 512
+        assert parse_size("1.5M") == 1572864
+        assert parse_size("1MiB") == 1 << 20
+        assert parse_size("10X") is None
+        assert parse_duration("90s") == 90
+        assert parse_duration("1h30m") == 5400
+        assert parse_duration("2d") == 172800
+        assert parse_duration("2006-01-02") is None
+
+        assert parse_local_flags(["-R", "--max-depth=2", "--fast-list"]) is not None
+        assert parse_local_flags(["--max-depth"]) is None
+        assert parse_local_flags(["--copy-links"]) is None
+
+    def test_symlinks(self) -> None:
+        os.symlink(os.path.join(self.root, "a.txt"), os.path.join(self.root, "link.txt"))
+
+        output: RcloneOutput = self.rclone.lsjson(self.root)
+        skipped: RcloneOutput = self.rclone.lsjson(self.root, ["--skip-links"])
+
+        assert "link.txt" not in "".join(output.output)
+        assert output.error[0].endswith("NOTICE: link.txt: Can't follow symlink without -L/--copy-links")
+        assert skipped.output == output.output and skipped.error == []
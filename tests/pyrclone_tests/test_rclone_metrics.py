@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import sys
+import threading
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneCommandMetrics,
+    RcloneConfig,
+    RcloneError,
+    RcloneMetricsAggregator,
+    RcloneOutput,
+)
+from pyrclone.rclone_metrics import RcloneCpuTimer
+
+
+class rcloneMetricsTest(unittest.TestCase):
+    """
+    Tests for the per command metrics.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+    def test_metrics_sinks(self) -> None:
+        recorded: List[RcloneCommandMetrics] = []
+
+        self.rclone.metrics_sinks.append(recorded.append)
+        self.rclone.metrics_sinks.append(lambda metrics: 1 / 0)  # type: ignore
+
+        with mock.patch.object(
+            self.rclone,
+            "_execute",
+            return_value=RcloneOutput(RcloneError.SUCCESS, ["a.txt", "bc.txt"], []),
+        ):
+            self.rclone.copy("/local", "dropbox:Backups")
+            self.rclone.lsf("/local")
+
+        assert len(recorded) == 2
+        assert recorded[0].command == "copy"
+        assert recorded[0].remote == "dropbox"
+        assert recorded[0].output_bytes == 13
+        assert recorded[0].error_bytes == 0
+        assert recorded[0].wall_time >= 0
+        assert recorded[0].return_code == RcloneError.SUCCESS
+        assert recorded[1].remote is None
+
+    def test_output_bytes(self) -> None:
+        assert RcloneOutput(RcloneError.SUCCESS, ["ü.txt"], ["€"]).output_size() == 7
+        assert RcloneOutput(RcloneError.SUCCESS, ["ü.txt"], ["€"]).error_size() == 4
+
+    @unittest.skipIf(sys.platform == "win32", "No resource module on Windows")
+    def test_cpu_time(self) -> None:
+        alone: RcloneCpuTimer = RcloneCpuTimer()
+        assert alone.stop() is not None
+
+        # Timers which overlap, in either order, can't tell their CPU time
+        # apart, so give none.
+        first: RcloneCpuTimer = RcloneCpuTimer()
+        second: RcloneCpuTimer = RcloneCpuTimer()
+        third: RcloneCpuTimer = RcloneCpuTimer()
+        assert second.stop() is None
+        assert first.stop() is None
+        assert third.stop() is None
+
+        assert RcloneCpuTimer().stop() is not None
+
+    def test_concurrent_cpu_time(self) -> None:
+        recorded: List[RcloneCommandMetrics] = []
+        barrier: threading.Barrier = threading.Barrier(2)
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            barrier.wait()
+            return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+        self.rclone.metrics_sinks.append(recorded.append)
+
+        with mock.patch.object(self.rclone, "_execute", execute_mock):
+            threads: List[threading.Thread] = [
+                threading.Thread(target=self.rclone.mkdir, args=(f"dropbox:{i}",)) for i in range(2)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        assert [metrics.cpu_time for metrics in recorded] == [None, None]
+
+    def test_percentiles(self) -> None:
+        aggregator: RcloneMetricsAggregator = RcloneMetricsAggregator()
+
+        for wall_time in range(1, 101):
+            aggregator(
+                RcloneCommandMetrics(
+                    "copy", "dropbox", float(wall_time), None, 0, 0, RcloneError.SUCCESS
+                )
+            )
+
+        assert aggregator.percentile(50, "copy") == 50.0
+        assert aggregator.percentile(99, "copy", "dropbox") == 99.0
+        assert aggregator.percentile(100, "copy") == 100.0
+        assert aggregator.percentile(50, "copy", "drive") is None
+        assert aggregator.percentile(50, "sync") is None
+
+    def test_prometheus(self) -> None:
+        aggregator: RcloneMetricsAggregator = RcloneMetricsAggregator(buckets=(1, 10))
+
+        aggregator(
+            RcloneCommandMetrics(
+                "copy", "dropbox", 0.5, 0.25, 10, 2, RcloneError.SUCCESS
+            )
+        )
+        aggregator(
+            RcloneCommandMetrics(
+                "copy", "dropbox", 5.0, None, 0, 20, RcloneError.RETRY_ERROR
+            )
+        )
+
+        exported: List[str] = aggregator.to_prometheus().splitlines()
+        labels: str = 'command="copy",remote="dropbox"'
+
+        assert (
+            f'pyrclone_command_duration_seconds_bucket{{{labels},le="1"}} 1' in exported
+        )
+        assert (
+            f'pyrclone_command_duration_seconds_bucket{{{labels},le="10"}} 2'
+            in exported
+        )
+        assert (
+            f'pyrclone_command_duration_seconds_bucket{{{labels},le="+Inf"}} 2'
+            in exported
+        )
+        assert f"pyrclone_command_duration_seconds_sum{{{labels}}} 5.5" in exported
+        assert f"pyrclone_command_cpu_seconds_total{{{labels}}} 0.25" in exported
+        assert f"pyrclone_command_error_bytes_total{{{labels}}} 22.0" in exported
+        assert f'pyrclone_command_exits_total{{{labels},code="SUCCESS"}} 1' in exported
+        assert (
+            f'pyrclone_command_exits_total{{{labels},code="RETRY_ERROR"}} 1' in exported
+        )
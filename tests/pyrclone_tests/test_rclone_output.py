@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneBytesOutput,
+    RcloneConfig,
+    RcloneError,
+    RcloneListingCache,
+    RcloneOutput,
+)
+
+from .test_rclone import BYTE_OUTPUT, STRING_OUTPUT, rcloneMockProcess
+
+
+class rcloneBytesOutputTest(unittest.TestCase):
+    """
+    Tests for the lazily decoded bytes output mode.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.rclone.bytes_output_mode = True
+        self.processes: List[rcloneMockProcess] = []
+
+    def process_mock(self, command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+        process: rcloneMockProcess = rcloneMockProcess(
+            command, b"".join(BYTE_OUTPUT), b"NOTICE: listed\n", 0
+        )
+        self.processes.append(process)
+        return process
+
+    def test_lazy_decoding(self) -> None:
+        with mock.patch("subprocess.Popen", self.process_mock):
+            result: RcloneOutput = self.rclone.lsjson("dropbox:")
+
+        assert isinstance(result, RcloneBytesOutput)
+        assert result.return_code == RcloneError.SUCCESS
+        assert result.output_size() == len(b"".join(BYTE_OUTPUT))
+        assert len(json.loads(result.raw_output)) == 5
+
+        # Nothing is decoded until it is accessed.
+        assert result._output is None
+        assert result._error is None
+        assert result.output == STRING_OUTPUT
+        assert result.error == ["NOTICE: listed"]
+        assert result.output is result.output
+
+    def test_cached_copies(self) -> None:
+        self.rclone.listing_cache = RcloneListingCache()
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            first: RcloneOutput = self.rclone.lsjson("dropbox:")
+            second: RcloneOutput = self.rclone.lsjson("dropbox:")
+
+        assert len(self.processes) == 1
+        assert isinstance(second, RcloneBytesOutput)
+        assert isinstance(first, RcloneBytesOutput)
+        assert second.raw_output is first.raw_output
+
+        second.output.clear()
+        assert first.output == STRING_OUTPUT
+
+    def test_text_mode_unchanged(self) -> None:
+        self.rclone.bytes_output_mode = False
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            result: RcloneOutput = self.rclone.lsjson("dropbox:")
+
+        assert not isinstance(result, RcloneBytesOutput)
+        assert result.output == STRING_OUTPUT
+        assert result.output_size() == sum(len(line) + 1 for line in STRING_OUTPUT)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import gc
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from typing import Callable, Iterator, List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneOutput, RcloneReadStream, RcloneWriteStream
+
+CONTENT: bytes = bytes(range(256)) * 4096
+
+# Stand-ins for rclone, which write CONTENT, write forever, report how much
+# they read, or save what they read once their input ends, then exit with a
+# given code.
+CAT_SCRIPT: str = "import sys\nsys.stdout.buffer.write(bytes(range(256)) * 4096)\n"
+ENDLESS_SCRIPT: str = "import sys\nwhile True:\n    sys.stdout.buffer.write(b'x' * 65536)\n"
+RCAT_SCRIPT: str = "import sys\nsys.stderr.write(str(len(sys.stdin.buffer.read())) + '\\n')\n"
+UPLOAD_SCRIPT: str = "import sys\ncontent = sys.stdin.buffer.read()\nopen({!r}, 'wb').write(content)\n"
+FAILING_SCRIPT: str = "import sys\nsys.stderr.write('directory not found\\n')\nsys.exit(3)\n"
+
+REAL_POPEN = subprocess.Popen
+
+
+class rclonePipeTest(unittest.TestCase):
+    """
+    Tests for streaming the content of objects through cat and rcat.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.commands: List[List[str]] = []
+        self.script: str = CAT_SCRIPT
+
+    def popen_mock(self, command: List[str], **kwargs: int) -> subprocess.Popen[bytes]:
+        self.commands.append(command)
+        return REAL_POPEN([sys.executable, "-c", self.script], **kwargs)
+
+    def test_read(self) -> None:
+        with mock.patch("subprocess.Popen", self.popen_mock):
+            with self.rclone.open_read("dropbox:a.bin") as stream:
+                content: bytes = io.BufferedReader(stream).read()
+
+            chunks: List[bytes] = list(self.rclone.open_read("dropbox:a.bin", 10, 100).iter_chunks(4096))
+
+        assert self.commands == [
+            ["rclone", "cat", "dropbox:a.bin"],
+            ["rclone", "cat", "dropbox:a.bin", "--offset", "10", "--count", "100"],
+        ]
+        assert content == CONTENT
+        assert stream.return_code == RcloneError.SUCCESS
+        assert max(len(chunk) for chunk in chunks) <= 4096
+        assert b"".join(chunks) == CONTENT
+
+    def test_close_early(self) -> None:
+        self.script = ENDLESS_SCRIPT
+        start_time: float = time.monotonic()
+
+        with mock.patch("subprocess.Popen", self.popen_mock):
+            stream: RcloneReadStream = self.rclone.open_read("dropbox:endless.bin")
+
+            for chunk in stream.iter_chunks():
+                assert chunk
+                break
+
+        stream.close()
+
+        assert stream.closed
+        assert stream.return_code is None
+        assert time.monotonic() - start_time < 10
+
+    def test_write(self) -> None:
+        self.script = RCAT_SCRIPT
+        self.rclone.dry_run_mode = True
+
+        def chunks() -> Iterator[bytes]:
+            for start in range(0, len(CONTENT), 10000):
+                yield CONTENT[start : start + 10000]
+
+        with mock.patch("subprocess.Popen", self.popen_mock):
+            output: RcloneOutput = self.rclone.rcat("dropbox:a.bin", chunks(), len(CONTENT))
+
+            with self.rclone.open_write("dropbox:b.bin") as stream:
+                stream.write(b"abc")
+
+        assert self.commands == [
+            ["rclone", "rcat", "--dry-run", "dropbox:a.bin", "--size", str(len(CONTENT))],
+            ["rclone", "rcat", "--dry-run", "dropbox:b.bin"],
+        ]
+        assert output.return_code == RcloneError.SUCCESS
+        assert output.error == [str(len(CONTENT))]
+        assert stream.error == ["3"]
+
+    def test_failed_write(self) -> None:
+        self.script = FAILING_SCRIPT
+
+        with mock.patch("subprocess.Popen", self.popen_mock):
+            output: RcloneOutput = self.rclone.rcat("dropbox:missing/a.bin", [CONTENT] * 4)
+
+            with self.assertRaises(RuntimeError):
+                with self.rclone.open_write("dropbox:missing/b.bin") as stream:
+                    raise RuntimeError("Failed to produce the content")
+
+        assert output.return_code == RcloneError.FOLDER_NOT_FOUND
+        assert output.error == ["directory not found"]
+        assert isinstance(stream, RcloneWriteStream) and stream.closed
+        assert stream.return_code is None
+
+    def test_abort(self) -> None:
+        def slow_popen_mock(command: List[str], **kwargs: int) -> subprocess.Popen[bytes]:
+            process: subprocess.Popen[bytes] = self.popen_mock(command, **kwargs)
+            kill: Callable[[], None] = process.kill
+
+            def slow_kill() -> None:
+                time.sleep(0.5)
+                kill()
+
+            process.kill = slow_kill  # type: ignore
+            return process
+
+        with tempfile.TemporaryDirectory() as directory:
+            uploaded: str = os.path.join(directory, "uploaded.bin")
+            self.script = UPLOAD_SCRIPT.format(uploaded)
+
+            with mock.patch("subprocess.Popen", slow_popen_mock):
+                stream: RcloneWriteStream = self.rclone.open_write("dropbox:a.bin")
+                stream.write(CONTENT)
+                stream.write(b"partial")
+                stream.abort()
+
+            # Even when killing rclone is slow, it never sees the end of its
+            # input, so nothing is uploaded.
+            assert not os.path.exists(uploaded)
+            assert stream.closed
+            assert stream.return_code is None
+
+    def test_drop_unclosed(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            uploaded: str = os.path.join(directory, "uploaded.bin")
+            self.script = UPLOAD_SCRIPT.format(uploaded)
+
+            processes: List[subprocess.Popen[bytes]] = []
+
+            def popen_mock(command: List[str], **kwargs: int) -> subprocess.Popen[bytes]:
+                processes.append(self.popen_mock(command, **kwargs))
+                return processes[-1]
+
+            with mock.patch("subprocess.Popen", popen_mock):
+                stream: RcloneWriteStream = self.rclone.open_write("dropbox:a.bin")
+                stream.write(b"partial")
+
+            # Dropping the stream aborts it, rather than uploading what was
+            # written as the whole object.
+            del stream
+            gc.collect()
+
+            assert processes[0].poll() is not None
+            assert not os.path.exists(uploaded)
+
+    def test_failed_read(self) -> None:
+        self.script = FAILING_SCRIPT
+
+        with mock.patch("subprocess.Popen", self.popen_mock):
+            stream: RcloneReadStream = self.rclone.open_read("dropbox:missing/a.bin")
+
+            with self.assertRaises(OSError):
+                stream.read()
+
+        stream.close()
+
+        assert stream.return_code == RcloneError.FOLDER_NOT_FOUND
+        assert stream.error == ["directory not found"]
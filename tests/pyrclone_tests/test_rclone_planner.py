@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneConfig,
+    RcloneError,
+    RcloneFanOutResult,
+    RcloneOutput,
+    RcloneStats,
+    RcloneTransferPlan,
+    RcloneTransferResult,
+    plan_transfer,
+)
+
+from .test_rclone import rcloneMockProcess
+
+LISTING: List[Dict[str, object]] = [
+    {"Path": "big.iso", "Size": 1000, "IsDir": False},
+    {"Path": "Photos", "Size": -1, "IsDir": True},
+    {"Path": "medium.zip", "Size": 400, "IsDir": False},
+] + [{"Path": f"Photos/{i}.jpg", "Size": 100, "IsDir": False} for i in range(6)]
+
+
+class rclonePlannerTest(unittest.TestCase):
+    """
+    Tests for planning and running byte balanced transfers.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.lock: threading.Lock = threading.Lock()
+        self.commands: List[List[str]] = []
+        self.file_lists: List[List[str]] = []
+
+    def execute_mock(self, command: List[str]) -> RcloneOutput:
+        with self.lock:
+            self.commands.append(command)
+
+            if "--files-from-raw" in command:
+                with open(command[command.index("--files-from-raw") + 1]) as list_file:
+                    self.file_lists.append(list_file.read().splitlines())
+
+        return RcloneOutput(
+            RcloneError.SUCCESS, [], [], RcloneStats(bytes=10, speed=2.0, elapsed_time=len(self.commands))
+        )
+
+    def test_plan_transfer(self) -> None:
+        plan: RcloneTransferPlan = plan_transfer(
+            [("a", 10), ("b", 1), ("c", 3), ("d", 3), ("e", 2), ("f", 1)], 3
+        )
+
+        assert plan.partitions == [["a"], ["d", "e"], ["c", "f", "b"]]
+        assert plan.sizes == [10, 5, 5]
+        assert sum(plan.sizes) == 20
+
+        assert plan_transfer([("a", 1)], 4).partitions == [["a"]]
+        assert plan_transfer([], 4).partitions == []
+
+    def test_copy_parallel(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            result: RcloneTransferResult = self.rclone.copy_parallel(
+                "/local", "dropbox:Backup", ["--transfers", "8"], 2, LISTING
+            )
+
+        assert result.plan.sizes == [1000, 1000]
+        assert sorted(map(sorted, self.file_lists)) == sorted(map(sorted, result.plan.partitions))
+        assert ["big.iso"] in self.file_lists
+        assert all(command[:4] == ["rclone", "copy", "/local", "dropbox:Backup"] for command in self.commands)
+        assert all(command[-2:] == ["--transfers", "8"] for command in self.commands)
+        assert result.return_code == RcloneError.SUCCESS
+        assert result.sync_output is None
+
+        assert result.stats is not None
+        assert result.stats.bytes == 20
+        assert result.stats.speed == 4.0
+        assert result.stats.elapsed_time == 2
+
+    def test_sync_parallel(self) -> None:
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock):
+            result: RcloneTransferResult = self.rclone.sync_parallel(
+                "/local", "dropbox:Backup", partitions=3, listing=LISTING
+            )
+
+        assert len(self.commands) == 4
+        assert self.commands[-1] == ["rclone", "sync", "/local", "dropbox:Backup"]
+        assert len(result.outputs) == 4
+
+    def test_copy_fan_out(self) -> None:
+        def execute_mock(command: List[str]) -> RcloneOutput:
+            output: RcloneOutput = self.execute_mock(command)
+
+            if command[3] == "b2:Backup":
+                return RcloneOutput(RcloneError.RETRY_ERROR, [], ["Failed to copy"], output.stats)
+
+            return output
+
+        destinations: List[str] = ["dropbox:Backup", "b2:Backup", "s3:backup", "dropbox:Backup"]
+
+        with mock.patch.object(self.rclone, "_execute", execute_mock):
+            result: RcloneFanOutResult = self.rclone.copy_fan_out(
+                "/local", destinations, ["--transfers", "8"], per_destination=2, listing=LISTING
+            )
+
+        assert list(result.destinations) == ["dropbox:Backup", "b2:Backup", "s3:backup"]
+        assert len(self.commands) == 6
+        assert sorted(command[3] for command in self.commands) == sorted(list(result.destinations) * 2)
+        assert all(command[-2:] == ["--transfers", "8"] for command in self.commands)
+
+        # Every destination is given the same partitions.
+        assert len({tuple(file_list) for file_list in self.file_lists}) == 2
+        assert result.plan.sizes == [1000, 1000]
+
+        assert result.failed == ["b2:Backup"]
+        assert result.return_code == RcloneError.RETRY_ERROR
+        assert result.destinations["dropbox:Backup"].batch.failures == 0
+        assert result.destinations["b2:Backup"].batch.failures == 2
+        assert result.destinations["s3:backup"].batch.wall_time <= result.wall_time
+
+        assert result.stats is not None
+        assert result.stats.bytes == 60
+
+    def test_fan_out_listing_failure(self) -> None:
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            self.commands.append(command)
+            return rcloneMockProcess(command, b"", b"directory not found", 3)
+
+        with mock.patch("subprocess.Popen", process_mock):
+            result: RcloneFanOutResult = self.rclone.copy_fan_out("dropbox:Missing", ["b2:Backup", "s3:backup"])
+
+        assert self.commands == [["rclone", "lsjson", "dropbox:Missing", "-R", "--files-only", "--fast-list"]]
+        assert result.failed == ["b2:Backup", "s3:backup"]
+        assert result.return_code == RcloneError.FOLDER_NOT_FOUND
+        assert result.destinations["b2:Backup"].outputs[0].error == ["directory not found"]
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneOutput, RcloneRcdBackend
+
+LIST_RESPONSE: Dict[str, Any] = {
+    "list": [
+        {"Path": "Test1.txt", "Name": "Test1.txt", "Size": 0, "IsDir": False},
+        {"Path": "TestFolder", "Name": "TestFolder", "Size": -1, "IsDir": True},
+    ]
+}
+
+
+class rcdStubHandler(BaseHTTPRequestHandler):
+    """
+    A stand in for "rclone rcd", which records each call and replies with
+    the response set for its method.
+    """
+
+    calls: List[Tuple[str, Dict[str, Any]]] = []
+    authorizations: List[Optional[str]] = []
+    responses: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    delays: Dict[str, float] = {}
+
+    def do_POST(self) -> None:
+        method: str = self.path.lstrip("/")
+        body: bytes = self.rfile.read(int(self.headers["Content-Length"]))
+        self.calls.append((method, json.loads(body)))
+        self.authorizations.append(self.headers.get("Authorization"))
+        time.sleep(self.delays.get(method, 0))
+
+        status, response = self.responses.get(method, (200, {}))
+        response_body: bytes = json.dumps(response).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class rcloneRcdTest(unittest.TestCase):
+    """
+    Tests for the rclone rcd backend.
+    """
+
+    def setUp(self) -> None:
+        rcdStubHandler.calls = []
+        rcdStubHandler.authorizations = []
+        rcdStubHandler.responses = {}
+        rcdStubHandler.delays = {}
+
+        self.server: HTTPServer = HTTPServer(("localhost", 0), rcdStubHandler)
+        self.server_thread: threading.Thread = threading.Thread(
+            target=self.server.serve_forever
+        )
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+        self.backend: RcloneRcdBackend = RcloneRcdBackend(
+            url=f"http://localhost:{self.server.server_port}"
+        )
+        self.backend.start()
+
+        self.rclone: Rclone = Rclone(RcloneConfig("[local]\ntype = local\n"))
+        self.rclone.rcd_backend = self.backend
+
+    def tearDown(self) -> None:
+        self.backend.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_lsjson(self) -> None:
+        rcdStubHandler.responses["operations/list"] = (200, LIST_RESPONSE)
+
+        with mock.patch("subprocess.Popen") as popen:
+            result: RcloneOutput = self.rclone.ls("dropbox:")
+
+        popen.assert_not_called()
+
+        assert rcdStubHandler.calls[-1] == (
+            "operations/list",
+            {"fs": "dropbox:", "remote": "", "opt": {"recurse": True}},
+        )
+        assert result.return_code == RcloneError.SUCCESS
+        assert result.output == [
+            "[",
+            '{"Path":"Test1.txt","Name":"Test1.txt","Size":0,"IsDir":false},',
+            '{"Path":"TestFolder","Name":"TestFolder","Size":-1,"IsDir":true}',
+            "]",
+        ]
+
+    def test_deletefile_dry_run(self) -> None:
+        self.rclone.dry_run_mode = True
+        result: RcloneOutput = self.rclone.deletefile("dropbox:Folder/Test1.txt")
+
+        assert rcdStubHandler.calls[-1] == (
+            "operations/deletefile",
+            {"fs": "dropbox:Folder", "remote": "Test1.txt", "_config": {"DryRun": True}},
+        )
+        assert result.return_code == RcloneError.SUCCESS
+
+    def test_size_falls_back(self) -> None:
+        with mock.patch("subprocess.Popen") as popen:
+            popen.return_value.__enter__.return_value.communicate.return_value = (
+                b"Total objects: 3 (3)\nTotal size: 1.500 KiB (1536 Byte)\n",
+                b"",
+            )
+            popen.return_value.__enter__.return_value.returncode = 0
+            result: RcloneOutput = self.rclone.size("dropbox:TestFolder")
+
+        popen.assert_called_once()
+        assert result.output == ["Total objects: 3 (3)", "Total size: 1.500 KiB (1536 Byte)"]
+        assert rcdStubHandler.calls[-1][0] == "rc/noop"
+
+    def started_backend(self, pid: int, return_code: Optional[int] = None) -> Tuple[RcloneRcdBackend, mock.MagicMock]:
+        backend: RcloneRcdBackend = RcloneRcdBackend(address=f"localhost:{self.server.server_port}")
+        rcdStubHandler.responses["core/pid"] = (200, {"pid": 1234})
+
+        with mock.patch("subprocess.Popen") as popen:
+            popen.return_value.pid = pid
+            popen.return_value.poll.return_value = return_code
+            popen.return_value.returncode = return_code
+            backend.start()
+
+        return backend, popen
+
+    def test_start(self) -> None:
+        backend, popen = self.started_backend(1234)
+        backend.execute(["rclone", "mkdir", "dropbox:Folder"])
+        backend.stop()
+
+        # The credentials are random, and kept out of the process list.
+        command: List[str] = popen.call_args[0][0]
+        environment: Dict[str, str] = popen.call_args[1]["env"]
+        credentials: str = f"{environment['RCLONE_RC_USER']}:{environment['RCLONE_RC_PASS']}"
+
+        assert command == ["rclone", "rcd", f"--rc-addr=localhost:{self.server.server_port}"]
+        assert len(environment["RCLONE_RC_PASS"]) >= 32
+        assert environment["RCLONE_RC_PASS"] != self.started_backend(1234)[1].call_args[1]["env"]["RCLONE_RC_PASS"]
+        assert [call[0] for call in rcdStubHandler.calls][:3] == ["rc/noop", "core/pid", "operations/mkdir"]
+        assert rcdStubHandler.authorizations[1:3] == [
+            "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+        ] * 2
+        popen.return_value.terminate.assert_called_once()
+
+    def test_start_other_process(self) -> None:
+        # Something else is already answering on the address, so the started
+        # rcd couldn't listen on it.
+        with self.assertRaises(ConnectionError):
+            self.started_backend(5678)
+
+        with self.assertRaises(ConnectionError):
+            self.started_backend(1234, 1)
+
+        assert [call[0] for call in rcdStubHandler.calls] == ["rc/noop", "core/pid"]
+
+    def test_copy(self) -> None:
+        self.rclone.copy("dropbox:Test1", "dropbox:Test2")
+
+        assert rcdStubHandler.calls[-1] == (
+            "sync/copy",
+            {"srcFs": "dropbox:Test1", "dstFs": "dropbox:Test2"},
+        )
+
+    def test_copy_tuned(self) -> None:
+        self.rclone.config = RcloneConfig("[s3]\ntype = s3\n\n[b2]\ntype = b2\n")
+        self.rclone.backend_flags_mode = True
+
+        with mock.patch("subprocess.Popen") as popen:
+            self.rclone.copy("s3:bucket", "b2:bucket")
+            self.rclone.sync("s3:bucket", "b2:bucket", ["--transfers=4"])
+
+        popen.assert_not_called()
+
+        assert rcdStubHandler.calls[-2:] == [
+            (
+                "sync/copy",
+                {"srcFs": "s3:bucket", "dstFs": "b2:bucket", "_config": {"Checkers": 32, "Transfers": 16}},
+            ),
+            (
+                "sync/sync",
+                {"srcFs": "s3:bucket", "dstFs": "b2:bucket", "_config": {"Transfers": 4, "Checkers": 32}},
+            ),
+        ]
+
+    def test_error(self) -> None:
+        rcdStubHandler.responses["operations/purge"] = (
+            500,
+            {"error": "directory not found", "status": 500},
+        )
+
+        result: RcloneOutput = self.rclone.purge("dropbox:Missing")
+
+        assert result.return_code == RcloneError.FOLDER_NOT_FOUND
+        assert result.error == ["directory not found"]
+
+    def test_timeout(self) -> None:
+        rcdStubHandler.delays["operations/purge"] = 1.0
+        self.rclone.timeout = 0.2
+        start_time: float = time.monotonic()
+
+        with mock.patch("subprocess.Popen") as popen:
+            result: RcloneOutput = self.rclone.purge("dropbox:Slow")
+
+        popen.assert_not_called()
+
+        assert result.return_code == RcloneError.TIMEOUT
+        assert time.monotonic() - start_time < 1.0
+
+    def test_unsupported_falls_back(self) -> None:
+        with mock.patch("subprocess.Popen") as popen:
+            popen.return_value.__enter__.return_value.communicate.return_value = (
+                b"Test1.txt\n",
+                b"",
+            )
+            popen.return_value.__enter__.return_value.returncode = 0
+            result: RcloneOutput = self.rclone.lsf("dropbox:")
+
+        popen.assert_called_once()
+        assert result.output == ["Test1.txt"]
+        assert rcdStubHandler.calls[-1][0] == "rc/noop"
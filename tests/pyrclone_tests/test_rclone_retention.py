@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import calendar
+import json
+import unittest
+from datetime import date, timedelta
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneBulkResult,
+    RcloneConfig,
+    RcloneError,
+    RcloneOutput,
+    RcloneRetentionPlan,
+    RcloneRetentionPolicy,
+    plan_retention,
+)
+from pyrclone.rclone_retention import name_time, year_month
+
+from .test_rclone import rcloneMockProcess
+
+# A backup a day for the first quarter of 2020, plus one without any time.
+BACKUPS: List[Dict[str, object]] = [
+    {"Path": f"{date(2020, 1, 1) + timedelta(days=day)}_Backup", "Size": -1, "IsDir": True}
+    for day in range(91)
+] + [{"Path": "Misc", "Size": -1, "IsDir": True}]
+
+
+class rcloneRetentionTest(unittest.TestCase):
+    """
+    Tests for the backup retention policies.
+    """
+
+    def test_name_time(self) -> None:
+        assert name_time("2019-07-30_FlatMove") == calendar.timegm((2019, 7, 30, 0, 0, 0, 0, 0, 0))
+        assert name_time("backup-20190730T1205") == calendar.timegm((2019, 7, 30, 12, 5, 0, 0, 0, 0))
+        assert name_time("2019-07-30 12-05-30") == calendar.timegm((2019, 7, 30, 12, 5, 30, 0, 0, 0))
+        assert name_time("2019-13-45") is None
+        assert name_time("Backup 123456789") is None
+
+    def test_year_month(self) -> None:
+        for days in range(-800, 40000, 13):
+            day: date = date(1970, 1, 1) + timedelta(days=days)
+            assert year_month(days) == (day.year, day.month)
+
+    def test_plan(self) -> None:
+        policy: RcloneRetentionPolicy = RcloneRetentionPolicy(
+            daily=3, weekly=2, monthly=2, yearly=1, protected=["2020-01-01_Backup"]
+        )
+        plan: RcloneRetentionPlan = plan_retention(BACKUPS, policy)
+
+        # 2020-03-31 is a Tuesday, so the week before ends on Sunday the 29th.
+        assert plan.reasons == {
+            "2020-03-31_Backup": ["daily", "weekly", "monthly", "yearly"],
+            "2020-03-30_Backup": ["daily"],
+            "2020-03-29_Backup": ["daily", "weekly"],
+            "2020-02-29_Backup": ["monthly"],
+            "2020-01-01_Backup": ["protected"],
+        }
+        assert plan.keep == [
+            "2020-01-01_Backup",
+            "2020-02-29_Backup",
+            "2020-03-29_Backup",
+            "2020-03-30_Backup",
+            "2020-03-31_Backup",
+            "Misc",
+        ]
+        assert plan.undated == ["Misc"]
+        assert len(plan.delete) == 86
+        assert "2020-03-28_Backup" in plan.delete
+
+    def test_mod_times(self) -> None:
+        listing: List[Dict[str, object]] = [
+            {"Path": "a.tar", "Size": 1, "ModTime": "2020-01-01T10:00:00Z", "IsDir": False},
+            {"Path": "b.tar", "Size": 1, "ModTime": "2020-01-01T12:00:00Z", "IsDir": False},
+            {"Path": "c.tar", "Size": 1, "ModTime": "2020-01-02T12:00:00Z", "IsDir": False},
+        ]
+        plan: RcloneRetentionPlan = plan_retention(listing, RcloneRetentionPolicy(last=1, daily=2))
+
+        assert plan.keep == ["b.tar", "c.tar"]
+        assert plan.delete == ["a.tar"]
+        assert not plan.directories
+
+    def test_prune(self) -> None:
+        output: bytes = ("[\n" + ",\n".join(json.dumps(entry) for entry in BACKUPS) + "\n]\n").encode("utf-8")
+        commands: List[List[str]] = []
+        file_lists: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            return rcloneMockProcess(command, output, b"", 0)
+
+        def execute_mock(command_to_run: List[str]) -> RcloneOutput:
+            commands.append(command_to_run)
+            with open(command_to_run[command_to_run.index("--include-from") + 1]) as list_file:
+                file_lists.append(list_file.read().splitlines())
+            return RcloneOutput(RcloneError.SUCCESS, [], [])
+
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+        with mock.patch("subprocess.Popen", process_mock), mock.patch.object(rclone, "_execute", execute_mock):
+            plan, result = rclone.prune("dropbox:Backups", RcloneRetentionPolicy(daily=7), dry_run=True)
+
+        assert commands[0] == ["rclone", "lsjson", "dropbox:Backups", "--dirs-only", "--fast-list"]
+        assert commands[1][:4] == ["rclone", "delete", "dropbox:Backups", "--include-from"]
+        assert "--rmdirs" in commands[1] and "--dry-run" in commands[1]
+        assert len(commands) == 2
+        assert len(file_lists[0]) == 84
+        assert file_lists[0][0] == "/2020-01-01_Backup/**"
+        assert plan.return_code == RcloneError.SUCCESS
+        assert result.return_code == RcloneError.SUCCESS
+
+    def test_failed_listing(self) -> None:
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            return rcloneMockProcess(
+                command, b'[\n{"Path": "2020-01-01", "IsDir": true},\n{"Path": "2020-01-02", "IsDir": true},\n', b"failed", 1
+            )
+
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+        with mock.patch("subprocess.Popen", process_mock):
+            plan: RcloneRetentionPlan = rclone.retention_plan("dropbox:Backups", RcloneRetentionPolicy(last=1))
+            result: RcloneBulkResult = plan.apply(rclone, "dropbox:Backups")
+
+        assert plan.return_code == RcloneError.SYNTAX_OR_USAGE_ERROR
+        assert plan.delete == []
+        assert sorted(plan.keep) == ["2020-01-01", "2020-01-02"]
+        assert result.outputs == []
+
+    def test_policy_keeping_nothing(self) -> None:
+        commands: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            return rcloneMockProcess(command, b"[\n]\n", b"", 0)
+
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+        with self.assertRaises(ValueError):
+            plan_retention(BACKUPS, RcloneRetentionPolicy(protected=["2020-01-01_Backup"]))
+
+        with mock.patch("subprocess.Popen", process_mock), self.assertRaises(ValueError):
+            rclone.prune("dropbox:Backups", RcloneRetentionPolicy())
+
+        assert commands == []
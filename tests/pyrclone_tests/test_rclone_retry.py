@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneConfig,
+    RcloneError,
+    RcloneOutput,
+    RcloneRateLimiter,
+    RcloneRetryPolicy,
+    RcloneTokenBucket,
+)
+
+
+class rcloneRetryTest(unittest.TestCase):
+    """
+    Tests for retrying commands and limiting their rate.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(
+            RcloneConfig("[dropbox]\ntype = dropbox\n[drive]\ntype = drive\n")
+        )
+        self.return_codes: List[RcloneError] = []
+        self.commands: List[List[str]] = []
+
+    def execute_mock(self, command: List[str]) -> RcloneOutput:
+        self.commands.append(command)
+        return RcloneOutput(self.return_codes.pop(0), [], [])
+
+    def test_retry_delays(self) -> None:
+        policy: RcloneRetryPolicy = RcloneRetryPolicy(
+            max_attempts=3, base_delay=2, max_delay=5
+        )
+
+        for attempt, limit in [(0, 2), (1, 4)]:
+            delay = policy.retry_delay(RcloneError.RETRY_ERROR, attempt)
+            assert delay is not None and 0 <= delay <= limit
+
+        assert policy.retry_delay(RcloneError.RETRY_ERROR, 2) is None
+        assert policy.retry_delay(RcloneError.NO_RETRY_ERROR, 0) is None
+        assert policy.retry_delay(RcloneError.FATAL_ERROR, 0) is None
+        assert policy.retry_delay(RcloneError.TRANSFER_EXCEEDED, 0) is None
+
+        policy.transfer_exceeded_delay = 3600
+        assert policy.retry_delay(RcloneError.TRANSFER_EXCEEDED, 0) == 3600
+        assert policy.retry_delay(RcloneError.TRANSFER_EXCEEDED, 1) is None
+
+    def test_command_retried(self) -> None:
+        self.rclone.retry_policy = RcloneRetryPolicy(max_attempts=3)
+        self.return_codes = [
+            RcloneError.RETRY_ERROR,
+            RcloneError.RETRY_ERROR,
+            RcloneError.SUCCESS,
+            RcloneError.RETRY_ERROR,
+            RcloneError.NO_RETRY_ERROR,
+        ]
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock), mock.patch(
+            "time.sleep"
+        ) as sleep:
+            assert self.rclone.copy("dropbox:a", "drive:b").return_code == RcloneError.SUCCESS
+            assert self.rclone.copy("dropbox:a", "drive:b").return_code == RcloneError.NO_RETRY_ERROR
+
+        assert len(self.commands) == 5
+        assert sleep.call_count == 3
+
+    def test_token_bucket(self) -> None:
+        with mock.patch("time.monotonic", return_value=100.0):
+            bucket: RcloneTokenBucket = RcloneTokenBucket(rate=2, capacity=2)
+
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == 0
+            assert bucket.reserve() == 0.5
+            assert bucket.reserve() == 1.0
+
+        with mock.patch("time.monotonic", return_value=102.0):
+            assert bucket.reserve() == 0
+
+    def test_rate_limiter(self) -> None:
+        self.rclone.rate_limiter = RcloneRateLimiter({"dropbox": 1})
+        self.return_codes = [RcloneError.SUCCESS] * 3
+
+        with mock.patch.object(self.rclone, "_execute", self.execute_mock), mock.patch(
+            "time.sleep"
+        ) as sleep:
+            self.rclone.copy("dropbox:a", "drive:b")
+            self.rclone.mkdir("drive:c")
+            self.rclone.mkdir("dropbox:c")
+
+        # Only the second command against dropbox has to wait.
+        assert sleep.call_count == 1
+        assert 0 < sleep.call_args[0][0] <= 1
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import threading
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneError, RcloneListingFilter, RcloneShardedListing
+from pyrclone.rclone_shard import root_relative_filters
+
+from .test_rclone import rcloneMockProcess
+
+
+def listing(*entries: Dict[str, object]) -> bytes:
+    return ("[\n" + ",\n".join(json.dumps(entry) for entry in entries) + "\n]\n").encode("utf-8")
+
+
+LISTINGS: Dict[str, bytes] = {
+    "dropbox:Photos": listing(
+        {"Path": "2019", "IsDir": True},
+        {"Path": "2020", "IsDir": True},
+        {"Path": "notes.txt", "IsDir": False},
+    ),
+    "dropbox:Photos/2019": listing(
+        {"Path": "a.jpg", "IsDir": False},
+        {"Path": "Trip", "IsDir": True},
+        {"Path": "Trip/b.jpg", "IsDir": False},
+    ),
+    "dropbox:Photos/2020": listing(*[{"Path": f"{i}.jpg", "IsDir": False} for i in range(50)]),
+}
+
+
+class rcloneShardTest(unittest.TestCase):
+    """
+    Tests for listing trees in parallel shards.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.commands: List[List[str]] = []
+        self.processes: List[rcloneMockProcess] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def process_mock(self, command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+        returncode: int = 3 if command[2] == "dropbox:Photos/2019" and self.fail_shard else 0
+        process: rcloneMockProcess = rcloneMockProcess(
+            command, LISTINGS[command[2]], b"", returncode
+        )
+
+        with self.lock:
+            self.commands.append(command)
+            self.processes.append(process)
+
+        return process
+
+    def test_sharded_listing(self) -> None:
+        self.fail_shard: bool = False
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneShardedListing = self.rclone.iter_lsjson_sharded(
+                "dropbox:Photos", max_workers=2
+            )
+            paths: List[str] = [str(entry["Path"]) for entry in stream]
+
+        assert sorted(paths) == sorted(
+            ["2019", "2020", "notes.txt", "2019/a.jpg", "2019/Trip", "2019/Trip/b.jpg"]
+            + [f"2020/{i}.jpg" for i in range(50)]
+        )
+        assert stream.shards == ["2019", "2020"]
+        assert stream.return_code == RcloneError.SUCCESS
+        assert self.commands[0] == [
+            "rclone", "lsjson", "dropbox:Photos", "-R", "--max-depth", "1", "--fast-list"
+        ]
+        assert sorted(command[2] for command in self.commands[1:]) == [
+            "dropbox:Photos/2019",
+            "dropbox:Photos/2020",
+        ]
+        assert all(command[3] == "-R" for command in self.commands[1:])
+
+    def test_files_only_and_errors(self) -> None:
+        self.fail_shard = True
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneShardedListing = self.rclone.iter_lsjson_sharded(
+                "dropbox:Photos", ["--files-only"]
+            )
+            paths: List[str] = [str(entry["Path"]) for entry in stream]
+
+        # The directories are still listed to find the shards, but not returned.
+        assert "--files-only" not in self.commands[0]
+        assert "2019" not in paths and "notes.txt" in paths
+        assert stream.return_code == RcloneError.FOLDER_NOT_FOUND
+
+    def test_root_relative_filters(self) -> None:
+        self.fail_shard = False
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneShardedListing = self.rclone.iter_lsjson_sharded(
+                "dropbox:Photos", listing_filter=RcloneListingFilter(include=["/2019/**"])
+            )
+            paths: List[str] = [str(entry["Path"]) for entry in stream]
+
+        # "/2019/**" would match nothing within each shard, so the remote is
+        # listed in one go.
+        assert self.commands == [
+            ["rclone", "lsjson", "dropbox:Photos", "--include", "/2019/**", "-R", "--fast-list"]
+        ]
+        assert paths == ["2019", "2020", "notes.txt"]
+        assert stream.shards == []
+        assert stream.return_code == RcloneError.SUCCESS
+
+        assert not root_relative_filters(["--include", "*.jpg", "--exclude=Trip/", "--filter", "- *.tmp"])
+        assert root_relative_filters(["--exclude=Trip/*.jpg"])
+        assert root_relative_filters(["--filter", "+ /2019/**"])
+        assert root_relative_filters(["--files-from", "list.txt"])
+
+    def test_closed_early(self) -> None:
+        self.fail_shard = False
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            stream: RcloneShardedListing = self.rclone.iter_lsjson_sharded(
+                "dropbox:Photos", max_workers=1
+            )
+
+            for _ in stream:
+                break
+
+            stream.close()
+
+        assert stream.return_code is None
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+import unittest
+from typing import Dict, List, Optional
+from unittest import mock
+
+from pyrclone import Rclone, RcloneConfig, RcloneDirectorySize, RcloneError, RcloneSizeTree
+
+from .test_rclone import rcloneMockProcess
+
+LISTING: List[Dict[str, object]] = [
+    {"Path": "Photos", "Size": -1, "IsDir": True},
+    {"Path": "Photos/2019", "Size": -1, "IsDir": True},
+    {"Path": "Photos/2019/a.jpg", "Size": 100, "ModTime": "2019-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "Photos/2019/b.jpg", "Size": 300, "ModTime": "2019-06-01T00:00:00Z", "IsDir": False},
+    {"Path": "Photos/2020", "Size": -1, "IsDir": True},
+    {"Path": "Photos/2020/c.jpg", "Size": 50, "ModTime": "2020-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "Empty", "Size": -1, "IsDir": True},
+    {"Path": "notes.txt", "Size": 5, "ModTime": "2018-01-01T00:00:00Z", "IsDir": False},
+    {"Path": "Music/song.mp3", "Size": 1000, "IsDir": False},
+]
+
+
+class rcloneSizesTest(unittest.TestCase):
+    """
+    Tests for rolling up directory sizes from a single listing.
+    """
+
+    def test_rollups(self) -> None:
+        tree: RcloneSizeTree = RcloneSizeTree(LISTING)
+
+        root: Optional[RcloneDirectorySize] = tree.size()
+        assert root is not None
+        assert (root.size, root.files) == (1455, 5)
+        assert root.oldest == 1514764800.0
+
+        photos: Optional[RcloneDirectorySize] = tree.size("Photos/")
+        assert photos == RcloneDirectorySize("Photos", 450, 3, 1577836800.0, 1546300800.0)
+
+        assert tree.size("Empty") == RcloneDirectorySize("Empty")
+        assert tree.size("Music") == RcloneDirectorySize("Music", 1000, 1)
+        assert tree.size("Missing") is None
+
+        assert [child.path for child in tree.children("Photos")] == ["Photos/2019", "Photos/2020"]
+        assert [child.path for child in tree.largest(3)] == ["Music", "Photos", "Photos/2019"]
+        assert [child.path for child in tree.largest(10, max_depth=1)] == ["Music", "Photos", "Empty"]
+
+        # The results are copies, so changing them doesn't change the tree.
+        photos.size = 0
+        assert tree.size("Photos") == RcloneDirectorySize("Photos", 450, 3, 1577836800.0, 1546300800.0)
+
+    def test_size_tree(self) -> None:
+        output: bytes = ("[\n" + ",\n".join(json.dumps(entry) for entry in LISTING) + "\n]\n").encode("utf-8")
+        commands: List[List[str]] = []
+
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            commands.append(command)
+            return rcloneMockProcess(command, output, b"", 0)
+
+        rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+
+        with mock.patch("subprocess.Popen", process_mock):
+            tree: RcloneSizeTree = rclone.size_tree("dropbox:")
+
+        assert commands == [["rclone", "lsjson", "dropbox:", "-R", "--fast-list"]]
+        assert tree.complete
+        assert tree.return_code == RcloneError.SUCCESS
+        assert tree.size("Photos/2019") == RcloneDirectorySize("Photos/2019", 400, 2, 1559347200.0, 1546300800.0)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import unittest
+from typing import List
+from unittest import mock
+
+from pyrclone import Rclone, RcloneBytesOutput, RcloneConfig, RcloneError, RcloneOutput, RcloneStats
+
+from .test_rclone import rcloneMockProcess
+
+STATS_LOG: bytes = b"".join(
+    json.dumps(line).encode("utf-8") + b"\n"
+    for line in [
+        {"level": "info", "msg": "Copied (new)", "object": "a.txt"},
+        {"level": "notice", "msg": "stats", "stats": {"bytes": 512, "totalBytes": 1024, "speed": 256.5, "eta": 2, "transfers": 1, "totalTransfers": 2, "errors": 0, "checks": 3, "elapsedTime": 2.0}},
+        {"level": "error", "msg": "Failed to copy: quota exceeded", "object": "b.txt"},
+        {"level": "notice", "msg": "stats", "stats": {"bytes": 1024, "totalBytes": 1024, "speed": 300, "eta": None, "transfers": 1, "totalTransfers": 2, "errors": 1, "checks": 3, "elapsedTime": 3.5}},
+    ]
+)
+
+
+class rcloneStatsTest(unittest.TestCase):
+    """
+    Tests for running transfers with live statistics.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig("[dropbox]\ntype = dropbox\n"))
+        self.commands: List[List[str]] = []
+
+    def process_mock(self, command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+        self.commands.append(command)
+        return rcloneMockProcess(command, b"", STATS_LOG, 1)
+
+    def test_live_stats(self) -> None:
+        reported: List[RcloneStats] = []
+
+        self.rclone.live_stats_mode = True
+        self.rclone.stats_callbacks.append(reported.append)
+        self.rclone.stats_callbacks.append(lambda stats: 1 / 0)  # type: ignore
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            result: RcloneOutput = self.rclone.copy("/local", "dropbox:Backups")
+
+        assert self.commands[0] == [
+            "rclone",
+            "copy",
+            "/local",
+            "dropbox:Backups",
+            "--use-json-log",
+            "--stats",
+            "1s",
+            "--stats-log-level",
+            "NOTICE",
+        ]
+        assert result.return_code == RcloneError.SYNTAX_OR_USAGE_ERROR
+        assert [stats.bytes for stats in reported] == [512, 1024]
+        assert reported[0].eta == 2.0
+        assert reported[0].speed == 256.5
+
+        assert result.stats is not None
+        assert result.stats.errors == 1
+        assert result.stats.eta is None
+        assert result.stats.elapsed_time == 3.5
+        assert len(result.error) == 2
+
+    def test_bytes_output(self) -> None:
+        self.rclone.live_stats_mode = True
+        self.rclone.bytes_output_mode = True
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            result: RcloneOutput = self.rclone.copy("/local", "dropbox:Backups")
+
+        assert isinstance(result, RcloneBytesOutput)
+        assert result.raw_output == b""
+        assert result.stats is not None and result.stats.bytes == 1024
+        assert [json.loads(line)["msg"] for line in result.error] == ["Copied (new)", "Failed to copy: quota exceeded"]
+
+    def test_other_commands_unchanged(self) -> None:
+        self.rclone.live_stats_mode = True
+
+        with mock.patch("subprocess.Popen", self.process_mock):
+            result: RcloneOutput = self.rclone.mkdir("dropbox:Backups")
+
+        assert self.commands[0] == ["rclone", "mkdir", "dropbox:Backups"]
+        assert result.stats is None
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import threading
+import unittest
+from typing import Dict, List
+from unittest import mock
+
+from pyrclone import (
+    Rclone,
+    RcloneCheckEntry,
+    RcloneCheckStatus,
+    RcloneConfig,
+    RcloneError,
+    RcloneOutput,
+    RcloneVerificationStore,
+    RcloneVerifyResult,
+)
+from pyrclone.rclone_verify import parse_hashsum_line
+
+from .test_rclone import rcloneMockProcess
+
+CONFIG: str = "[s3]\ntype = s3\n\n[dropbox]\ntype = dropbox\n"
+
+OLD: str = "2024-01-01T00:00:00Z"
+NEW: str = "2024-02-01T00:00:00Z"
+
+
+class rcloneVerifyTest(unittest.TestCase):
+    """
+    Tests for streamed checks, and incremental verification.
+    """
+
+    def setUp(self) -> None:
+        self.rclone: Rclone = Rclone(RcloneConfig(CONFIG))
+        self.store: RcloneVerificationStore = RcloneVerificationStore()
+        self.lock: threading.Lock = threading.Lock()
+        self.hashed: List[str] = []
+        self.commands: List[List[str]] = []
+
+        self.listings: Dict[str, List[Dict[str, object]]] = {
+            "/local": [
+                {"Path": "a.txt", "Size": 5, "ModTime": OLD, "IsDir": False},
+                {"Path": "b.txt", "Size": 10, "ModTime": OLD, "IsDir": False},
+                {"Path": "c.txt", "Size": 3, "ModTime": OLD, "IsDir": False},
+                {"Path": "d.txt", "Size": 1, "ModTime": OLD, "IsDir": False},
+            ],
+            "s3:bucket": [
+                {"Path": "a.txt", "Size": 5, "ModTime": OLD, "IsDir": False},
+                {"Path": "b.txt", "Size": 10, "ModTime": OLD, "IsDir": False},
+                {"Path": "c.txt", "Size": 4, "ModTime": OLD, "IsDir": False},
+                {"Path": "e.txt", "Size": 1, "ModTime": OLD, "IsDir": False},
+            ],
+        }
+
+    def tearDown(self) -> None:
+        self.store.close()
+
+    def process_mock(self, command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+        self.commands.append(command)
+        listing: List[Dict[str, object]] = self.listings.get(command[2], [])
+        output: str = "[\n" + ",\n".join(json.dumps(entry) for entry in listing) + "\n]\n"
+        return rcloneMockProcess(command, output.encode("utf-8"), b"", 0)
+
+    def execute_mock(self, command: List[str]) -> RcloneOutput:
+        with open(command[command.index("--files-from-raw") + 1]) as list_file:
+            paths: List[str] = list_file.read().splitlines()
+
+        with self.lock:
+            self.commands.append(command)
+
+            if command[3] == "/local":
+                self.hashed += paths
+
+        output: List[str] = [
+            f"{'FF' if path == 'b.txt' and command[3] == 's3:bucket' else 'AA'}{len(path)}  {path}"
+            for path in paths
+        ]
+        return RcloneOutput(RcloneError.SUCCESS, output, [])
+
+    def verify(self) -> RcloneVerifyResult:
+        with mock.patch("subprocess.Popen", self.process_mock), mock.patch.object(
+            self.rclone, "_execute", self.execute_mock
+        ):
+            return self.store.verify(self.rclone, "/local", "s3:bucket", chunk_size=1)
+
+    def test_verify(self) -> None:
+        first: RcloneVerifyResult = self.verify()
+
+        assert sorted(command[:5] for command in self.commands[2:]) == [
+            ["rclone", "hashsum", "md5", "/local", "--files-from-raw"],
+            ["rclone", "hashsum", "md5", "/local", "--files-from-raw"],
+            ["rclone", "hashsum", "md5", "s3:bucket", "--files-from-raw"],
+            ["rclone", "hashsum", "md5", "s3:bucket", "--files-from-raw"],
+        ]
+        assert sorted(self.hashed) == ["a.txt", "b.txt"]
+        assert (first.matched, first.skipped) == (1, 0)
+        assert first.differ == ["c.txt", "b.txt"]
+        assert first.missing_on_destination == ["d.txt"]
+        assert first.missing_on_source == ["e.txt"]
+        assert first.return_code == RcloneError.SUCCESS
+        assert not first.ok
+        assert list(self.store.records("/local", "s3:bucket")) == ["a.txt"]
+        assert self.store.records("/local", "s3:bucket")["a.txt"].hash == "aa5"
+
+        # Only what failed, or changed, is hashed again.
+        self.hashed = []
+        second: RcloneVerifyResult = self.verify()
+
+        assert self.hashed == ["b.txt"]
+        assert (second.matched, second.skipped) == (0, 1)
+
+        self.hashed = []
+        self.listings["s3:bucket"][0]["ModTime"] = NEW
+        third: RcloneVerifyResult = self.verify()
+
+        assert sorted(self.hashed) == ["a.txt", "b.txt"]
+        assert (third.matched, third.skipped) == (1, 0)
+        assert self.store.records("/local", "s3:bucket")["a.txt"].destination_mod_time == NEW
+
+    def test_iter_check(self) -> None:
+        def process_mock(command: List[str], stdout: int, stderr: int) -> rcloneMockProcess:
+            self.commands.append(command)
+            return rcloneMockProcess(command, b"= a.txt\n* b.txt\n+ c.txt\n- d.txt\n! e.txt\n", b"", 1)
+
+        with mock.patch("subprocess.Popen", process_mock):
+            stream = self.rclone.iter_check("/local", "dropbox:Backup", ["--one-way"])
+            entries: List[RcloneCheckEntry] = list(stream)
+
+        assert self.commands == [["rclone", "check", "/local", "dropbox:Backup", "--combined", "-", "--one-way"]]
+        assert [entry.status for entry in entries] == [
+            RcloneCheckStatus.MATCH,
+            RcloneCheckStatus.DIFFER,
+            RcloneCheckStatus.MISSING_ON_DESTINATION,
+            RcloneCheckStatus.MISSING_ON_SOURCE,
+            RcloneCheckStatus.ERROR,
+        ]
+        assert entries[0].path == "a.txt"
+        assert stream.return_code == RcloneError.SYNTAX_OR_USAGE_ERROR
+
+    def test_verify_without_hashes(self) -> None:
+        self.listings["dropbox:"] = self.listings.pop("s3:bucket")
+
+        def execute_mock(command: List[str]) -> RcloneOutput:
+            self.commands.append(command)
+            return RcloneOutput(RcloneError.SYNTAX_OR_USAGE_ERROR, ["= a.txt", "* b.txt"], [])
+
+        with mock.patch("subprocess.Popen", self.process_mock), mock.patch.object(
+            self.rclone, "_execute", execute_mock
+        ):
+            result: RcloneVerifyResult = self.store.verify(self.rclone, "/local", "dropbox:")
+
+        assert self.commands[2][:7] == ["rclone", "check", "/local", "dropbox:", "--download", "--combined", "-"]
+        assert len(self.commands) == 3
+        assert (result.matched, result.differ) == (1, ["c.txt", "b.txt"])
+        assert result.return_code == RcloneError.SUCCESS
+        assert self.store.records("/local", "dropbox:")["a.txt"].hash is None
+
+    def test_parse_hashsum_line(self) -> None:
+        assert parse_hashsum_line(b"D41D8CD98F00B204E9800998ECF8427E  dir/a b.txt\n") == (
+            "d41d8cd98f00b204e9800998ecf8427e",
+            "dir/a b.txt",
+        )
+        assert parse_hashsum_line("UNSUPPORTED  a.txt") == ("unsupported", "a.txt")
+        assert parse_hashsum_line("                     ERROR  a.txt") is None